@@ -0,0 +1,188 @@
+"""
+Refresh tokens and revocation of stateless access tokens.
+
+In stateless mode an access token carries the user's name, email and role,
+so requests are authenticated without a database read, and expires after a
+few minutes. ``RefreshTokenStore`` keeps the long-lived refresh tokens
+(hashed) in ``refresh_tokens``. A refresh token is single use: every refresh
+replaces it, and presenting a replaced token again revokes all of the
+user's sessions, since it means the token leaked.
+
+``TokenRevocations`` holds the access tokens that must stop working before
+they expire: single tokens by ``jti`` (logout) and every token of a user
+issued below a version (deletion, role or profile changes). Entries are
+written to ``token_revocations`` and only need to outlive the access token
+lifetime, so the in-memory set stays small. Each worker loads it at startup
+and then polls for entries written by other workers.
+"""
+
+import asyncio
+import hashlib
+import logging
+import secrets
+import sys
+from datetime import datetime, timezone, timedelta
+from typing import Dict, Optional, Tuple
+
+from pymongo import ReturnDocument
+
+logger = logging.getLogger(__name__)
+
+REVOCATIONS_COLLECTION = "token_revocations"
+REFRESH_TOKENS_COLLECTION = "refresh_tokens"
+# Re-read entries this far back on each sync, so writes from workers with a skewed clock are not missed
+SYNC_OVERLAP_SECONDS = 60
+
+
+class RefreshTokenInvalid(Exception):
+    pass
+
+
+class RefreshTokenReused(RefreshTokenInvalid):
+    """A refresh token was presented again after it had been exchanged"""
+
+    def __init__(self, user_id: str):
+        super().__init__(user_id)
+        self.user_id = user_id
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _as_utc(value: datetime) -> datetime:
+    # PyMongo returns naive UTC datetimes unless the client is tz_aware
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+def hash_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class TokenRevocations:
+    def __init__(self, db, access_ttl_seconds: float):
+        self.db = db
+        self.access_ttl_seconds = access_ttl_seconds
+        self._jtis: Dict[str, datetime] = {}
+        # user id -> (lowest token version still valid, when the entry can be dropped)
+        self._user_versions: Dict[str, Tuple[int, datetime]] = {}
+        self._synced_at: Optional[datetime] = None
+
+    def is_revoked(self, claims: dict) -> bool:
+        """Whether a decoded access token was revoked; pure in-memory lookups"""
+        if claims.get("jti") in self._jtis:
+            return True
+        entry = self._user_versions.get(claims.get("sub"))
+        return entry is not None and claims.get("ver", 0) < entry[0]
+
+    def _add(self, doc: dict):
+        expires_at = _as_utc(doc["expires_at"])
+        if doc["type"] == "jti":
+            self._jtis[doc["jti"]] = expires_at
+        else:
+            current = self._user_versions.get(doc["user_id"])
+            if current is None or current[0] <= doc["version"]:
+                self._user_versions[doc["user_id"]] = (doc["version"], expires_at)
+
+    async def _record(self, doc: dict):
+        doc["created_at"] = _now()
+        self._add(doc)
+        await self.db[REVOCATIONS_COLLECTION].insert_one(dict(doc))
+
+    async def revoke_token(self, jti: str, expires_at: datetime):
+        """Revoke one access token until it expires anyway"""
+        await self._record({"type": "jti", "jti": jti, "expires_at": _as_utc(expires_at)})
+
+    async def revoke_user(self, user_id: str) -> int:
+        """Revoke every access token issued to the user so far; returns the user's new token version"""
+        user = await self.db.users.find_one_and_update(
+            {"id": user_id},
+            {"$inc": {"token_version": 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+        # Without a user document no token version is valid any more
+        version = user["token_version"] if user is not None else sys.maxsize
+        await self._record({
+            "type": "user",
+            "user_id": user_id,
+            "version": version,
+            # Tokens issued before now have all expired by then
+            "expires_at": _now() + timedelta(seconds=self.access_ttl_seconds),
+        })
+        return version
+
+    async def sync(self):
+        """Merge entries written since the last sync (all live entries on the first call) and drop expired ones"""
+        now = _now()
+        query = {"expires_at": {"$gt": now}}
+        if self._synced_at is not None:
+            query["created_at"] = {"$gte": self._synced_at - timedelta(seconds=SYNC_OVERLAP_SECONDS)}
+        async for doc in self.db[REVOCATIONS_COLLECTION].find(query, {"_id": 0}):
+            self._add(doc)
+        self._synced_at = now
+
+        self._jtis = {jti: expires_at for jti, expires_at in self._jtis.items() if expires_at > now}
+        self._user_versions = {
+            user_id: entry for user_id, entry in self._user_versions.items() if entry[1] > now
+        }
+
+    async def run(self, interval_seconds: float):
+        """Background loop calling ``sync`` every ``interval_seconds``"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            try:
+                await self.sync()
+            except Exception as e:
+                logger.error(f"Token revocation sync failed: {e}")
+
+    def stats(self) -> dict:
+        return {"revoked_tokens": len(self._jtis), "revoked_users": len(self._user_versions)}
+
+
+class RefreshTokenStore:
+    def __init__(self, db, ttl_seconds: float):
+        self.db = db
+        self.ttl_seconds = ttl_seconds
+
+    async def issue(self, user_id: str, version: int) -> str:
+        token = secrets.token_urlsafe(32)
+        now = _now()
+        await self.db[REFRESH_TOKENS_COLLECTION].insert_one({
+            "token_hash": hash_token(token),
+            "user_id": user_id,
+            "version": version,
+            "used": False,
+            "created_at": now,
+            "expires_at": now + timedelta(seconds=self.ttl_seconds),
+        })
+        return token
+
+    async def consume(self, token: str) -> dict:
+        """Mark a refresh token used and return its record (``user_id``, ``version``).
+
+        Raises ``RefreshTokenInvalid``, or ``RefreshTokenReused`` after revoking
+        the user's other refresh tokens when the token was already used (the
+        caller should then revoke their access tokens too).
+        """
+        token_hash = hash_token(token)
+        record = await self.db[REFRESH_TOKENS_COLLECTION].find_one_and_update(
+            {"token_hash": token_hash, "used": False, "expires_at": {"$gt": _now()}},
+            {"$set": {"used": True}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if record is not None:
+            record.pop("_id", None)
+            return record
+
+        stale = await self.db[REFRESH_TOKENS_COLLECTION].find_one({"token_hash": token_hash}, {"_id": 0})
+        if stale is not None and stale["used"]:
+            logger.warning(f"Refresh token reused for user {stale['user_id']}; revoking their sessions")
+            await self.revoke_all(stale["user_id"])
+            raise RefreshTokenReused(stale["user_id"])
+        raise RefreshTokenInvalid()
+
+    async def revoke(self, token: str):
+        await self.db[REFRESH_TOKENS_COLLECTION].delete_one({"token_hash": hash_token(token)})
+
+    async def revoke_all(self, user_id: str):
+        await self.db[REFRESH_TOKENS_COLLECTION].delete_many({"user_id": user_id})
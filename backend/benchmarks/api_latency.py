@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+Benchmark: end-to-end API latency and throughput.
+
+Drives ``server.app`` in-process over httpx's ASGI transport, against the
+``home_services_bench`` database on a local mongod (``MONGO_URL``) or
+mongomock (``--mock``). The scenario registers and
+logs in users, creates bookings, has an admin approve them, polls
+notifications and downloads QR codes. For each route it reports throughput
+and p50/p95/p99 latency.
+
+Results can be saved as a JSON baseline and later runs compared against it;
+the script exits with status 1 when a route's p95 regresses past the
+tolerance.
+
+    python benchmarks/api_latency.py --mock --users 50 --save-baseline
+    python benchmarks/api_latency.py --mock --users 50            # compare with the baseline
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import sys
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "home_services_bench")
+os.environ.setdefault("EMAIL_MOCK", "true")
+
+import httpx  # noqa: E402
+
+import server  # noqa: E402
+
+BENCH_DB_NAME = "home_services_bench"
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+
+class Recorder:
+    """Collects per-route latencies and the wall time spent in each route's phase"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.wall_seconds = defaultdict(float)
+
+    async def call(self, client: httpx.AsyncClient, route: str, method: str, url: str, **kwargs) -> httpx.Response:
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        self.latencies[route].append((time.perf_counter() - started) * 1000)
+        if response.status_code >= 400:
+            self.errors[route] += 1
+        return response
+
+    async def phase(self, route: str, calls, concurrency: int) -> list:
+        """Run the given coroutine factories with bounded concurrency, timing the whole phase"""
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def limited(make_call):
+            async with semaphore:
+                return await make_call()
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(limited(make_call) for make_call in calls))
+        self.wall_seconds[route] += time.perf_counter() - started
+        return results
+
+    def summary(self) -> dict:
+        routes = {}
+        for route, samples in self.latencies.items():
+            ordered = sorted(samples)
+            routes[route] = {
+                "requests": len(ordered),
+                "errors": self.errors[route],
+                "rps": len(ordered) / self.wall_seconds[route] if self.wall_seconds[route] else 0.0,
+                "p50_ms": percentile(ordered, 50),
+                "p95_ms": percentile(ordered, 95),
+                "p99_ms": percentile(ordered, 99),
+                "max_ms": ordered[-1],
+            }
+        return routes
+
+
+def percentile(ordered: list, pct: float) -> float:
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, max(0, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+async def run_scenario(users: int, polls: int, concurrency: int) -> dict:
+    recorder = Recorder()
+    run_id = uuid.uuid4().hex[:8]
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        admin = await client.post("/api/auth/register", json={
+            "email": f"admin-{run_id}@example.com", "name": "Bench Admin", "password": "bench-password", "role": "admin",
+        })
+        admin_headers = {"Authorization": f"Bearer {admin.json()['access_token']}"}
+        emails = [f"user-{run_id}-{i}@example.com" for i in range(users)]
+
+        await recorder.phase("POST /api/auth/register", [
+            lambda email=email: recorder.call(client, "POST /api/auth/register", "POST", "/api/auth/register",
+                                              json={"email": email, "name": "Bench User", "password": "bench-password"})
+            for email in emails
+        ], concurrency)
+
+        logins = await recorder.phase("POST /api/auth/login", [
+            lambda email=email: recorder.call(client, "POST /api/auth/login", "POST", "/api/auth/login",
+                                              json={"email": email, "password": "bench-password"})
+            for email in emails
+        ], concurrency)
+        user_headers = [{"Authorization": f"Bearer {r.json()['access_token']}"} for r in logins if r.status_code == 200]
+
+        services = (await client.get("/api/services")).json()
+        await recorder.phase("GET /api/services", [
+            lambda: recorder.call(client, "GET /api/services", "GET", "/api/services")
+            for _ in range(users)
+        ], concurrency)
+        service = services[0]
+
+        created = await recorder.phase("POST /api/bookings", [
+            lambda headers=headers: recorder.call(client, "POST /api/bookings", "POST", "/api/bookings", headers=headers, json={
+                "service_id": service["id"], "service_type": service["service_type"],
+                "preferred_date": "2030-01-01T10:00", "duration": 60,
+            })
+            for headers in user_headers
+        ], concurrency)
+        booking_ids = [r.json()["id"] for r in created if r.status_code == 201]
+
+        await recorder.phase("PUT /api/admin/bookings/{id}", [
+            lambda booking_id=booking_id: recorder.call(
+                client, "PUT /api/admin/bookings/{id}", "PUT", f"/api/admin/bookings/{booking_id}",
+                headers=admin_headers, json={"action": "accept"})
+            for booking_id in booking_ids
+        ], concurrency)
+
+        await recorder.phase("GET /api/bookings", [
+            lambda headers=headers: recorder.call(client, "GET /api/bookings", "GET", "/api/bookings", headers=headers)
+            for headers in user_headers
+        ], concurrency)
+
+        await recorder.phase("GET /api/notifications", [
+            lambda headers=headers: recorder.call(client, "GET /api/notifications", "GET", "/api/notifications", headers=headers)
+            for headers in user_headers for _ in range(polls)
+        ], concurrency)
+
+        await recorder.phase("GET /api/bookings/{id}/qr", [
+            lambda headers=headers, booking_id=booking_id: recorder.call(
+                client, "GET /api/bookings/{id}/qr", "GET", f"/api/bookings/{booking_id}/qr", headers=headers)
+            for headers, booking_id in zip(user_headers, booking_ids)
+        ], concurrency)
+
+        await recorder.phase("GET /api/admin/bookings", [
+            lambda: recorder.call(client, "GET /api/admin/bookings", "GET", "/api/admin/bookings", headers=admin_headers)
+            for _ in range(users)
+        ], concurrency)
+
+    return recorder.summary()
+
+
+def compare(routes: dict, baseline: dict, tolerance: float, floor_ms: float) -> list:
+    """Routes whose p95 grew by more than ``tolerance`` (and at least ``floor_ms``) over the baseline"""
+    regressions = []
+    for route, result in routes.items():
+        before = baseline.get("routes", {}).get(route)
+        if before is None:
+            continue
+        limit = max(before["p95_ms"] * (1 + tolerance), before["p95_ms"] + floor_ms)
+        if result["p95_ms"] > limit:
+            regressions.append((route, before["p95_ms"], result["p95_ms"]))
+    return regressions
+
+
+def print_report(routes: dict, baseline: dict):
+    print(f"{'route':<32} {'reqs':>6} {'errs':>5} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Δp95':>8}")
+    for route, r in routes.items():
+        before = baseline.get("routes", {}).get(route) if baseline else None
+        delta = f"{(r['p95_ms'] / before['p95_ms'] - 1) * 100:+.0f}%" if before and before["p95_ms"] else ""
+        print(f"{route:<32} {r['requests']:>6} {r['errors']:>5} {r['rps']:>8.1f} "
+              f"{r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f} {delta:>8}")
+
+
+async def main(args) -> int:
+    # Always a database of its own, whatever DB_NAME says, so the scenario's writes cannot touch real data
+    if args.mock:
+        from mongomock_motor import AsyncMongoMockClient
+        server.use_database(AsyncMongoMockClient()[BENCH_DB_NAME])
+    else:
+        server.use_database(server.client[BENCH_DB_NAME])
+
+    await server.startup_event()
+    try:
+        routes = await run_scenario(args.users, args.polls, args.concurrency)
+    finally:
+        await server.shutdown_db_client()
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else None
+    print_report(routes, baseline)
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps({
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "settings": {"users": args.users, "polls": args.polls, "concurrency": args.concurrency, "mock": args.mock},
+            "python": platform.python_version(),
+            "routes": routes,
+        }, indent=2))
+        print(f"\nBaseline saved to {args.baseline}")
+        return 0
+
+    if baseline:
+        regressions = compare(routes, baseline, args.tolerance, args.floor_ms)
+        if regressions:
+            print("\nRegressions (p95):")
+            for route, before, after in regressions:
+                print(f"  {route}: {before:.2f} ms -> {after:.2f} ms")
+            return 1
+        print("\nNo p95 regressions against the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark API latency and throughput per route")
+    parser.add_argument("--users", type=int, default=50, help="users registered and driven through the flow")
+    parser.add_argument("--polls", type=int, default=5, help="notification polls per user")
+    parser.add_argument("--concurrency", type=int, default=10, help="requests in flight per phase")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative p95 growth")
+    parser.add_argument("--floor-ms", type=float, default=2.0, help="ignore p95 growth smaller than this")
+    parser.add_argument("--mock", action="store_true", help="use mongomock instead of MONGO_URL")
+    sys.exit(asyncio.run(main(parser.parse_args())))
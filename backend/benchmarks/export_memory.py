@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark: memory use of the streaming bookings export.
+
+Seeds the ``home_services_bench`` database with synthetic bookings, streams the export through
+``iter_bookings_export`` and samples the process RSS while doing so. Peak RSS
+growth should stay roughly flat as the row count increases. Use a real
+mongod for meaningful numbers: mongomock sorts the whole result set in
+memory, so ``--mock`` only checks that the benchmark runs.
+
+    python benchmarks/export_memory.py --sizes 10000,100000,1000000
+    python benchmarks/export_memory.py --mock --sizes 1000,10000 --format csv --gzip
+"""
+
+import argparse
+import asyncio
+import os
+import resource
+import sys
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "home_services_bench")
+
+import server  # noqa: E402
+
+BENCH_DB_NAME = "home_services_bench"
+BENCH_SERVICE_ID = "bench-service"
+SEED_CHUNK = 10000
+
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except OSError:
+        # No procfs (e.g. macOS): fall back to the peak, which only ever grows
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+
+
+async def seed_bookings(db, rows: int):
+    await db.bookings.delete_many({"service_id": BENCH_SERVICE_ID})
+    start = datetime.now(timezone.utc)
+    for offset in range(0, rows, SEED_CHUNK):
+        batch = []
+        for i in range(offset, min(offset + SEED_CHUNK, rows)):
+            batch.append({
+                "id": str(uuid.uuid4()),
+                "user_id": f"user-{i % 500}",
+                "user_name": f"User {i % 500}",
+                "user_email": f"user{i % 500}@example.com",
+                "service_id": BENCH_SERVICE_ID,
+                "service_type": ("inspection", "consultation", "repair")[i % 3],
+                "preferred_date": "2030-01-01T10:00",
+                "duration": 60,
+                "details": "Synthetic benchmark booking",
+                "status": ("pending", "accepted", "declined")[i % 3],
+                "covid_restrictions": "medium",
+                "cost": 150.0,
+                "created_at": (start - timedelta(seconds=i)).isoformat(),
+            })
+        await db.bookings.insert_many(batch)
+
+
+async def measure_export(export_format: str, batch_size: int, compress: bool) -> dict:
+    rss_before = current_rss_mb()
+    peak = rss_before
+    total_bytes = 0
+    started = time.perf_counter()
+    async for chunk in server.iter_bookings_export({}, export_format, batch_size, compress=compress):
+        total_bytes += len(chunk)
+        peak = max(peak, current_rss_mb())
+    return {
+        "seconds": time.perf_counter() - started,
+        "bytes": total_bytes,
+        "rss_before_mb": rss_before,
+        "rss_peak_mb": peak,
+    }
+
+
+async def main(args) -> int:
+    # Always a database of its own, whatever DB_NAME says, so seeding and cleanup cannot touch real data
+    if args.mock:
+        from mongomock_motor import AsyncMongoMockClient
+        server.use_database(AsyncMongoMockClient()[BENCH_DB_NAME])
+    else:
+        server.use_database(server.client[BENCH_DB_NAME])
+    db = server.db
+
+    print(f"{'rows':>10} {'seconds':>9} {'rows/s':>10} {'MB out':>8} {'RSS before':>11} {'RSS peak':>9} {'growth':>8}")
+    for rows in args.sizes:
+        await seed_bookings(db, rows)
+        result = await measure_export(args.format, args.batch_size, args.gzip)
+        growth = result["rss_peak_mb"] - result["rss_before_mb"]
+        print(
+            f"{rows:>10} {result['seconds']:>9.2f} {rows / result['seconds']:>10.0f} "
+            f"{result['bytes'] / 1024 / 1024:>8.1f} {result['rss_before_mb']:>10.1f}M "
+            f"{result['rss_peak_mb']:>8.1f}M {growth:>7.1f}M"
+        )
+
+    await db.bookings.delete_many({"service_id": BENCH_SERVICE_ID})
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure memory use of the streaming bookings export")
+    parser.add_argument("--sizes", default="10000,100000", type=lambda v: [int(n) for n in v.split(",")],
+                        help="comma-separated row counts to export")
+    parser.add_argument("--format", choices=["ndjson", "csv"], default="ndjson")
+    parser.add_argument("--batch-size", type=int, default=server.EXPORT_BATCH_SIZE)
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--mock", action="store_true", help="use mongomock instead of MONGO_URL")
+    sys.exit(asyncio.run(main(parser.parse_args())))
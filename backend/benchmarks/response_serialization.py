@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Benchmark: booking list serialization, standard vs ``FAST_RESPONSES``.
+
+Seeds ``--rows`` bookings into the ``home_services_bench`` database and times ``GET /api/admin/bookings?limit=<rows>``
+in-process over httpx's ASGI transport, first with FastAPI's response_model
+validation and stdlib JSON encoding, then with the fast path (stored
+documents encoded directly with orjson). The serialization step alone is also
+timed on the same documents, since a slow database (or mongomock) can
+dominate the end-to-end numbers.
+
+    python benchmarks/response_serialization.py --rows 1000
+    python benchmarks/response_serialization.py --mock --rows 1000
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "home_services_bench")
+os.environ.setdefault("EMAIL_MOCK", "true")
+# The benchmark reads every row in one page
+os.environ.setdefault("BOOKINGS_MAX_PAGE_SIZE", "100000")
+
+import httpx  # noqa: E402
+from fastapi.responses import JSONResponse, ORJSONResponse  # noqa: E402
+from fastapi.routing import serialize_response  # noqa: E402
+
+import server  # noqa: E402
+
+BENCH_DB_NAME = "home_services_bench"
+BENCH_SERVICE_ID = "bench-service"
+
+
+async def seed_bookings(db, count: int):
+    await db.bookings.delete_many({"service_id": BENCH_SERVICE_ID})
+    now = datetime.now(timezone.utc)
+    await db.bookings.insert_many([{
+        "id": str(uuid.uuid4()),
+        "user_id": f"user-{i % 50}",
+        "user_name": "Bench User",
+        "user_email": f"user-{i % 50}@example.com",
+        "service_id": BENCH_SERVICE_ID,
+        "service_type": "inspection",
+        "preferred_date": "2030-01-01T10:00",
+        "duration": 60,
+        "details": "Kitchen and bathroom" if i % 2 else None,
+        "status": "accepted",
+        "covid_restrictions": "medium",
+        "cost": 150.0,
+        "admin_notes": "Approved",
+        "created_at": (now - timedelta(seconds=i)).isoformat(),
+        "updated_at": now.isoformat(),
+    } for i in range(count)])
+
+
+def summarize(timings: list) -> str:
+    ordered = sorted(timings)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"{statistics.median(ordered):>8.2f} {p95:>8.2f}"
+
+
+async def delete_admin(db, admin: dict):
+    """Remove the admin registered for the run and what registration wrote for them"""
+    await db.users.delete_one({"id": admin["id"]})
+    await db.notifications.delete_many({"user_id": admin["id"]})
+    await db.notification_counters.delete_many({"user_id": admin["id"]})
+    await db.email_outbox.delete_many({"to": admin["email"]})
+
+
+async def time_endpoint(client: httpx.AsyncClient, headers: dict, rows: int, iterations: int) -> list:
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        response = await client.get(f"/api/admin/bookings?limit={rows}", headers=headers)
+        timings.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 200 and len(response.json()["items"]) == rows
+    return timings
+
+
+async def time_serialization(page: dict, iterations: int) -> dict:
+    """What each mode does with the documents once they are loaded"""
+    route = next(r for r in server.app.routes if getattr(r, "path", None) == "/api/admin/bookings")
+
+    async def standard():
+        # FastAPI's own response_model pass, then stdlib JSON encoding
+        content = await serialize_response(field=route.response_field, response_content=page)
+        return JSONResponse(content).body
+
+    async def fast():
+        return ORJSONResponse(server.trusted_booking_page(page)).body
+
+    results = {}
+    for name, serialize in (("standard", standard), ("fast", fast)):
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            await serialize()
+            timings.append((time.perf_counter() - started) * 1000)
+        results[name] = timings
+    return results
+
+
+async def main(args) -> int:
+    # Always a database of its own, whatever DB_NAME says, so seeding and cleanup cannot touch real data
+    if args.mock:
+        from mongomock_motor import AsyncMongoMockClient
+        server.use_database(AsyncMongoMockClient()[BENCH_DB_NAME])
+    else:
+        server.use_database(server.client[BENCH_DB_NAME])
+
+    await server.startup_event()
+    admin = None
+    try:
+        await seed_bookings(server.db, args.rows)
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            registered = (await client.post("/api/auth/register", json={
+                "email": f"admin-{uuid.uuid4().hex[:8]}@example.com", "name": "Bench Admin",
+                "password": "bench-password", "role": "admin",
+            })).json()
+            admin = registered["user"]
+            headers = {"Authorization": f"Bearer {registered['access_token']}"}
+
+            # Alternate the modes so drift (GC, cache warmth) affects both alike
+            endpoint = {"standard": [], "fast": []}
+            await time_endpoint(client, headers, args.rows, 2)  # warm up
+            for _ in range(args.iterations):
+                for name, fast in (("standard", False), ("fast", True)):
+                    server.FAST_RESPONSES = fast
+                    endpoint[name] += await time_endpoint(client, headers, args.rows, 1)
+            server.FAST_RESPONSES = False
+
+        page = await server.paginate_bookings({}, None, args.rows)
+        serialization = await time_serialization(page, args.iterations)
+    finally:
+        await server.db.bookings.delete_many({"service_id": BENCH_SERVICE_ID})
+        if admin is not None:
+            await delete_admin(server.db, admin)
+        await server.shutdown_db_client()
+
+    print(f"GET /api/admin/bookings, {args.rows} rows, {args.iterations} iterations\n")
+    print(f"{'':<26} {'p50 ms':>8} {'p95 ms':>8}")
+    for name in ("standard", "fast"):
+        print(f"{'request, ' + name:<26} {summarize(endpoint[name])}")
+    for name in ("standard", "fast"):
+        print(f"{'serialization, ' + name:<26} {summarize(serialization[name])}")
+    saved = statistics.median(serialization["standard"]) - statistics.median(serialization["fast"])
+    print(f"\nfast path saves {saved:.2f} ms of serialization per request "
+          f"({saved / statistics.median(serialization['standard']) * 100:.0f}%)")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare standard and fast serialization of booking lists")
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--mock", action="store_true", help="use mongomock instead of MONGO_URL")
+    sys.exit(asyncio.run(main(parser.parse_args())))
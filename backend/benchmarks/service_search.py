@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Benchmark: service catalog search latency.
+
+Seeds the ``home_services_bench`` database with a synthetic catalog, creates the declared
+indexes and times representative ``GET /api/services`` query shapes through
+``search_services``.
+
+    python benchmarks/service_search.py --services 50000
+    python benchmarks/service_search.py --mock --services 2000   # no text search on mongomock
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "home_services_bench")
+
+import server  # noqa: E402
+from indexes import ensure_indexes  # noqa: E402
+
+BENCH_DB_NAME = "home_services_bench"
+# Seeded services get ids with this prefix, so cleanup removes only them
+BENCH_ID_PREFIX = "bench-"
+SEED_CHUNK = 5000
+SERVICE_TYPES = ["inspection", "consultation", "design", "repair", "renovation"]
+WORDS = ["kitchen", "bathroom", "roof", "garden", "plumbing", "electrical", "paint", "floor",
+         "window", "heating", "virtual", "remote", "urgent", "safety", "energy", "storage"]
+
+# name -> search_services keyword arguments
+QUERIES = {
+    "type filter, price sort": dict(service_type="repair", sort="price"),
+    "price range": dict(min_price=100, max_price=200),
+    "online + type": dict(is_online=True, service_type="design", sort="-price"),
+    "provider": dict(provider_id="provider-7"),
+    "newest, deep offset": dict(sort="newest", offset=1000),
+    "text search": dict(q="kitchen plumbing"),
+    "text + filter": dict(q="roof", service_type="inspection", max_price=300),
+}
+
+
+async def seed_services(db, count: int):
+    await delete_seeded_services(db)
+    now = datetime.now(timezone.utc)
+    rng = random.Random(42)
+    for offset in range(0, count, SEED_CHUNK):
+        batch = []
+        for i in range(offset, min(offset + SEED_CHUNK, count)):
+            words = rng.sample(WORDS, 4)
+            batch.append({
+                "id": f"{BENCH_ID_PREFIX}{uuid.uuid4()}",
+                "name": f"{words[0].title()} {words[1]} service {i}",
+                "description": f"Professional {words[2]} and {words[3]} help for your home.",
+                "price": float(rng.randint(50, 500)),
+                "service_type": rng.choice(SERVICE_TYPES),
+                "is_online": rng.random() < 0.6,
+                "photos": [],
+                "provider_id": f"provider-{rng.randint(0, 200)}",
+                "created_at": (now - timedelta(minutes=i)).isoformat(),
+            })
+        await db.services.insert_many(batch)
+
+
+async def delete_seeded_services(db):
+    await db.services.delete_many({"id": {"$regex": f"^{BENCH_ID_PREFIX}"}})
+
+
+async def time_query(params: dict, iterations: int) -> list:
+    args = dict(q=None, service_type=None, is_online=None, min_price=None, max_price=None,
+                provider_id=None, sort=None, offset=0, limit=server.SERVICES_PAGE_SIZE)
+    args.update(params)
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        await server.search_services(**args)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+async def main(args) -> int:
+    # Always a database of its own, whatever DB_NAME says, so seeding and cleanup cannot touch real data
+    if args.mock:
+        from mongomock_motor import AsyncMongoMockClient
+        server.use_database(AsyncMongoMockClient()[BENCH_DB_NAME])
+    else:
+        server.use_database(server.client[BENCH_DB_NAME])
+    db = server.db
+
+    await seed_services(db, args.services)
+    await ensure_indexes(db)
+
+    print(f"{args.services} services, {args.iterations} iterations per query\n")
+    print(f"{'query':<26} {'p50 ms':>8} {'p95 ms':>8} {'max ms':>8}")
+    for name, params in QUERIES.items():
+        if args.mock and "q" in params:
+            continue
+        timings = sorted(await time_query(params, args.iterations))
+        p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+        print(f"{name:<26} {statistics.median(timings):>8.2f} {p95:>8.2f} {timings[-1]:>8.2f}")
+
+    await delete_seeded_services(db)
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Measure service search latency on a synthetic catalog")
+    parser.add_argument("--services", type=int, default=20000)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--mock", action="store_true", help="use mongomock instead of MONGO_URL")
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,107 @@
+"""
+Booking status state machine.
+
+Every status change goes through ``transition_booking``, a single
+``find_one_and_update`` that only matches while the booking is still in one
+of the statuses the action may start from. Of two admins acting on the same
+booking at once exactly one update matches; the other gets
+``InvalidTransition`` and must not repeat the side effects (notifications,
+emails, QR rendering).
+"""
+
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import ReturnDocument, UpdateOne
+
+# action -> (statuses it may start from, resulting status)
+BOOKING_TRANSITIONS = {
+    "accept": (("pending",), "accepted"),
+    "decline": (("pending",), "declined"),
+    "complete": (("accepted",), "completed"),
+    "cancel": (("pending", "accepted"), "cancelled"),
+}
+BOOKING_STATUSES = ("pending", "accepted", "declined", "completed", "cancelled")
+
+
+class BookingNotFound(Exception):
+    pass
+
+
+class InvalidTransition(Exception):
+    def __init__(self, action: str, current_status: str):
+        super().__init__(f"Cannot {action} a booking that is {current_status}")
+        self.action = action
+        self.current_status = current_status
+
+
+async def transition_booking(db, booking_id: str, action: str, fields: Optional[dict] = None) -> dict:
+    """Apply ``action`` to a booking and return the updated document.
+
+    Raises ``BookingNotFound`` or ``InvalidTransition``; the extra lookup to
+    tell those apart only happens on the failure path.
+    """
+    from_statuses, new_status = BOOKING_TRANSITIONS[action]
+    booking = await db.bookings.find_one_and_update(
+        {"id": booking_id, "status": {"$in": list(from_statuses)}},
+        {
+            "$set": {
+                **(fields or {}),
+                "status": new_status,
+                "updated_at": datetime.now(timezone.utc).isoformat(),
+            },
+            # A bulk batch still reading back must not mistake this change for its own
+            "$unset": {"transition_id": ""},
+        },
+        return_document=ReturnDocument.AFTER,
+    )
+    if booking is not None:
+        booking.pop("_id", None)
+        return booking
+
+    current = await db.bookings.find_one({"id": booking_id}, {"_id": 0, "status": 1})
+    if current is None:
+        raise BookingNotFound(booking_id)
+    raise InvalidTransition(action, current["status"])
+
+
+async def transition_bookings(db, changes: List[Tuple[str, str, dict]]) -> Tuple[Dict[str, dict], Dict[str, Exception]]:
+    """Apply many ``(booking_id, action, fields)`` changes with one unordered ``bulk_write``.
+
+    Every update is conditioned on the expected status like ``transition_booking``
+    and tags the booking with this batch's id. A booking counts as updated when
+    the read-back finds both the tag and the new status; ``transition_booking``
+    clears the tag, so a booking moved again in between is reported with its
+    later status and gets no side effects from this call. The tags are removed
+    afterwards. Returns ``(updated bookings by id, BookingNotFound/InvalidTransition by id)``.
+    """
+    batch_id = str(uuid.uuid4())
+    now = datetime.now(timezone.utc).isoformat()
+    requests = []
+    for booking_id, action, fields in changes:
+        from_statuses, new_status = BOOKING_TRANSITIONS[action]
+        requests.append(UpdateOne(
+            {"id": booking_id, "status": {"$in": list(from_statuses)}},
+            {"$set": {**(fields or {}), "status": new_status, "updated_at": now, "transition_id": batch_id}},
+        ))
+    if requests:
+        await db.bookings.bulk_write(requests, ordered=False)
+
+    current = {}
+    async for booking in db.bookings.find({"id": {"$in": [booking_id for booking_id, _, _ in changes]}}, {"_id": 0}):
+        current[booking["id"]] = booking
+
+    if requests:
+        await db.bookings.update_many({"transition_id": batch_id}, {"$unset": {"transition_id": ""}})
+
+    updated, failed = {}, {}
+    for booking_id, action, _ in changes:
+        booking = current.get(booking_id)
+        if booking is None:
+            failed[booking_id] = BookingNotFound(booking_id)
+        elif booking.pop("transition_id", None) == batch_id and booking["status"] == BOOKING_TRANSITIONS[action][1]:
+            updated[booking_id] = booking
+        else:
+            failed[booking_id] = InvalidTransition(action, booking["status"])
+    return updated, failed
@@ -0,0 +1,196 @@
+"""
+MongoDB connection pool monitoring, warm-up and readiness checks.
+
+``PoolMonitor`` is a PyMongo connection pool listener. Per server it tracks
+open and checked-out connections, requests waiting for a connection, and how
+long checkouts waited. The numbers are exported to the metrics registry and
+returned by ``stats()`` for the health endpoints. A checkout that waits long,
+or fails with reason ``timeout``, means ``maxPoolSize`` is too small for the
+load, or that connections are being held too long.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+
+from pymongo import monitoring
+
+from metrics import REGISTRY
+
+pool_checkout_wait_seconds = REGISTRY.histogram(
+    "mongo_pool_checkout_wait_seconds", "Time spent waiting to check a connection out of the pool", ("address",))
+pool_checkout_failures = REGISTRY.counter(
+    "mongo_pool_checkout_failures_total", "Failed connection checkouts by reason", ("address", "reason"))
+pool_connections = REGISTRY.gauge(
+    "mongo_pool_connections", "Open pooled connections", ("address",))
+pool_connections_in_use = REGISTRY.gauge(
+    "mongo_pool_connections_in_use", "Connections currently checked out", ("address",))
+pool_checkouts_waiting = REGISTRY.gauge(
+    "mongo_pool_checkouts_waiting", "Operations waiting for a connection", ("address",))
+
+
+def _address(address) -> str:
+    host, port = address
+    return f"{host}:{port}"
+
+
+class _PoolStats:
+    __slots__ = ("connections", "in_use", "waiting", "checkouts", "failures", "wait_seconds_total",
+                 "wait_seconds_max", "recent_waits")
+
+    def __init__(self, window: int):
+        self.connections = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.failures: Dict[str, int] = {}
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.recent_waits = deque(maxlen=window)
+
+    def as_dict(self) -> dict:
+        recent = sorted(self.recent_waits)
+        return {
+            "connections": self.connections,
+            "in_use": self.in_use,
+            "waiting": self.waiting,
+            "checkouts": self.checkouts,
+            "checkout_failures": dict(self.failures),
+            "checkout_wait_seconds": {
+                "avg": self.wait_seconds_total / self.checkouts if self.checkouts else 0.0,
+                "max": self.wait_seconds_max,
+                # Over the last ``window`` checkouts
+                "p95": recent[int(len(recent) * 0.95)] if recent else 0.0,
+            },
+        }
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    """Connection pool listener; events arrive on PyMongo's (Motor's executor) threads"""
+
+    def __init__(self, max_pool_size: int, min_pool_size: int, window: int = 1024):
+        self.max_pool_size = max_pool_size
+        self.min_pool_size = min_pool_size
+        self.window = window
+        self._pools: Dict[str, _PoolStats] = {}
+        self._lock = threading.Lock()
+        # A checkout starts and ends on the same thread
+        self._checkout_started = threading.local()
+
+    def _pool(self, address) -> _PoolStats:
+        key = _address(address)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = _PoolStats(self.window)
+        return pool
+
+    def _export(self, address, pool: _PoolStats):
+        key = _address(address)
+        pool_connections.set(pool.connections, address=key)
+        pool_connections_in_use.set(pool.in_use, address=key)
+        pool_checkouts_waiting.set(pool.waiting, address=key)
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop(_address(event.address), None)
+
+    def connection_created(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.connections += 1
+            self._export(event.address, pool)
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.connections = max(0, pool.connections - 1)
+            self._export(event.address, pool)
+
+    def connection_check_out_started(self, event):
+        self._checkout_started.value = time.perf_counter()
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.waiting += 1
+            self._export(event.address, pool)
+
+    def connection_checked_out(self, event):
+        waited = self._waited()
+        pool_checkout_wait_seconds.observe(waited, address=_address(event.address))
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.waiting = max(0, pool.waiting - 1)
+            pool.in_use += 1
+            pool.checkouts += 1
+            pool.wait_seconds_total += waited
+            pool.wait_seconds_max = max(pool.wait_seconds_max, waited)
+            pool.recent_waits.append(waited)
+            self._export(event.address, pool)
+
+    def connection_check_out_failed(self, event):
+        self._waited()
+        reason = str(event.reason)
+        pool_checkout_failures.inc(address=_address(event.address), reason=reason)
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.waiting = max(0, pool.waiting - 1)
+            pool.failures[reason] = pool.failures.get(reason, 0) + 1
+            self._export(event.address, pool)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool.in_use = max(0, pool.in_use - 1)
+            self._export(event.address, pool)
+
+    def _waited(self) -> float:
+        started = getattr(self._checkout_started, "value", None)
+        self._checkout_started.value = None
+        return time.perf_counter() - started if started is not None else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            pools = {address: pool.as_dict() for address, pool in self._pools.items()}
+        return {
+            "max_pool_size": self.max_pool_size,
+            "min_pool_size": self.min_pool_size,
+            # Every connection of some pool is checked out; new operations queue
+            "saturated": any(pool["in_use"] >= self.max_pool_size for pool in pools.values()),
+            "pools": pools,
+        }
+
+
+async def warm_up(db, connections: int):
+    """Open ``connections`` pooled connections before serving traffic.
+
+    Concurrent pings each check out a connection of their own, so the pool
+    grows to that size instead of the first requests paying for the TCP and
+    auth handshakes.
+    """
+    if connections > 0:
+        await asyncio.gather(*(db.command("ping") for _ in range(connections)))
+
+
+async def check_ready(db, timeout_seconds: float) -> Optional[str]:
+    """``None`` if MongoDB answers a ping within the timeout, otherwise the reason it did not"""
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout_seconds)
+    except asyncio.TimeoutError:
+        return f"MongoDB did not answer within {timeout_seconds}s"
+    except Exception as e:
+        return f"MongoDB ping failed: {e}"
+    return None
@@ -0,0 +1,258 @@
+"""
+Durable email outbox.
+
+Request handlers only insert a document into the ``email_outbox`` collection.
+A background ``OutboxSender`` drains it in batches over a single reused SMTP
+connection, retrying failed deliveries with exponential backoff.
+"""
+
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone, timedelta
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from email.mime.image import MIMEImage
+from typing import List, Optional
+
+import aiosmtplib
+
+from metrics import timed
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_COLLECTION = "email_outbox"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def build_message(from_email: str, to_email: str, subject: str, body: str, qr_image: bytes = None) -> MIMEMultipart:
+    """Build the MIME message for an outbox job, with the QR code inline if present"""
+    message = MIMEMultipart("related")
+    message["From"] = from_email
+    message["To"] = to_email
+    message["Subject"] = subject
+
+    message.attach(MIMEText(body, "html"))
+
+    if qr_image:
+        qr_part = MIMEImage(qr_image)
+        qr_part.add_header('Content-ID', '<qr_code>')
+        qr_part.add_header('Content-Disposition', 'inline', filename='qr_code.png')
+        message.attach(qr_part)
+
+    return message
+
+
+def _new_job(to_email: str, subject: str, body: str, qr_image: Optional[bytes], now: str) -> dict:
+    return {
+        "id": str(uuid.uuid4()),
+        "to": to_email,
+        "subject": subject,
+        "body": body,
+        "qr_image": qr_image,
+        "status": "pending",
+        "attempts": 0,
+        "next_attempt_at": now,
+        "locked_until": None,
+        "last_error": None,
+        "created_at": now,
+        "sent_at": None,
+    }
+
+
+async def enqueue_email(db, to_email: str, subject: str, body: str, qr_image: bytes = None) -> str:
+    """Persist an email job; delivery happens in the background sender"""
+    job = _new_job(to_email, subject, body, qr_image, _now().isoformat())
+    await db[OUTBOX_COLLECTION].insert_one(job)
+    return job["id"]
+
+
+async def enqueue_emails(db, emails: List[dict]) -> List[str]:
+    """Persist many ``{"to_email", "subject", "body", "qr_image"}`` jobs with one insert"""
+    if not emails:
+        return []
+    now = _now().isoformat()
+    jobs = [_new_job(e["to_email"], e["subject"], e["body"], e.get("qr_image"), now) for e in emails]
+    await db[OUTBOX_COLLECTION].insert_many(jobs, ordered=False)
+    return [job["id"] for job in jobs]
+
+
+class OutboxSender:
+    """Background task that drains the email outbox over a pooled SMTP connection"""
+
+    def __init__(
+        self,
+        db,
+        hostname: str,
+        port: int,
+        username: str = "",
+        password: str = "",
+        from_email: str = "noreply@homeservices.com",
+        start_tls: bool = True,
+        mock: bool = False,
+        batch_size: int = 20,
+        max_attempts: int = 5,
+        backoff_seconds: float = 5.0,
+        max_backoff_seconds: float = 600.0,
+        poll_interval: float = 2.0,
+        lease_seconds: float = 120.0,
+    ):
+        self.db = db
+        self.hostname = hostname
+        self.port = port
+        self.username = username
+        self.password = password
+        self.from_email = from_email
+        self.start_tls = start_tls
+        self.mock = mock
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+
+        self.stats = {"sent": 0, "retried": 0, "failed": 0, "reconnects": 0}
+        self._smtp: Optional[aiosmtplib.SMTP] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def notify(self):
+        """Wake the sender so freshly queued jobs go out without waiting for the next poll"""
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        await self._close_connection()
+
+    async def run(self):
+        while not self._stopping:
+            try:
+                sent = await self.drain_once()
+            except Exception as e:
+                logger.error(f"Email outbox error: {e}")
+                sent = 0
+            if sent >= self.batch_size:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def drain_once(self) -> int:
+        """Claim and deliver up to one batch of due jobs, returning how many were processed"""
+        jobs = await self._claim_batch()
+        for job in jobs:
+            await self._process(job)
+        return len(jobs)
+
+    async def _claim_batch(self) -> list:
+        now = _now()
+        lease_until = (now + timedelta(seconds=self.lease_seconds)).isoformat()
+        due = {
+            "$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now.isoformat()}},
+                # Jobs whose sender crashed mid-delivery become claimable again once the lease expires
+                {"status": "sending", "locked_until": {"$lte": now.isoformat()}},
+            ]
+        }
+        jobs = []
+        for _ in range(self.batch_size):
+            job = await self.db[OUTBOX_COLLECTION].find_one_and_update(
+                due,
+                {"$set": {"status": "sending", "locked_until": lease_until}},
+                sort=[("next_attempt_at", 1)],
+                projection={"_id": 0},
+            )
+            if job is None:
+                break
+            jobs.append(job)
+        return jobs
+
+    async def _process(self, job: dict):
+        try:
+            await self._deliver(job)
+        except Exception as e:
+            await self._record_failure(job, e)
+            return
+
+        self.stats["sent"] += 1
+        await self.db[OUTBOX_COLLECTION].update_one(
+            {"id": job["id"]},
+            {"$set": {"status": "sent", "sent_at": _now().isoformat(), "locked_until": None, "qr_image": None},
+             "$inc": {"attempts": 1}}
+        )
+
+    @timed("smtp_deliver")
+    async def _deliver(self, job: dict):
+        if self.mock:
+            logger.info(f"Email mock - To: {job['to']}, Subject: {job['subject']}")
+            return
+
+        message = build_message(self.from_email, job["to"], job["subject"], job["body"], job.get("qr_image"))
+        smtp = await self._get_connection()
+        try:
+            await smtp.send_message(message)
+        except aiosmtplib.SMTPServerDisconnected:
+            # The pooled connection went stale between batches; reconnect once and resend
+            await self._close_connection()
+            smtp = await self._get_connection()
+            await smtp.send_message(message)
+        logger.info(f"✉️  Email sent to {job['to']}")
+
+    async def _record_failure(self, job: dict, error: Exception):
+        attempts = job.get("attempts", 0) + 1
+        if isinstance(error, (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError, OSError)):
+            await self._close_connection()
+
+        if attempts >= self.max_attempts:
+            self.stats["failed"] += 1
+            logger.error(f"Email to {job['to']} failed permanently after {attempts} attempts: {error}")
+            update = {"status": "failed", "locked_until": None}
+        else:
+            self.stats["retried"] += 1
+            delay = min(self.backoff_seconds * (2 ** (attempts - 1)), self.max_backoff_seconds)
+            logger.warning(f"Email to {job['to']} failed (attempt {attempts}), retrying in {delay:.0f}s: {error}")
+            update = {
+                "status": "pending",
+                "locked_until": None,
+                "next_attempt_at": (_now() + timedelta(seconds=delay)).isoformat(),
+            }
+        update["last_error"] = str(error)
+        await self.db[OUTBOX_COLLECTION].update_one({"id": job["id"]}, {"$set": update, "$inc": {"attempts": 1}})
+
+    async def _get_connection(self) -> aiosmtplib.SMTP:
+        if self._smtp is not None and self._smtp.is_connected:
+            return self._smtp
+
+        self.stats["reconnects"] += 1
+        smtp = aiosmtplib.SMTP(hostname=self.hostname, port=self.port, start_tls=self.start_tls)
+        await smtp.connect()
+        if self.username and self.password:
+            await smtp.login(self.username, self.password)
+        self._smtp = smtp
+        return smtp
+
+    async def _close_connection(self):
+        if self._smtp is None:
+            return
+        smtp, self._smtp = self._smtp, None
+        try:
+            if smtp.is_connected:
+                await smtp.quit()
+        except Exception:
+            smtp.close()
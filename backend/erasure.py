@@ -0,0 +1,279 @@
+"""
+Asynchronous erasure of a user's data (GDPR right to be forgotten).
+
+``request_erasure`` marks the user as pending deletion, so they can no longer
+sign in, and queues a job in ``erasure_jobs``. ``ErasureWorker`` runs the job
+in the background. Each step deletes the user's documents from one
+collection in batches of ``batch_size``, pausing between batches so a heavy
+user does not swamp the primary. Progress is written to the job after every
+batch. Every step is idempotent, so a job whose worker died is picked up
+again once its lease expires and resumes at the first unfinished step.
+
+The user can no longer authenticate, so ``request_erasure`` hands out a
+random status token instead; only its hash is stored on the job, and
+``check_status_token`` verifies it when the user polls the job.
+
+When the steps are done, ``verify_erasure`` counts what is left in every
+collection. A clean report completes the job. Otherwise the steps run again,
+up to ``max_attempts`` times.
+"""
+
+import asyncio
+import hashlib
+import logging
+import re
+import secrets
+import uuid
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from notification_counters import decrement_unread
+from schedule import release_slots
+
+logger = logging.getLogger(__name__)
+
+ERASURE_COLLECTION = "erasure_jobs"
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def _queries(job: dict) -> dict:
+    """Step name -> (collection, filter matching the user's remaining documents), in deletion order"""
+    user_id = job["user_id"]
+    return {
+        "bookings": ("bookings", {"user_id": user_id}),
+        "notifications": ("notifications", {"user_id": user_id}),
+        "qr_codes": ("qr_codes", {"user_id": user_id}),
+        "email_outbox": ("email_outbox", {"to": job["email"]}),
+        "idempotency_keys": ("idempotency_keys", {"key": {"$regex": f"^{re.escape(user_id)}:"}}),
+        "notification_counters": ("notification_counters", {"user_id": user_id}),
+        "refresh_tokens": ("refresh_tokens", {"user_id": user_id}),
+        # The account goes last so an interrupted job can still be traced back to it
+        "users": ("users", {"id": user_id}),
+    }
+
+
+STEPS = list(_queries({"user_id": "", "email": ""}))
+
+
+def _hash_status_token(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def check_status_token(job: dict, token: Optional[str]) -> bool:
+    """Whether ``token`` is the status token handed out with ``job``"""
+    expected = job.get("status_token_hash")
+    return bool(token and expected) and secrets.compare_digest(_hash_status_token(token), expected)
+
+
+async def request_erasure(db, user: dict) -> dict:
+    """Mark ``user`` as pending deletion and queue (or return the already queued) erasure job.
+
+    The returned job carries a new ``status_token``; any token handed out
+    before for the same job stops working.
+    """
+    now = _now().isoformat()
+    status_token = secrets.token_urlsafe(32)
+    await db.users.update_one(
+        {"id": user["id"]},
+        {"$set": {"deletion_pending": True, "deletion_requested_at": now}},
+    )
+    job = {
+        "id": str(uuid.uuid4()),
+        "user_id": user["id"],
+        "email": user["email"],
+        "status": "pending",
+        # Only set while the job is pending or running; a partial unique index allows one such job per user
+        "active": True,
+        "attempts": 0,
+        "progress": {step: {"deleted": 0, "done": False} for step in STEPS},
+        "report": None,
+        "locked_until": None,
+        "created_at": now,
+        "updated_at": now,
+        "completed_at": None,
+        "status_token_hash": _hash_status_token(status_token),
+    }
+    try:
+        await db[ERASURE_COLLECTION].insert_one(job)
+    except DuplicateKeyError:
+        # A request is already in flight for this user
+        job = await db[ERASURE_COLLECTION].find_one_and_update(
+            {"user_id": user["id"], "active": True},
+            {"$set": {"status_token_hash": _hash_status_token(status_token), "updated_at": now}},
+        )
+        if job is None:
+            raise
+    job.pop("_id", None)
+    return {**job, "status_token": status_token}
+
+
+async def verify_erasure(db, job: dict) -> dict:
+    """Count the user's documents left in every collection the job erases"""
+    remaining = {}
+    for step, (collection, query) in _queries(job).items():
+        remaining[step] = await db[collection].count_documents(query)
+    return {
+        "verified_at": _now().isoformat(),
+        "remaining": remaining,
+        "clean": not any(remaining.values()),
+    }
+
+
+class ErasureWorker:
+    """Background task running erasure jobs one at a time"""
+
+    def __init__(
+        self,
+        db,
+        batch_size: int = 500,
+        pause_seconds: float = 0.05,
+        max_attempts: int = 3,
+        poll_interval: float = 30.0,
+        lease_seconds: float = 120.0,
+    ):
+        self.db = db
+        self.batch_size = batch_size
+        self.pause_seconds = pause_seconds
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+
+        self.stats = {"completed": 0, "failed": 0, "deleted": 0}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+    def notify(self):
+        self._wakeup.set()
+
+    def start(self):
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+
+    async def run(self):
+        while not self._stopping:
+            try:
+                processed = await self.run_once()
+            except Exception as e:
+                logger.error(f"Erasure worker error: {e}")
+                processed = False
+            if processed:
+                continue
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+    async def run_once(self) -> bool:
+        """Claim and run one due job; returns whether there was one"""
+        job = await self._claim()
+        if job is None:
+            return False
+        await self.process(job)
+        return True
+
+    async def _claim(self) -> Optional[dict]:
+        now = _now()
+        job = await self.db[ERASURE_COLLECTION].find_one_and_update(
+            {"$or": [
+                {"status": "pending"},
+                # Jobs whose worker crashed become claimable again once the lease expires
+                {"status": "running", "locked_until": {"$lte": now.isoformat()}},
+            ]},
+            {"$set": {"status": "running", "locked_until": self._lease(now)}, "$inc": {"attempts": 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if job is not None:
+            job.pop("_id", None)
+        return job
+
+    def _lease(self, now: datetime) -> str:
+        return (now + timedelta(seconds=self.lease_seconds)).isoformat()
+
+    async def process(self, job: dict):
+        for step, (collection, query) in _queries(job).items():
+            # Jobs queued before a step was added have no progress entry for it
+            if job["progress"].get(step, {}).get("done"):
+                continue
+            await self._erase_step(job, step, collection, query)
+
+        report = await verify_erasure(self.db, job)
+        now = _now().isoformat()
+        if report["clean"]:
+            # Drop the email too; the job record must not keep personal data
+            await self.db[ERASURE_COLLECTION].update_one(
+                {"id": job["id"]},
+                {"$set": {"status": "completed", "report": report, "completed_at": now,
+                          "updated_at": now, "locked_until": None},
+                 "$unset": {"email": "", "active": ""}},
+            )
+            self.stats["completed"] += 1
+            logger.info(f"Erasure job {job['id']} completed")
+            return
+
+        retry = job["attempts"] < self.max_attempts
+        update = {"$set": {
+            "status": "pending" if retry else "failed",
+            "report": report,
+            "updated_at": now,
+            "locked_until": None,
+            **{f"progress.{step}.done": False for step in STEPS},
+        }}
+        if not retry:
+            update["$unset"] = {"active": ""}
+        await self.db[ERASURE_COLLECTION].update_one({"id": job["id"]}, update)
+        if retry:
+            self._wakeup.set()
+        else:
+            self.stats["failed"] += 1
+        logger.warning(f"Erasure job {job['id']} left data behind: {report['remaining']}")
+
+    async def _erase_step(self, job: dict, step: str, collection: str, query: dict):
+        while True:
+            batch = await self.db[collection].find(query, {"_id": 1, "id": 1, "schedule": 1, "status": 1}) \
+                .limit(self.batch_size).to_list(self.batch_size)
+            if not batch:
+                break
+            if step == "bookings":
+                await self._before_bookings_deleted(batch)
+            result = await self.db[collection].delete_many({"_id": {"$in": [doc["_id"] for doc in batch]}})
+            self.stats["deleted"] += result.deleted_count
+            await self.db[ERASURE_COLLECTION].update_one(
+                {"id": job["id"]},
+                {"$inc": {f"progress.{step}.deleted": result.deleted_count},
+                 "$set": {"locked_until": self._lease(_now()), "updated_at": _now().isoformat()}},
+            )
+            if len(batch) < self.batch_size:
+                break
+            await asyncio.sleep(self.pause_seconds)
+
+        await self.db[ERASURE_COLLECTION].update_one(
+            {"id": job["id"]}, {"$set": {f"progress.{step}.done": True, "updated_at": _now().isoformat()}})
+
+    async def _before_bookings_deleted(self, bookings: list):
+        """Free reserved slots and remove other users' notifications (e.g. admins') about these bookings"""
+        await release_slots(self.db, [b for b in bookings if b.get("status") in ("pending", "accepted")])
+        booking_ids = [b["id"] for b in bookings]
+        readers = await self.db.notifications.distinct("user_id", {"booking_id": {"$in": booking_ids}, "read": False})
+        # Delete each reader's unread ones separately and decrement by what was actually deleted,
+        # so a notification marked read meanwhile is not subtracted twice
+        for user_id in readers:
+            result = await self.db.notifications.delete_many(
+                {"booking_id": {"$in": booking_ids}, "user_id": user_id, "read": False})
+            await decrement_unread(self.db, user_id, result.deleted_count)
+        await self.db.notifications.delete_many({"booking_id": {"$in": booking_ids}})
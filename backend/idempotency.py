@@ -0,0 +1,137 @@
+"""
+Idempotency keys for retried writes.
+
+The first request carrying a given ``Idempotency-Key`` claims it by inserting
+a record into ``idempotency_keys`` (unique on the key); the handler runs and
+the response is stored on that record. A retry with the same key gets the
+stored response back instead of redoing the work. A retry arriving while the
+original is still running waits for it: on an in-process future when both
+are handled by this worker, otherwise by polling the record. Records expire
+through a TTL index, and a claim whose owner died is taken over once its
+lease runs out.
+"""
+
+import asyncio
+import hashlib
+import json
+from datetime import datetime, timezone, timedelta
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+IDEMPOTENCY_COLLECTION = "idempotency_keys"
+POLL_INTERVAL_SECONDS = 0.1
+
+
+class IdempotencyKeyReused(Exception):
+    """The key was already used for a request with a different payload"""
+
+
+class IdempotencyInProgress(Exception):
+    """The original request is still running and did not finish within the wait time"""
+
+
+def request_fingerprint(payload) -> str:
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class IdempotencyStore:
+    def __init__(self, db, ttl_seconds: float = 86400, lease_seconds: float = 30, wait_seconds: float = 10):
+        self.db = db
+        self.ttl_seconds = ttl_seconds
+        self.lease_seconds = lease_seconds
+        self.wait_seconds = wait_seconds
+        self.replays = 0
+        self._pending = {}
+
+    async def begin(self, key: str, fingerprint: str) -> Optional[dict]:
+        """Claim ``key`` for this request.
+
+        Returns ``None`` when the caller owns the key and should do the work
+        (then call ``complete`` or ``release``), or the stored
+        ``{"status_code", "body"}`` of the original request to replay.
+        """
+        pending = self._pending.get(key)
+        if pending is not None:
+            future, owner_fingerprint = pending
+            if owner_fingerprint != fingerprint:
+                raise IdempotencyKeyReused(key)
+            try:
+                stored = await asyncio.wait_for(asyncio.shield(future), self.wait_seconds)
+            except asyncio.TimeoutError:
+                raise IdempotencyInProgress(key)
+            if stored is None:
+                # The original failed and released the key; try to claim it ourselves
+                return await self.begin(key, fingerprint)
+            self.replays += 1
+            return stored
+
+        now = datetime.now(timezone.utc)
+        try:
+            await self.db[IDEMPOTENCY_COLLECTION].insert_one({
+                "key": key,
+                "fingerprint": fingerprint,
+                "status": "processing",
+                "locked_until": now + timedelta(seconds=self.lease_seconds),
+                "expires_at": now + timedelta(seconds=self.ttl_seconds),
+            })
+        except DuplicateKeyError:
+            return await self._wait_for_original(key, fingerprint)
+
+        self._claim(key, fingerprint)
+        return None
+
+    async def complete(self, key: str, status_code: int, body):
+        """Store the response of the request that owns ``key``"""
+        await self.db[IDEMPOTENCY_COLLECTION].update_one(
+            {"key": key},
+            {"$set": {"status": "completed", "status_code": status_code, "body": body},
+             "$unset": {"locked_until": ""}},
+        )
+        self._resolve(key, {"status_code": status_code, "body": body})
+
+    async def release(self, key: str):
+        """Give the key up after a failed attempt so a retry can run the request again"""
+        await self.db[IDEMPOTENCY_COLLECTION].delete_one({"key": key, "status": "processing"})
+        self._resolve(key, None)
+
+    def _claim(self, key: str, fingerprint: str):
+        self._pending[key] = (asyncio.get_running_loop().create_future(), fingerprint)
+
+    def _resolve(self, key: str, stored: Optional[dict]):
+        pending = self._pending.pop(key, None)
+        if pending is not None and not pending[0].done():
+            pending[0].set_result(stored)
+
+    async def _wait_for_original(self, key: str, fingerprint: str) -> Optional[dict]:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_seconds
+        while True:
+            stored = await self.db[IDEMPOTENCY_COLLECTION].find_one({"key": key}, {"_id": 0})
+            if stored is None:
+                # The original failed and released the key; try to claim it ourselves
+                return await self.begin(key, fingerprint)
+            if stored["fingerprint"] != fingerprint:
+                raise IdempotencyKeyReused(key)
+            if stored["status"] == "completed":
+                self.replays += 1
+                return {"status_code": stored["status_code"], "body": stored["body"]}
+            if await self._take_over_expired(key):
+                return None
+            if loop.time() >= deadline:
+                raise IdempotencyInProgress(key)
+            await asyncio.sleep(POLL_INTERVAL_SECONDS)
+
+    async def _take_over_expired(self, key: str) -> bool:
+        """Claim a record whose lease ran out (e.g. the worker crashed mid-request)"""
+        now = datetime.now(timezone.utc)
+        taken = await self.db[IDEMPOTENCY_COLLECTION].find_one_and_update(
+            {"key": key, "status": "processing", "locked_until": {"$lt": now}},
+            {"$set": {"locked_until": now + timedelta(seconds=self.lease_seconds)}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if taken is None:
+            return False
+        self._claim(key, taken["fingerprint"])
+        return True
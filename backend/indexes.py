@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+MongoDB index management.
+
+Every query shape the API issues is declared here. ``ensure_indexes`` is run
+from the app's startup event; the same module can be run as a script to
+create indexes or to report drift between the declared and actual indexes:
+
+    python indexes.py           # create missing indexes
+    python indexes.py --check   # report drift only, exit 1 if any
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+from pymongo.errors import OperationFailure
+
+logger = logging.getLogger(__name__)
+
+# collection -> indexes. Names are explicit so drift can be reported by name.
+INDEXES = {
+    "users": [
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("role", ASCENDING)], name="role"),
+    ],
+    "bookings": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        # Keyset pagination sorts on (created_at, id) newest first, optionally scoped by user or status
+        IndexModel([("created_at", DESCENDING), ("id", DESCENDING)], name="created_at_id"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="user_id_created_at_id"),
+        IndexModel([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], name="status_created_at_id"),
+    ],
+    "services": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("name", TEXT), ("description", TEXT)], name="name_description_text",
+                   weights={"name": 3, "description": 1}),
+        IndexModel([("service_type", ASCENDING), ("price", ASCENDING)], name="service_type_price"),
+        IndexModel([("provider_id", ASCENDING), ("price", ASCENDING)], name="provider_id_price"),
+        IndexModel([("price", ASCENDING)], name="price"),
+        IndexModel([("created_at", DESCENDING)], name="created_at"),
+    ],
+    "notifications": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING), ("read", ASCENDING), ("created_at", DESCENDING)], name="user_id_read_created_at"),
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_id_created_at"),
+    ],
+    "notification_counters": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_unique", unique=True),
+    ],
+    "qr_codes": [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+    ],
+    "email_outbox": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_at"),
+        IndexModel([("to", ASCENDING)], name="to"),
+    ],
+    "erasure_jobs": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id_active_unique", unique=True,
+                   partialFilterExpression={"active": True}),
+        IndexModel([("status", ASCENDING), ("locked_until", ASCENDING)], name="status_locked_until"),
+    ],
+    "provider_availability": [
+        IndexModel([("provider_id", ASCENDING)], name="provider_id_unique", unique=True),
+    ],
+    "provider_schedules": [
+        IndexModel([("provider_id", ASCENDING), ("day", ASCENDING)], name="provider_id_day_unique", unique=True),
+    ],
+    "covid_restrictions": [
+        IndexModel([("region", ASCENDING)], name="region_unique", unique=True),
+    ],
+    "refresh_tokens": [
+        IndexModel([("token_hash", ASCENDING)], name="token_hash_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "token_revocations": [
+        IndexModel([("created_at", ASCENDING)], name="created_at"),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+    "idempotency_keys": [
+        IndexModel([("key", ASCENDING)], name="key_unique", unique=True),
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0),
+    ],
+}
+
+# Options that make two indexes with the same keys behave differently
+_COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def _normalize(spec: dict) -> dict:
+    key = list(dict(spec["key"]).items())
+    normalized = {}
+    if "_fts" in dict(key) or any(direction == TEXT for _, direction in key):
+        # The server reports text indexes as _fts/_ftsx keys with the fields listed under
+        # "weights"; compare the text fields themselves and leave the rest of the key as is
+        weights = spec.get("weights") or {field: 1 for field, direction in key if direction == TEXT}
+        normalized["text_fields"] = sorted(weights)
+        if spec.get("weights"):
+            normalized["weights"] = dict(weights)
+        key = [(field, direction) for field, direction in key
+               if field not in ("_fts", "_ftsx") and direction != TEXT]
+    normalized["key"] = key
+    for option in _COMPARED_OPTIONS:
+        if spec.get(option):
+            normalized[option] = spec[option]
+    return normalized
+
+
+def _same_index(declared: dict, actual: dict) -> bool:
+    declared, actual = _normalize(declared), _normalize(actual)
+    # Some servers (and mongomock) omit text weights; only compare them when both sides have them
+    if "weights" not in declared or "weights" not in actual:
+        declared.pop("weights", None)
+        actual.pop("weights", None)
+    return declared == actual
+
+
+async def ensure_indexes(db, indexes: dict = None) -> dict:
+    """Create all declared indexes, returning the index names created per collection.
+
+    A failure on one collection (e.g. duplicates blocking a unique index) is
+    logged and does not stop the remaining collections.
+    """
+    created = {}
+    for collection, models in (indexes or INDEXES).items():
+        try:
+            created[collection] = await db[collection].create_indexes(models)
+        except OperationFailure as e:
+            logger.error(f"Index creation failed on {collection}: {e}")
+    return created
+
+
+async def index_drift(db, indexes: dict = None) -> dict:
+    """Compare declared indexes with the database.
+
+    Returns ``{collection: {"missing": [...], "changed": [...], "extra": [...]}}``
+    for every collection that differs; an empty dict means no drift.
+    """
+    drift = {}
+    for collection, models in (indexes or INDEXES).items():
+        actual = await db[collection].index_information()
+        actual.pop("_id_", None)
+        declared = {model.document["name"]: model.document for model in models}
+
+        missing = sorted(name for name in declared if name not in actual)
+        changed = sorted(
+            name for name in declared
+            if name in actual and not _same_index(declared[name], actual[name])
+        )
+        extra = sorted(name for name in actual if name not in declared)
+
+        if missing or changed or extra:
+            drift[collection] = {"missing": missing, "changed": changed, "extra": extra}
+    return drift
+
+
+async def main(check_only: bool) -> int:
+    from dotenv import load_dotenv
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    load_dotenv()
+    client = AsyncIOMotorClient(os.environ['MONGO_URL'])
+    db = client[os.environ['DB_NAME']]
+    try:
+        if not check_only:
+            created = await ensure_indexes(db)
+            for collection, names in created.items():
+                print(f"✅ {collection}: {', '.join(names)}")
+
+        drift = await index_drift(db)
+        if not drift:
+            print("✨ Indexes match the declared set")
+            return 0
+
+        for collection, report in drift.items():
+            print(f"⚠️  {collection}:")
+            for kind in ("missing", "changed", "extra"):
+                if report[kind]:
+                    print(f"   {kind}: {', '.join(report[kind])}")
+        return 1
+    finally:
+        client.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Create MongoDB indexes or report drift")
+    parser.add_argument("--check", action="store_true", help="only report drift, do not create indexes")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.check)))
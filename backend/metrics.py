@@ -0,0 +1,281 @@
+"""
+Lightweight in-process metrics with Prometheus text exposition.
+
+Provides counters, gauges and fixed-bucket histograms, an ASGI middleware
+recording per-route latency together with the MongoDB time spent inside each
+request (via PyMongo command monitoring), an event-loop lag monitor and a
+``timed`` decorator for hot helpers. Recording is a dict lookup plus a
+bisect, so it is cheap enough to leave on in production.
+"""
+
+import abc
+import asyncio
+import contextvars
+import functools
+import inspect
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+from pymongo import monitoring
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+def _format_labels(labelnames: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class _Metric(abc.ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._samples()
+
+    @abc.abstractmethod
+    def _samples(self) -> Iterable[str]:
+        """Sample lines of the exposition, without the HELP and TYPE headers"""
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self):
+        for key, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Gauge(_Metric):
+    """A gauge set directly or, with ``function``, read at scrape time"""
+
+    kind = "gauge"
+
+    def __init__(self, *args, function: Optional[Callable[[], float]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.function = function
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def set(self, value: float, **labels):
+        self._values[self._key(labels)] = value
+
+    def _samples(self):
+        if self.function is not None:
+            yield f"{self.name} {self.function()}"
+            return
+        for key, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {value}"
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Tuple[float, ...] = LATENCY_BUCKETS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.buckets = tuple(buckets)
+        # key -> [per-bucket counts (+Inf last), sum, count]
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self):
+        for key, (counts, total, count) in list(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}"
+            yield f"{self.name}_count{_format_labels(self.labelnames, key)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Iterable[str] = (), function=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, function=function))
+
+    def histogram(self, name: str, documentation: str, labelnames: Iterable[str] = (), buckets=LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets=buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+http_requests = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route, method and status", ("route", "method", "status"))
+http_request_seconds = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("route", "method"))
+http_request_db_seconds = REGISTRY.histogram(
+    "http_request_db_seconds", "MongoDB time spent inside each request", ("route", "method"))
+http_request_db_operations = REGISTRY.histogram(
+    "http_request_db_operations", "MongoDB commands issued by each request", ("route", "method"), buckets=COUNT_BUCKETS)
+mongo_command_seconds = REGISTRY.histogram(
+    "mongo_command_duration_seconds", "MongoDB command latency by command and collection", ("command", "collection"))
+mongo_command_failures = REGISTRY.counter(
+    "mongo_command_failures_total", "Failed MongoDB commands", ("command",))
+event_loop_lag_seconds = REGISTRY.histogram(
+    "event_loop_lag_seconds", "How late the event loop ran a scheduled wake-up")
+function_seconds = REGISTRY.histogram(
+    "function_duration_seconds", "Time spent in instrumented helpers", ("function",))
+
+
+class _RequestStats:
+    __slots__ = ("db_operations", "db_seconds")
+
+    def __init__(self):
+        self.db_operations = 0
+        self.db_seconds = 0.0
+
+
+# Motor copies the context into its executor threads, so command events can be
+# attributed to the request that issued them
+_current_request: contextvars.ContextVar[Optional[_RequestStats]] = contextvars.ContextVar("metrics_request", default=None)
+
+
+class MongoCommandListener(monitoring.CommandListener):
+    """PyMongo command monitor feeding per-command and per-request DB metrics"""
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        command = event.command
+        collection = command.get(event.command_name)
+        self._collections[event.request_id] = collection if isinstance(collection, str) else ""
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        mongo_command_failures.inc(command=event.command_name)
+        self._record(event)
+
+    def _record(self, event):
+        seconds = event.duration_micros / 1_000_000
+        collection = self._collections.pop(event.request_id, "")
+        mongo_command_seconds.observe(seconds, command=event.command_name, collection=collection)
+        stats = _current_request.get()
+        if stats is not None:
+            stats.db_operations += 1
+            stats.db_seconds += seconds
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency, status and DB usage per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = _RequestStats()
+        token = _current_request.set(stats)
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            _current_request.reset(token)
+            # Label by route template so ids in paths do not explode cardinality
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            method = scope["method"]
+            http_requests.inc(route=path, method=method, status=status_code)
+            http_request_seconds.observe(elapsed, route=path, method=method)
+            http_request_db_seconds.observe(stats.db_seconds, route=path, method=method)
+            http_request_db_operations.observe(stats.db_operations, route=path, method=method)
+
+
+async def monitor_event_loop_lag(interval_seconds: float = 0.5):
+    """Background task measuring how late the loop wakes up from a fixed sleep"""
+    loop = asyncio.get_running_loop()
+    while True:
+        expected = loop.time() + interval_seconds
+        await asyncio.sleep(interval_seconds)
+        event_loop_lag_seconds.observe(max(0.0, loop.time() - expected))
+
+
+def timed(name: str):
+    """Record the wall time of a sync or async function under ``function_duration_seconds``"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    function_seconds.observe(time.perf_counter() - started, function=name)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                function_seconds.observe(time.perf_counter() - started, function=name)
+        return wrapper
+    return decorator
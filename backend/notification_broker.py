@@ -0,0 +1,144 @@
+"""
+Real-time notification fan-out.
+
+``create_notification`` publishes every new notification to a broker, and
+each open ``/api/notifications/stream`` connection subscribes to the
+notifications of its user. ``InMemoryBroker`` delivers within one process.
+``ChangeStreamRelay`` feeds it from a MongoDB change stream instead, so that
+notifications written by any worker reach subscribers on every worker.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Queued in place of the backlog when a subscriber falls too far behind;
+# the client should refetch /api/notifications.
+RESYNC_EVENT = {"type": "resync"}
+# Published when some of a user's sessions were revoked, so their streams
+# re-check their own session at once instead of at the next heartbeat
+SESSION_EVENT = {"type": "session"}
+
+
+class Subscription:
+    """A single stream's queue of pending events"""
+
+    def __init__(self, broker: "InMemoryBroker", user_id: str, max_queue: int):
+        self.broker = broker
+        self.user_id = user_id
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+
+    def push(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow consumer: drop the backlog rather than buffering without bound
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_EVENT)
+
+    async def get(self, timeout: float) -> Optional[dict]:
+        """Next event, or None if nothing arrived within ``timeout`` seconds"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout=timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class InMemoryBroker:
+    """In-process pub/sub keyed by user id"""
+
+    def __init__(self, max_queue: int = 100):
+        self.max_queue = max_queue
+        self.published = 0
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, user_id: str) -> Subscription:
+        subscription = Subscription(self, user_id, self.max_queue)
+        self._subscribers[user_id].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscribers = self._subscribers.get(subscription.user_id)
+        if subscribers is None:
+            return
+        subscribers.discard(subscription)
+        if not subscribers:
+            del self._subscribers[subscription.user_id]
+
+    def publish(self, user_id: str, event: dict):
+        self.published += 1
+        for subscription in list(self._subscribers.get(user_id, ())):
+            subscription.push(event)
+
+    def stats(self) -> dict:
+        return {
+            "users": len(self._subscribers),
+            "subscriptions": sum(len(subs) for subs in self._subscribers.values()),
+            "published": self.published,
+        }
+
+
+class ChangeStreamRelay:
+    """Publish notification inserts seen on a MongoDB change stream to a local broker.
+
+    Change streams need a replica set; on a standalone server ``start``
+    returns False and callers should publish to the broker directly.
+    """
+
+    def __init__(self, db, broker: InMemoryBroker, retry_seconds: float = 5.0):
+        self.db = db
+        self.broker = broker
+        self.retry_seconds = retry_seconds
+        self.active = False
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> bool:
+        try:
+            hello = await self.db.client.admin.command("hello")
+        except Exception as e:
+            logger.warning(f"Notification change stream unavailable, using in-process delivery: {e}")
+            return False
+        if "setName" not in hello and hello.get("msg") != "isdbgrid":
+            logger.warning("MongoDB is not a replica set, using in-process notification delivery")
+            return False
+
+        self.active = True
+        self._task = asyncio.create_task(self._run())
+        return True
+
+    async def stop(self):
+        self.active = False
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                async with self.db.notifications.watch([{"$match": {"operationType": "insert"}}]) as stream:
+                    async for change in stream:
+                        notification = change["fullDocument"]
+                        notification.pop("_id", None)
+                        self.broker.publish(notification["user_id"], notification)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Notification change stream error, reopening: {e}")
+                await asyncio.sleep(self.retry_seconds)
@@ -0,0 +1,107 @@
+"""
+Materialized unread-notification counters.
+
+One document per user in ``notification_counters`` holds the number of
+unread notifications, so the bell's badge is a single indexed read instead
+of a ``count_documents`` over the user's whole notification history. The
+counters are kept in step by the notification endpoints and periodically
+repaired by ``reconcile_unread_counters``.
+
+A user's counter is created on first use by counting their unread
+notifications, so users who had notifications before counters existed start
+from the right number. The increments run after the new notifications are
+inserted; a counter created from such a count already includes them, so it
+is not incremented again.
+"""
+
+import asyncio
+import logging
+from collections import Counter
+
+from pymongo import UpdateOne
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_COLLECTION = "notification_counters"
+
+
+async def _backfill(db, user_id: str) -> int:
+    """Create a missing counter from the user's unread notifications; returns its value"""
+    unread = await db.notifications.count_documents({"user_id": user_id, "read": False})
+    await db[COUNTERS_COLLECTION].update_one({"user_id": user_id}, {"$setOnInsert": {"unread": unread}}, upsert=True)
+    return unread
+
+
+async def increment_unread(db, user_id: str, amount: int = 1):
+    """Count ``amount`` new unread notifications; call after inserting them"""
+    result = await db[COUNTERS_COLLECTION].update_one({"user_id": user_id}, {"$inc": {"unread": amount}})
+    if not result.matched_count:
+        await _backfill(db, user_id)
+
+
+async def increment_unread_many(db, user_ids: list):
+    """Increment several users' counters in one unordered bulk write; call after inserting the notifications"""
+    if not user_ids:
+        return
+    counts = Counter(user_ids)
+    existing = set()
+    async for counter in db[COUNTERS_COLLECTION].find({"user_id": {"$in": list(counts)}}, {"_id": 0, "user_id": 1}):
+        existing.add(counter["user_id"])
+    if existing:
+        await db[COUNTERS_COLLECTION].bulk_write(
+            [UpdateOne({"user_id": user_id}, {"$inc": {"unread": counts[user_id]}}) for user_id in existing],
+            ordered=False,
+        )
+    for user_id in counts.keys() - existing:
+        await _backfill(db, user_id)
+
+
+async def decrement_unread(db, user_id: str, amount: int = 1):
+    if amount:
+        await db[COUNTERS_COLLECTION].update_one({"user_id": user_id}, {"$inc": {"unread": -amount}})
+
+
+async def get_unread_count(db, user_id: str) -> int:
+    """Read the counter, backfilling it from the notifications if it does not exist yet"""
+    counter = await db[COUNTERS_COLLECTION].find_one({"user_id": user_id}, {"_id": 0, "unread": 1})
+    if counter is not None:
+        return max(counter["unread"], 0)
+    return await _backfill(db, user_id)
+
+
+async def reconcile_unread_counters(db) -> int:
+    """Recount unread notifications and repair any counter that has drifted.
+
+    Returns the number of counters corrected. A notification written while
+    this runs can leave a counter off by one until the next pass.
+    """
+    actual = {}
+    async for row in db.notifications.aggregate([
+        {"$match": {"read": False}},
+        {"$group": {"_id": "$user_id", "unread": {"$sum": 1}}},
+    ]):
+        actual[row["_id"]] = row["unread"]
+
+    fixes = []
+    async for counter in db[COUNTERS_COLLECTION].find({}, {"_id": 0, "user_id": 1, "unread": 1}):
+        expected = actual.pop(counter["user_id"], 0)
+        if counter["unread"] != expected:
+            fixes.append(UpdateOne({"user_id": counter["user_id"]}, {"$set": {"unread": expected}}))
+    # Users with unread notifications but no counter yet
+    for user_id, unread in actual.items():
+        fixes.append(UpdateOne({"user_id": user_id}, {"$set": {"unread": unread}}, upsert=True))
+
+    if fixes:
+        await db[COUNTERS_COLLECTION].bulk_write(fixes, ordered=False)
+        logger.info(f"Repaired {len(fixes)} unread notification counters")
+    return len(fixes)
+
+
+async def run_reconciliation(db, interval_seconds: float):
+    """Background loop calling ``reconcile_unread_counters`` every ``interval_seconds``"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            await reconcile_unread_counters(db)
+        except Exception as e:
+            logger.error(f"Unread counter reconciliation failed: {e}")
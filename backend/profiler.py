@@ -0,0 +1,268 @@
+"""
+Opt-in sampling profiler for slow requests.
+
+``ProfilerMiddleware`` picks a fraction of requests and registers their task
+with a single ``StackSampler`` thread. Every few milliseconds the sampler
+records where each registered request is: the event loop thread's Python
+stack when the request's coroutine is the one running, otherwise the chain
+of coroutines it is suspended in (shown with a ``[waiting]`` leaf, e.g. on
+Mongo, SMTP or a worker pool). Samples are wall-clock, so the resulting
+flamegraph shows where a request's latency went, not just its CPU time.
+
+Requests that finish above the latency threshold are written to
+``ProfileStore`` as collapsed stacks, which can be downloaded as-is (for
+``flamegraph.pl``/speedscope) or converted to speedscope JSON.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+WAITING_FRAME = "[waiting]"
+PROFILE_ID_PATTERN = re.compile(r"[0-9a-f]{32}")
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_qualname} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _coroutine_frames(coro) -> list:
+    """Frames of a suspended coroutine and everything it is awaiting, outermost first.
+
+    ``Task.get_stack`` only returns the top frame of a suspended task, so the
+    ``await`` chain is followed by hand.
+    """
+    frames = []
+    while coro is not None:
+        frame = getattr(coro, "cr_frame", None) or getattr(coro, "gi_frame", None) or getattr(coro, "ag_frame", None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coro = getattr(coro, "cr_await", None) or getattr(coro, "gi_yieldfrom", None) or getattr(coro, "ag_await", None)
+    return frames
+
+
+class _ActiveProfile:
+    __slots__ = ("task", "samples")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.samples = Counter()
+
+
+class StackSampler:
+    """Background thread sampling the stacks of registered request tasks"""
+
+    def __init__(self, interval_seconds: float = 0.005):
+        self.interval_seconds = interval_seconds
+        self._active = {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread: Optional[threading.Thread] = None
+        self._loop_thread_id: Optional[int] = None
+
+    def register(self, task: asyncio.Task) -> _ActiveProfile:
+        profile = _ActiveProfile(task)
+        with self._lock:
+            self._active[id(profile)] = profile
+            if self._thread is None:
+                self._loop_thread_id = threading.get_ident()
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+        self._wake.set()
+        return profile
+
+    def unregister(self, profile: _ActiveProfile):
+        with self._lock:
+            self._active.pop(id(profile), None)
+
+    def stop(self):
+        self._stopped = True
+        self._wake.set()
+
+    def _run(self):
+        while not self._stopped:
+            # Sleep until a request is registered so the thread costs nothing while idle
+            self._wake.wait()
+            # Held for the whole pass so a profile is never written to after unregister returns
+            with self._lock:
+                if not self._active:
+                    self._wake.clear()
+                    continue
+                loop_stack = self._thread_stack(sys._current_frames().get(self._loop_thread_id))
+                for profile in self._active.values():
+                    stack = self._task_stack(profile.task, loop_stack)
+                    if stack:
+                        profile.samples[";".join(stack)] += 1
+            time.sleep(self.interval_seconds)
+
+    @staticmethod
+    def _thread_stack(frame) -> list:
+        frames = []
+        while frame is not None:
+            frames.append(frame)
+            frame = frame.f_back
+        frames.reverse()
+        return frames
+
+    @staticmethod
+    def _task_stack(task: asyncio.Task, loop_stack: list) -> List[str]:
+        coroutine_frames = _coroutine_frames(task.get_coro())
+        if not coroutine_frames:
+            return []
+        root = coroutine_frames[0]
+        for index, frame in enumerate(loop_stack):
+            if frame is root:
+                # The request is running right now: the loop thread's stack from its root coroutine down
+                return [_frame_label(f) for f in loop_stack[index:]]
+        return [_frame_label(f) for f in coroutine_frames] + [WAITING_FRAME]
+
+
+class ProfileStore:
+    """Keeps the newest ``max_profiles`` slow-request profiles as JSON files in ``directory``"""
+
+    def __init__(self, directory: Path, max_profiles: int = 200):
+        self.directory = Path(directory)
+        self.max_profiles = max_profiles
+
+    def save(self, metadata: dict, samples: Counter) -> str:
+        self.directory.mkdir(parents=True, exist_ok=True)
+        profile_id = uuid.uuid4().hex
+        profile = {**metadata, "id": profile_id, "stacks": dict(samples)}
+        path = self.directory / f"{profile_id}.json"
+        tmp_path = path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps(profile))
+        tmp_path.replace(path)
+        self._prune()
+        return profile_id
+
+    def _files(self) -> list:
+        if not self.directory.exists():
+            return []
+        return sorted(self.directory.glob("*.json"), key=lambda p: p.stat().st_mtime, reverse=True)
+
+    def _prune(self):
+        for path in self._files()[self.max_profiles:]:
+            path.unlink(missing_ok=True)
+
+    def list(self, limit: int = 50) -> list:
+        """Metadata of the most recent profiles, newest first"""
+        profiles = []
+        for path in self._files()[:limit]:
+            try:
+                profile = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            profile.pop("stacks", None)
+            profiles.append(profile)
+        return profiles
+
+    def load(self, profile_id: str) -> Optional[dict]:
+        if not PROFILE_ID_PATTERN.fullmatch(profile_id):
+            return None
+        path = self.directory / f"{profile_id}.json"
+        try:
+            return json.loads(path.read_text())
+        except (OSError, ValueError):
+            return None
+
+
+def to_collapsed(profile: dict) -> str:
+    """Brendan Gregg's collapsed format: one ``frame;frame;frame count`` line per stack"""
+    return "".join(f"{stack} {count}\n" for stack, count in profile["stacks"].items())
+
+
+def to_speedscope(profile: dict) -> dict:
+    """A speedscope "sampled" profile; weights are milliseconds of wall time"""
+    frames, frame_index, samples, weights = [], {}, [], []
+    # Sampling slows down when the loop holds the GIL, so spread the measured duration over the samples
+    sample_ms = profile["duration_ms"] / max(profile["samples"], 1)
+    for stack, count in profile["stacks"].items():
+        sample = []
+        for name in stack.split(";"):
+            if name not in frame_index:
+                frame_index[name] = len(frames)
+                frames.append({"name": name})
+            sample.append(frame_index[name])
+        samples.append(sample)
+        weights.append(count * sample_ms)
+    name = f"{profile['method']} {profile['path']} ({profile['duration_ms']:.0f} ms)"
+    return {
+        "$schema": "https://www.speedscope.app/file-format-schema.json",
+        "name": name,
+        "exporter": "home-services-profiler",
+        "shared": {"frames": frames},
+        "profiles": [{
+            "type": "sampled",
+            "name": name,
+            "unit": "milliseconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }],
+    }
+
+
+class ProfilerMiddleware:
+    """ASGI middleware profiling ``sample_rate`` of requests and keeping those slower than ``threshold_seconds``"""
+
+    def __init__(self, app, sampler: StackSampler, store: ProfileStore,
+                 sample_rate: float = 0.0, threshold_seconds: float = 1.0):
+        self.app = app
+        self.sampler = sampler
+        self.store = store
+        self.sample_rate = sample_rate
+        self.threshold_seconds = threshold_seconds
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or self.sample_rate <= 0 or random.random() >= self.sample_rate:
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        profile = self.sampler.register(asyncio.current_task())
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.sampler.unregister(profile)
+            if elapsed >= self.threshold_seconds and profile.samples:
+                route = scope.get("route")
+                metadata = {
+                    "created_at": datetime.now(timezone.utc).isoformat(),
+                    "method": scope["method"],
+                    "path": scope["path"],
+                    "route": getattr(route, "path", None),
+                    "status": status_code,
+                    "duration_ms": elapsed * 1000,
+                    "samples": sum(profile.samples.values()),
+                    "interval_seconds": self.sampler.interval_seconds,
+                }
+                try:
+                    await asyncio.to_thread(self.store.save, metadata, profile.samples)
+                except OSError as e:
+                    logger.error(f"Failed to save request profile: {e}")
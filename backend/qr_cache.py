@@ -0,0 +1,85 @@
+"""
+Content-addressed cache for booking QR codes.
+
+A receipt QR code is fully determined by its text, so PNGs are keyed by the
+SHA-256 of that text. Lookups go to an in-process LRU first, then to the
+``qr_codes`` collection (the PNGs are a few KB, well under the document
+size limit, so a plain collection is used instead of GridFS). Misses are
+rendered on a worker pool so PIL encoding never runs on the event loop, and
+concurrent misses for the same key share a single render.
+"""
+
+import asyncio
+import hashlib
+from concurrent.futures import Executor
+from datetime import datetime, timezone
+from typing import Callable, Optional
+
+from cache import TTLCache
+
+QR_COLLECTION = "qr_codes"
+
+
+def qr_key(data: str) -> str:
+    return hashlib.sha256(data.encode()).hexdigest()
+
+
+class QRCodeCache:
+    def __init__(self, db, render: Callable[[str], bytes], executor: Executor, max_entries: int = 1024):
+        self.db = db
+        self.render = render
+        self.executor = executor
+        self.memory = TTLCache(max_entries=max_entries, ttl_seconds=float("inf"))
+        self.renders = 0
+        self.store_hits = 0
+        self._pending = {}
+
+    async def get_png(self, data: str, metadata: Optional[dict] = None) -> bytes:
+        """PNG bytes for ``data``; ``metadata`` (e.g. booking/user ids) is stored alongside new entries"""
+        key = qr_key(data)
+        png = self.memory.get(key)
+        if png is not None:
+            return png
+
+        pending = self._pending.get(key)
+        if pending is not None:
+            return await asyncio.shield(pending)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[key] = future
+        try:
+            png = await self._load_or_render(key, data, metadata or {})
+            self.memory.set(key, png)
+            future.set_result(png)
+            return png
+        except Exception as e:
+            future.set_exception(e)
+            # Nobody else may be waiting; retrieve it so asyncio does not log it as unhandled
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+    async def _load_or_render(self, key: str, data: str, metadata: dict) -> bytes:
+        stored = await self.db[QR_COLLECTION].find_one({"key": key}, {"_id": 0, "png": 1})
+        if stored is not None:
+            self.store_hits += 1
+            return bytes(stored["png"])
+
+        loop = asyncio.get_running_loop()
+        png = await loop.run_in_executor(self.executor, self.render, data)
+        self.renders += 1
+        await self.db[QR_COLLECTION].update_one(
+            {"key": key},
+            {"$setOnInsert": {
+                "key": key,
+                "png": png,
+                "created_at": datetime.now(timezone.utc).isoformat(),
+                **metadata,
+            }},
+            upsert=True,
+        )
+        return png
+
+    def stats(self) -> dict:
+        return {**self.memory.stats(), "store_hits": self.store_hits, "renders": self.renders}
@@ -0,0 +1,140 @@
+"""
+Read-through cache of serialized responses, invalidated by version bumps.
+
+Entries are keyed by a scope (e.g. a user id), that scope's current version
+and a hash of the request parameters. A write bumps the scope's version, so
+every response cached for the scope becomes unreachable at once and simply
+ages out. Readers never see data older than the last bump they could observe.
+
+The backend only needs the ``get``, ``set(ex=, nx=)``, ``incr`` and
+``delete`` calls of ``redis.asyncio.Redis``: ``MemoryBackend`` provides them
+over an in-process LRU, and a Redis client (or a fake with the same methods)
+can be passed in instead so all workers share entries and versions.
+"""
+
+import hashlib
+import json
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+# Versions outlive the entries they guard; one that is evicted anyway restarts
+# from the clock (see ``ResponseCache.version``), so old entries stay unreachable
+VERSION_TTL_SECONDS = 7 * 86400
+
+
+class MemoryBackend:
+    """In-process LRU speaking the subset of the Redis API used by ``ResponseCache``.
+
+    Entries are per worker process: a bump made by another worker is not seen
+    here, so keep the TTL short or use Redis when running several workers.
+    """
+
+    def __init__(self, max_entries: int = 10000):
+        self._entries = TTLCache(max_entries=max_entries, ttl_seconds=VERSION_TTL_SECONDS)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self._entries.get(key)
+
+    async def set(self, key: str, value, ex: Optional[int] = None, nx: bool = False) -> Optional[bool]:
+        if nx and self._entries.get(key) is not None:
+            return None
+        self._entries.set(key, value if isinstance(value, bytes) else str(value).encode(), ex)
+        return True
+
+    async def incr(self, key: str) -> int:
+        value = int(self._entries.get(key) or 0) + 1
+        self._entries.set(key, str(value).encode())
+        return value
+
+    async def delete(self, key: str) -> int:
+        found = self._entries.get(key) is not None
+        self._entries.invalidate(key)
+        return int(found)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def redis_backend(url: str):
+    """A ``redis.asyncio`` client for ``url``; needs the optional ``redis`` package"""
+    import redis.asyncio as redis
+    return redis.Redis.from_url(url)
+
+
+class ResponseCache:
+    def __init__(self, backend, namespace: str, ttl_seconds: int):
+        self.backend = backend
+        self.namespace = namespace
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+
+    def _version_key(self, scope: str) -> str:
+        return f"{self.namespace}:{scope}:version"
+
+    async def version(self, scope: str) -> int:
+        key = self._version_key(scope)
+        value = await self.backend.get(key)
+        if value is None:
+            # Start past any version this scope may have had before its key was lost
+            await self.backend.set(key, time.time_ns(), ex=VERSION_TTL_SECONDS, nx=True)
+            value = await self.backend.get(key)
+        return int(value)
+
+    async def bump(self, scope: str):
+        """Invalidate every response cached for ``scope``; call after the write has been applied"""
+        if self.ttl_seconds <= 0:
+            return
+        key = self._version_key(scope)
+        try:
+            if await self.backend.get(key) is None:
+                await self.version(scope)
+            await self.backend.incr(key)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Response cache bump for {scope} failed: {e}")
+
+    async def get_or_set(self, scope: str, params: dict, render: Callable[[], Awaitable[bytes]]) -> bytes:
+        """The cached response for ``scope`` and ``params``, rendering and storing it on a miss.
+
+        Backend errors are logged and the response is rendered uncached.
+        """
+        if self.ttl_seconds <= 0:
+            return await render()
+        digest = hashlib.sha256(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:32]
+        try:
+            key = f"{self.namespace}:{scope}:{await self.version(scope)}:{digest}"
+            body = await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Response cache read for {scope} failed: {e}")
+            return await render()
+        if body is not None:
+            self.hits += 1
+            return body
+
+        self.misses += 1
+        body = await render()
+        try:
+            await self.backend.set(key, body, ex=self.ttl_seconds)
+        except Exception as e:
+            self.errors += 1
+            logger.error(f"Response cache write for {scope} failed: {e}")
+        return body
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "errors": self.errors,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+        }
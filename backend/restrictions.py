@@ -0,0 +1,135 @@
+"""
+Region-aware COVID restriction levels.
+
+A ``RestrictionsProvider`` loads the raw per-region data from a JSON file or
+the ``covid_restrictions`` collection. ``RestrictionsService`` turns it into
+an immutable snapshot (a model instance and its serialized JSON per region)
+and swaps the whole snapshot in one assignment when a background refresh sees
+new data. Readers never lock: a lookup is a dict access on whichever
+snapshot is current.
+"""
+
+import abc
+import asyncio
+import hashlib
+import json
+import logging
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+RESTRICTIONS_COLLECTION = "covid_restrictions"
+
+# Served when the data has neither the requested nor the default region
+FALLBACK_RESTRICTIONS = {
+    "level": "medium",
+    "density_limits": "1 person per 4 sqm",
+    "mask_required": True,
+    "quarantine_required": False,
+    "message": "Current restrictions recommend remote services. Masks required for in-person visits.",
+}
+
+
+class RestrictionsProvider(abc.ABC):
+    @abc.abstractmethod
+    async def load(self) -> Dict[str, dict]:
+        """Restriction fields keyed by region code"""
+
+
+class FileRestrictionsProvider(RestrictionsProvider):
+    """Reads ``{"SA": {...}, "VIC": {...}}`` from a JSON file"""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+
+    async def load(self) -> Dict[str, dict]:
+        text = await asyncio.to_thread(self.path.read_text)
+        return {region.upper(): fields for region, fields in json.loads(text).items()}
+
+
+class MongoRestrictionsProvider(RestrictionsProvider):
+    """Reads one ``{"region": ..., <fields>}`` document per region"""
+
+    def __init__(self, db):
+        self.db = db
+
+    async def load(self) -> Dict[str, dict]:
+        regions = {}
+        async for doc in self.db[RESTRICTIONS_COLLECTION].find({}, {"_id": 0}):
+            regions[doc.pop("region").upper()] = doc
+        return regions
+
+
+class _Snapshot:
+    __slots__ = ("source", "restrictions", "bodies", "etags")
+
+    def __init__(self, source: Dict[str, dict], restrictions: dict, bodies: dict, etags: dict):
+        self.source = source
+        self.restrictions = restrictions
+        self.bodies = bodies
+        self.etags = etags
+
+
+class RestrictionsService:
+    def __init__(self, provider: RestrictionsProvider, model, default_region: str):
+        self.provider = provider
+        self.model = model
+        self.default_region = default_region.upper()
+        self.refreshed_at: Optional[str] = None
+        self._snapshot = self._build({})
+
+    def _build(self, source: Dict[str, dict]) -> _Snapshot:
+        loaded_at = datetime.now(timezone.utc).isoformat()
+        restrictions, bodies, etags = {}, {}, {}
+        regions = {region: {**FALLBACK_RESTRICTIONS, **fields} for region, fields in source.items()}
+        regions.setdefault(self.default_region, FALLBACK_RESTRICTIONS)
+        for region, fields in regions.items():
+            model = self.model(**{"last_updated": loaded_at, **fields})
+            body = model.model_dump_json().encode()
+            restrictions[region] = model
+            bodies[region] = body
+            etags[region] = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+        return _Snapshot(source, restrictions, bodies, etags)
+
+    def _region(self, region: Optional[str]) -> str:
+        region = (region or self.default_region).upper()
+        return region if region in self._snapshot.restrictions else self.default_region
+
+    def get(self, region: Optional[str] = None):
+        """Restrictions for ``region``, falling back to the default region"""
+        return self._snapshot.restrictions[self._region(region)]
+
+    def get_serialized(self, region: Optional[str] = None) -> tuple:
+        """``(json bytes, etag)`` for ``region``, read from the same snapshot"""
+        snapshot = self._snapshot
+        region = self._region(region)
+        return snapshot.bodies[region], snapshot.etags[region]
+
+    def regions(self) -> list:
+        return sorted(self._snapshot.restrictions)
+
+    async def refresh(self) -> bool:
+        """Reload the data and swap in a new snapshot if it changed; errors keep the current one"""
+        try:
+            source = await self.provider.load()
+        except Exception as e:
+            logger.error(f"Loading COVID restrictions failed: {e}")
+            return False
+        if source == self._snapshot.source:
+            return False
+        try:
+            snapshot = self._build(source)
+        except Exception as e:
+            logger.error(f"Invalid COVID restrictions data: {e}")
+            return False
+        self._snapshot = snapshot
+        self.refreshed_at = datetime.now(timezone.utc).isoformat()
+        return True
+
+    async def run(self, interval_seconds: float):
+        """Background loop calling ``refresh`` every ``interval_seconds``"""
+        while True:
+            await asyncio.sleep(interval_seconds)
+            await self.refresh()
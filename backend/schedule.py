@@ -0,0 +1,223 @@
+"""
+Provider availability and conflict-free slot reservation.
+
+Each provider has a set of weekly availability windows (one document in
+``provider_availability``). Reserved time lives in ``provider_schedules``:
+one document per provider and day holding that day's booked intervals,
+sorted by start, plus a version number. An overlap check is a bisect over
+that list, and a reservation is an optimistic write conditioned on the
+version it read, retried when another booking got there first. Because a
+provider's bookings are split by day, the work per reservation stays
+constant no matter how many bookings the provider has in total.
+
+Times are minutes since midnight in the schedule's wall-clock time, one
+timezone shared by every provider (``tz`` below). ``preferred_date`` is read
+the same way unless it carries a UTC offset, in which case it is converted.
+"""
+
+import re
+from bisect import bisect_right
+from collections import defaultdict
+from datetime import date, datetime, timedelta, tzinfo
+from typing import Dict, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+AVAILABILITY_COLLECTION = "provider_availability"
+SCHEDULE_COLLECTION = "provider_schedules"
+MAX_RESERVE_ATTEMPTS = 5
+MINUTES_PER_DAY = 24 * 60
+TIME_PATTERN = re.compile(r"^([01]\d|2[0-3]):([0-5]\d)$|^24:00$")
+DATE_ONLY_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+
+class InvalidAvailability(ValueError):
+    pass
+
+
+class SlotUnavailable(Exception):
+    pass
+
+
+def parse_time(value: str) -> int:
+    """``"HH:MM"`` to minutes since midnight (``"24:00"`` allowed as an end time)"""
+    if not TIME_PATTERN.match(value):
+        raise InvalidAvailability(f"Invalid time {value!r}, expected HH:MM")
+    hours, minutes = value.split(":")
+    return int(hours) * 60 + int(minutes)
+
+
+def format_window(window: dict) -> dict:
+    return {
+        "weekday": window["weekday"],
+        "start": f"{window['start'] // 60:02d}:{window['start'] % 60:02d}",
+        "end": f"{window['end'] // 60:02d}:{window['end'] % 60:02d}",
+    }
+
+
+def format_time(day: date, minutes: int) -> str:
+    return (datetime.combine(day, datetime.min.time()) + timedelta(minutes=minutes)).isoformat(timespec="minutes")
+
+
+def normalize_windows(windows: List[dict]) -> List[dict]:
+    """Validate ``{"weekday", "start", "end"}`` windows and return them sorted.
+
+    ``weekday`` is 0 (Monday) to 6 (Sunday); windows on the same day must not overlap.
+    """
+    normalized = []
+    for window in windows:
+        start, end = parse_time(window["start"]), parse_time(window["end"])
+        if start >= end:
+            raise InvalidAvailability(f"Window {window['start']}-{window['end']} ends before it starts")
+        normalized.append({"weekday": window["weekday"], "start": start, "end": end})
+    normalized.sort(key=lambda w: (w["weekday"], w["start"]))
+    for previous, current in zip(normalized, normalized[1:]):
+        if previous["weekday"] == current["weekday"] and current["start"] < previous["end"]:
+            raise InvalidAvailability(f"Overlapping windows on weekday {current['weekday']}")
+    return normalized
+
+
+def parse_slot(preferred_date: str, duration: int, tz: tzinfo) -> Tuple[date, int, int]:
+    """``(day, start, end)`` for a booking; raises ``ValueError`` if it is not a time on a single day"""
+    if DATE_ONLY_PATTERN.match(preferred_date):
+        raise ValueError("This service is booked by time slot: preferred_date needs a start time (YYYY-MM-DDTHH:MM)")
+    try:
+        start_at = datetime.fromisoformat(preferred_date)
+    except ValueError:
+        raise ValueError("preferred_date must be an ISO date and time (YYYY-MM-DDTHH:MM)")
+    if start_at.tzinfo is not None:
+        start_at = start_at.astimezone(tz)
+    start = start_at.hour * 60 + start_at.minute
+    end = start + duration
+    if duration <= 0 or end > MINUTES_PER_DAY:
+        raise ValueError("A booking must start and end on the same day")
+    return start_at.date(), start, end
+
+
+def overlaps(intervals: List[dict], start: int, end: int) -> bool:
+    """Whether ``[start, end)`` intersects any of the sorted, disjoint ``intervals``"""
+    index = bisect_right(intervals, start, key=lambda interval: interval["start"])
+    if index and intervals[index - 1]["end"] > start:
+        return True
+    return index < len(intervals) and intervals[index]["start"] < end
+
+
+def within_availability(windows: List[dict], weekday: int, start: int, end: int) -> bool:
+    return any(w["weekday"] == weekday and w["start"] <= start and end <= w["end"] for w in windows)
+
+
+async def get_availability(db, provider_id: str) -> Optional[List[dict]]:
+    """The provider's windows, or ``None`` if the provider has no schedule"""
+    doc = await db[AVAILABILITY_COLLECTION].find_one({"provider_id": provider_id}, {"_id": 0, "windows": 1})
+    return doc["windows"] if doc else None
+
+
+async def set_availability(db, provider_id: str, windows: List[dict], updated_at: str) -> List[dict]:
+    normalized = normalize_windows(windows)
+    await db[AVAILABILITY_COLLECTION].update_one(
+        {"provider_id": provider_id},
+        {"$set": {"windows": normalized, "updated_at": updated_at}},
+        upsert=True,
+    )
+    return normalized
+
+
+async def reserve_slot(db, provider_id: str, preferred_date: str, duration: int, booking_id: str,
+                       not_before: datetime, tz: tzinfo) -> Optional[dict]:
+    """Reserve a booking's time with its provider, reading ``preferred_date`` in ``tz``.
+
+    Returns ``{"provider_id", "day", "start", "end"}`` to store on the booking,
+    or ``None`` when the provider has no availability configured (bookings are
+    then unscheduled requests, as before). Raises ``ValueError`` for an
+    unparseable time or one starting before ``not_before`` (an aware datetime),
+    and ``SlotUnavailable`` when the time is taken or outside the provider's hours.
+    """
+    windows = await get_availability(db, provider_id)
+    if windows is None:
+        return None
+
+    day, start, end = parse_slot(preferred_date, duration, tz)
+    if datetime.combine(day, datetime.min.time()) + timedelta(minutes=start) < \
+            not_before.astimezone(tz).replace(tzinfo=None):
+        raise ValueError("That time is in the past")
+    if not within_availability(windows, day.weekday(), start, end):
+        raise SlotUnavailable("The provider is not available at that time")
+
+    day_key = day.isoformat()
+    interval = {"start": start, "end": end, "booking_id": booking_id}
+    for _ in range(MAX_RESERVE_ATTEMPTS):
+        doc = await db[SCHEDULE_COLLECTION].find_one(
+            {"provider_id": provider_id, "day": day_key}, {"_id": 0, "intervals": 1, "version": 1})
+        intervals = doc["intervals"] if doc else []
+        if overlaps(intervals, start, end):
+            raise SlotUnavailable("That time is already booked")
+
+        index = bisect_right(intervals, start, key=lambda existing: existing["start"])
+        updated = intervals[:index] + [interval] + intervals[index:]
+        if doc is None:
+            try:
+                await db[SCHEDULE_COLLECTION].insert_one(
+                    {"provider_id": provider_id, "day": day_key, "version": 1, "intervals": updated})
+                break
+            except DuplicateKeyError:
+                continue
+        result = await db[SCHEDULE_COLLECTION].update_one(
+            {"provider_id": provider_id, "day": day_key, "version": doc["version"]},
+            {"$set": {"intervals": updated}, "$inc": {"version": 1}},
+        )
+        if result.modified_count:
+            break
+    else:
+        raise SlotUnavailable("The schedule is busy, please retry")
+
+    return {"provider_id": provider_id, "day": day_key, "start": start, "end": end}
+
+
+async def release_slots(db, bookings: List[dict]):
+    """Free the reserved time of bookings that were declined, cancelled or deleted"""
+    by_day: Dict[tuple, list] = defaultdict(list)
+    for booking in bookings:
+        reservation = booking.get("schedule")
+        if reservation:
+            by_day[(reservation["provider_id"], reservation["day"])].append(booking["id"])
+    for (provider_id, day_key), booking_ids in by_day.items():
+        await db[SCHEDULE_COLLECTION].update_one(
+            {"provider_id": provider_id, "day": day_key},
+            {"$pull": {"intervals": {"booking_id": {"$in": booking_ids}}}, "$inc": {"version": 1}},
+        )
+
+
+async def free_slots(db, provider_id: str, date_from: date, date_to: date, duration: int,
+                     step: int, not_before: datetime, tz: tzinfo) -> Optional[List[dict]]:
+    """Start/end times in ``tz`` of every free ``duration``-minute slot between two dates (inclusive).
+
+    Candidate starts are ``step`` minutes apart from the start of each window;
+    those before ``not_before`` (an aware datetime) are skipped. Returns
+    ``None`` when the provider has no availability configured.
+    """
+    windows = await get_availability(db, provider_id)
+    if windows is None:
+        return None
+    not_before = not_before.astimezone(tz).replace(tzinfo=None)
+
+    booked = {}
+    async for doc in db[SCHEDULE_COLLECTION].find(
+        {"provider_id": provider_id, "day": {"$gte": date_from.isoformat(), "$lte": date_to.isoformat()}},
+        {"_id": 0, "day": 1, "intervals": 1},
+    ):
+        booked[doc["day"]] = doc["intervals"]
+
+    slots = []
+    day = date_from
+    while day <= date_to:
+        intervals = booked.get(day.isoformat(), [])
+        for window in windows:
+            if window["weekday"] != day.weekday():
+                continue
+            for start in range(window["start"], window["end"] - duration + 1, step):
+                if datetime.combine(day, datetime.min.time()) + timedelta(minutes=start) < not_before:
+                    continue
+                if not overlaps(intervals, start, start + duration):
+                    slots.append({"start": format_time(day, start), "end": format_time(day, start + duration)})
+        day += timedelta(days=1)
+    return slots
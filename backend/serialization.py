@@ -0,0 +1,31 @@
+"""
+Serialization of trusted documents for the fast response path.
+
+Documents read back from MongoDB were validated when they were written, so
+running them through a Pydantic model again on every read only costs time.
+``TrustedSerializer`` turns such a document into the model's JSON shape (its
+fields, with defaults filled in for missing ones and everything else dropped)
+with a dict comprehension. It also provides the MongoDB projection that
+fetches exactly those fields. Hand the result to ``ORJSONResponse``.
+"""
+
+from typing import Type
+
+from pydantic import BaseModel
+
+
+class TrustedSerializer:
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        self.defaults = {
+            name: field.get_default(call_default_factory=True) if not field.is_required() else None
+            for name, field in model.model_fields.items()
+        }
+        self.projection = {"_id": 0, **{name: 1 for name in self.defaults}}
+
+    def __call__(self, doc: dict) -> dict:
+        return {name: doc.get(name, default) for name, default in self.defaults.items()}
+
+    def many(self, docs: list) -> list:
+        defaults = self.defaults
+        return [{name: doc.get(name, default) for name, default in defaults.items()} for doc in docs]
@@ -1,42 +1,208 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Header, Request, BackgroundTasks, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, Response, JSONResponse, ORJSONResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import DuplicateKeyError
 import os
 import logging
 from pathlib import Path
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
-from typing import List, Optional
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, TypeAdapter
+from typing import List, Literal, Optional
 import uuid
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
+from zoneinfo import ZoneInfo
 from passlib.context import CryptContext
 from jose import JWTError, jwt
 from cryptography.fernet import Fernet
-import aiosmtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-from email.mime.image import MIMEImage
 import base64
+import hashlib
+import json
+import csv
+import zlib
+import orjson
 import qrcode
 import io
 import secrets
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email_outbox import OutboxSender, enqueue_email, enqueue_emails
+from cache import TTLCache
+from indexes import ensure_indexes, index_drift
+from qr_cache import QRCodeCache, qr_key
+from notification_broker import SESSION_EVENT, InMemoryBroker, ChangeStreamRelay
+from auth_tokens import RefreshTokenInvalid, RefreshTokenReused, RefreshTokenStore, TokenRevocations
+from booking_states import BOOKING_STATUSES, BookingNotFound, InvalidTransition, transition_booking, transition_bookings
+from schedule import (
+    InvalidAvailability, SlotUnavailable, format_window, free_slots, get_availability, release_slots,
+    reserve_slot, set_availability,
+)
+from response_cache import MemoryBackend, ResponseCache, redis_backend
+from serialization import TrustedSerializer
+from restrictions import FileRestrictionsProvider, MongoRestrictionsProvider, RestrictionsService
+from erasure import ERASURE_COLLECTION, ErasureWorker, check_status_token, request_erasure
+from idempotency import IdempotencyStore, IdempotencyKeyReused, IdempotencyInProgress, request_fingerprint
+from profiler import ProfilerMiddleware, ProfileStore, StackSampler, to_collapsed, to_speedscope
+from database import PoolMonitor, check_ready, warm_up
+from metrics import REGISTRY, MetricsMiddleware, MongoCommandListener, monitor_event_loop_lag, timed
+from notification_counters import (
+    increment_unread, increment_unread_many, decrement_unread, get_unread_count, run_reconciliation,
+)
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# MongoDB connection
+# MongoDB connection; these settings take precedence over the same options in MONGO_URL
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+MONGO_MAX_POOL_SIZE = int(os.environ.get('MONGO_MAX_POOL_SIZE', '100'))
+MONGO_MIN_POOL_SIZE = int(os.environ.get('MONGO_MIN_POOL_SIZE', '0'))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.environ.get('MONGO_WAIT_QUEUE_TIMEOUT_MS', '10000'))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.environ.get('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000'))
+MONGO_READ_PREFERENCE = os.environ.get('MONGO_READ_PREFERENCE', 'primary')
+READINESS_TIMEOUT_SECONDS = float(os.environ.get('READINESS_TIMEOUT_SECONDS', '2'))
+pool_monitor = PoolMonitor(max_pool_size=MONGO_MAX_POOL_SIZE, min_pool_size=MONGO_MIN_POOL_SIZE)
+client = AsyncIOMotorClient(
+    mongo_url,
+    maxPoolSize=MONGO_MAX_POOL_SIZE,
+    minPoolSize=MONGO_MIN_POOL_SIZE,
+    waitQueueTimeoutMS=MONGO_WAIT_QUEUE_TIMEOUT_MS,
+    serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    readPreference=MONGO_READ_PREFERENCE,
+    event_listeners=[MongoCommandListener(), pool_monitor],
+)
 db = client[os.environ['DB_NAME']]
+# Set once startup has finished; /readyz reports not ready until then
+app_state = {"started": False}
 
 # Security
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 SECRET_KEY = os.environ.get('JWT_SECRET', 'your-secret-key-change-in-production')
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 24 hours
+# Stateless mode: access tokens carry name, email and role, so authenticating a request
+# needs no database read; they are short-lived and renewed with single-use refresh tokens
+STATELESS_AUTH = os.environ.get('STATELESS_AUTH', 'false').lower() == 'true'
+ACCESS_TOKEN_STATELESS_MINUTES = int(os.environ.get('ACCESS_TOKEN_STATELESS_MINUTES', '15'))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.environ.get('REFRESH_TOKEN_EXPIRE_DAYS', '30'))
+TOKEN_REVOCATION_SYNC_SECONDS = float(os.environ.get('TOKEN_REVOCATION_SYNC_SECONDS', '5'))
+token_revocations = TokenRevocations(db, access_ttl_seconds=ACCESS_TOKEN_STATELESS_MINUTES * 60)
+refresh_tokens = RefreshTokenStore(db, ttl_seconds=REFRESH_TOKEN_EXPIRE_DAYS * 86400)
+
+# Scheduling
+SLOT_STEP_MINUTES = int(os.environ.get('SLOT_STEP_MINUTES', '30'))
+SLOT_MAX_RANGE_DAYS = int(os.environ.get('SLOT_MAX_RANGE_DAYS', '31'))
+# Availability windows, slots and preferred_date times are wall-clock times in this zone
+SCHEDULE_TIMEZONE = ZoneInfo(os.environ.get('SCHEDULE_TIMEZONE', 'UTC'))
+
+# Fast response path: models are serialized once and encoded with orjson, and booking
+# lists are built from the (already validated) stored documents without re-validation
+FAST_RESPONSES = os.environ.get('FAST_RESPONSES', 'false').lower() == 'true'
+
+# Pagination
+BOOKINGS_PAGE_SIZE = int(os.environ.get('BOOKINGS_PAGE_SIZE', '50'))
+BOOKINGS_MAX_PAGE_SIZE = int(os.environ.get('BOOKINGS_MAX_PAGE_SIZE', '200'))
+SERVICES_PAGE_SIZE = int(os.environ.get('SERVICES_PAGE_SIZE', '50'))
+SERVICES_MAX_PAGE_SIZE = int(os.environ.get('SERVICES_MAX_PAGE_SIZE', '200'))
+BULK_ACTION_MAX_ITEMS = int(os.environ.get('BULK_ACTION_MAX_ITEMS', '500'))
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', '1000'))
+EXPORT_CSV_FIELDS = [
+    "id", "user_id", "user_name", "user_email", "service_id", "service_type", "preferred_date",
+    "duration", "details", "status", "covid_restrictions", "cost", "admin_notes", "created_at", "updated_at",
+]
+
+# Password hashing pool (bcrypt is CPU-bound and must not run on the event loop)
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', '4'))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.environ.get('PASSWORD_HASH_QUEUE_LIMIT', '64'))
+password_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="password-hash")
+password_pool_stats = {
+    "queue_depth": 0,
+    "max_queue_depth": 0,
+    "completed": 0,
+    "rejected": 0,
+    "wait_seconds_total": 0.0,
+    "hash_seconds_total": 0.0,
+    "hash_seconds_max": 0.0,
+}
+
+# Authenticated user lookups are cached briefly so get_current_user skips Mongo on most requests.
+# Other workers may serve a stale entry for up to USER_CACHE_TTL_SECONDS after a change.
+USER_CACHE_TTL_SECONDS = float(os.environ.get('USER_CACHE_TTL_SECONDS', '30'))
+USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', '10000'))
+user_cache = TTLCache(max_entries=USER_CACHE_MAX_ENTRIES, ttl_seconds=USER_CACHE_TTL_SECONDS)
+
+# Serialized /api/bookings pages per user; booking writes bump the user's version.
+# The in-process backend is per worker: set RESPONSE_CACHE_REDIS_URL to share it (needs the redis package)
+RESPONSE_CACHE_TTL_SECONDS = int(os.environ.get('RESPONSE_CACHE_TTL_SECONDS', '30'))
+RESPONSE_CACHE_MAX_ENTRIES = int(os.environ.get('RESPONSE_CACHE_MAX_ENTRIES', '10000'))
+RESPONSE_CACHE_REDIS_URL = os.environ.get('RESPONSE_CACHE_REDIS_URL', '')
+bookings_cache = ResponseCache(
+    redis_backend(RESPONSE_CACHE_REDIS_URL) if RESPONSE_CACHE_REDIS_URL else MemoryBackend(RESPONSE_CACHE_MAX_ENTRIES),
+    namespace="bookings",
+    ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+)
+
+# QR codes are rendered off the event loop and cached by content hash
+QR_RENDER_WORKERS = int(os.environ.get('QR_RENDER_WORKERS', '2'))
+QR_CACHE_MAX_ENTRIES = int(os.environ.get('QR_CACHE_MAX_ENTRIES', '1024'))
+QR_CACHE_MAX_AGE_SECONDS = int(os.environ.get('QR_CACHE_MAX_AGE_SECONDS', '86400'))
+qr_executor = ThreadPoolExecutor(max_workers=QR_RENDER_WORKERS, thread_name_prefix="qr-render")
+
+# Service catalog is served from memory; writes bump a version in Mongo that
+# every worker polls, so no request pays for a query or model validation
+SERVICE_CATALOG_REFRESH_SECONDS = float(os.environ.get('SERVICE_CATALOG_REFRESH_SECONDS', '30'))
+service_catalog_cache = {"version": None, "body": None, "etag": None}
+
+# Real-time notifications: "memory" delivers within this process only,
+# "changestream" relays inserts from MongoDB so every worker sees them (needs a replica set)
+NOTIFICATION_BROKER = os.environ.get('NOTIFICATION_BROKER', 'memory')
+NOTIFICATION_HEARTBEAT_SECONDS = float(os.environ.get('NOTIFICATION_HEARTBEAT_SECONDS', '15'))
+# Streams are opened with a short-lived, single-use ticket rather than the access token,
+# since EventSource puts it in the URL (and so in access logs)
+NOTIFICATION_STREAM_TICKET_SECONDS = int(os.environ.get('NOTIFICATION_STREAM_TICKET_SECONDS', '30'))
+STREAM_TICKET_PURPOSE = "notification_stream"
+notification_broker = InMemoryBroker(max_queue=int(os.environ.get('NOTIFICATION_STREAM_QUEUE', '100')))
+notification_relay = ChangeStreamRelay(db, notification_broker)
+NOTIFICATION_COUNTER_RECONCILE_SECONDS = float(os.environ.get('NOTIFICATION_COUNTER_RECONCILE_SECONDS', '3600'))
+periodic_tasks = []
+
+# COVID restrictions per region, read from a JSON file or the covid_restrictions collection
+COVID_RESTRICTIONS_SOURCE = os.environ.get('COVID_RESTRICTIONS_SOURCE', 'file')
+COVID_RESTRICTIONS_FILE = Path(os.environ.get('COVID_RESTRICTIONS_FILE', str(ROOT_DIR / 'data' / 'covid_restrictions.json')))
+COVID_RESTRICTIONS_REFRESH_SECONDS = float(os.environ.get('COVID_RESTRICTIONS_REFRESH_SECONDS', '300'))
+COVID_RESTRICTIONS_MAX_AGE_SECONDS = int(os.environ.get('COVID_RESTRICTIONS_MAX_AGE_SECONDS', '60'))
+COVID_DEFAULT_REGION = os.environ.get('COVID_DEFAULT_REGION', 'SA')
+
+# Admin ids are needed on every booking but change rarely
+ADMIN_CACHE_TTL_SECONDS = float(os.environ.get('ADMIN_CACHE_TTL_SECONDS', '60'))
+admin_cache = TTLCache(max_entries=1, ttl_seconds=ADMIN_CACHE_TTL_SECONDS)
+
+# Retried booking requests carrying the same Idempotency-Key replay the first response
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '86400'))
+IDEMPOTENCY_LEASE_SECONDS = float(os.environ.get('IDEMPOTENCY_LEASE_SECONDS', '30'))
+IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', '10'))
+idempotency_store = IdempotencyStore(
+    db,
+    ttl_seconds=IDEMPOTENCY_TTL_SECONDS,
+    lease_seconds=IDEMPOTENCY_LEASE_SECONDS,
+    wait_seconds=IDEMPOTENCY_WAIT_SECONDS,
+)
+
+# Prometheus metrics; leave METRICS_TOKEN empty to expose /metrics without auth
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+EVENT_LOOP_LAG_INTERVAL_SECONDS = float(os.environ.get('EVENT_LOOP_LAG_INTERVAL_SECONDS', '0.5'))
+
+# Slow-request profiler, off unless PROFILER_SAMPLE_RATE > 0
+PROFILER_SAMPLE_RATE = float(os.environ.get('PROFILER_SAMPLE_RATE', '0'))
+PROFILER_THRESHOLD_SECONDS = float(os.environ.get('PROFILER_THRESHOLD_SECONDS', '1.0'))
+PROFILER_INTERVAL_SECONDS = float(os.environ.get('PROFILER_INTERVAL_SECONDS', '0.005'))
+PROFILER_DIR = Path(os.environ.get('PROFILER_DIR', str(ROOT_DIR / 'profiles')))
+PROFILER_MAX_PROFILES = int(os.environ.get('PROFILER_MAX_PROFILES', '200'))
+stack_sampler = StackSampler(interval_seconds=PROFILER_INTERVAL_SECONDS)
+profile_store = ProfileStore(PROFILER_DIR, max_profiles=PROFILER_MAX_PROFILES)
 
 # Encryption for sensitive data
 ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY', Fernet.generate_key().decode())
@@ -48,6 +214,35 @@ SMTP_PORT = int(os.environ.get('SMTP_PORT', '587'))
 SMTP_USER = os.environ.get('SMTP_USER', '')
 SMTP_PASS = os.environ.get('SMTP_PASS', '')
 SMTP_FROM_EMAIL = os.environ.get('SMTP_FROM_EMAIL', 'noreply@homeservices.com')
+SMTP_START_TLS = os.environ.get('SMTP_START_TLS', 'true').lower() == 'true'
+EMAIL_MOCK = os.environ.get('EMAIL_MOCK', 'false' if SMTP_USER and SMTP_PASS else 'true').lower() == 'true'
+EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE', '20'))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', '5'))
+
+# Account deletions run in the background in throttled batches
+ERASURE_BATCH_SIZE = int(os.environ.get('ERASURE_BATCH_SIZE', '500'))
+ERASURE_BATCH_PAUSE_SECONDS = float(os.environ.get('ERASURE_BATCH_PAUSE_SECONDS', '0.05'))
+ERASURE_MAX_ATTEMPTS = int(os.environ.get('ERASURE_MAX_ATTEMPTS', '3'))
+erasure_worker = ErasureWorker(
+    db,
+    batch_size=ERASURE_BATCH_SIZE,
+    pause_seconds=ERASURE_BATCH_PAUSE_SECONDS,
+    max_attempts=ERASURE_MAX_ATTEMPTS,
+)
+
+# Emails are queued in Mongo and delivered in the background
+outbox_sender = OutboxSender(
+    db,
+    hostname=SMTP_HOST,
+    port=SMTP_PORT,
+    username=SMTP_USER,
+    password=SMTP_PASS,
+    from_email=SMTP_FROM_EMAIL,
+    start_tls=SMTP_START_TLS,
+    mock=EMAIL_MOCK,
+    batch_size=EMAIL_OUTBOX_BATCH_SIZE,
+    max_attempts=EMAIL_OUTBOX_MAX_ATTEMPTS,
+)
 
 app = FastAPI()
 api_router = APIRouter(prefix="/api")
@@ -62,6 +257,7 @@ class UserBase(BaseModel):
     language: Optional[str] = "English"
     role: str = "client"  # client, provider, admin
     trade: Optional[str] = None  # for providers
+    region: Optional[str] = None  # state/territory code for COVID restrictions, e.g. "SA"
 
 class UserRegister(UserBase):
     password: str
@@ -85,8 +281,16 @@ class User(UserBase):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    expires_in: int  # seconds
+    refresh_token: Optional[str] = None  # stateless mode only
     user: User
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
 class ServiceBase(BaseModel):
     name: str
     description: str
@@ -109,7 +313,7 @@ class BookingBase(BaseModel):
     details: Optional[str] = None
 
 class BookingCreate(BookingBase):
-    pass
+    duration: int = Field(60, gt=0, le=24 * 60)  # minutes
 
 class Booking(BookingBase):
     model_config = ConfigDict(extra="ignore")
@@ -117,11 +321,30 @@ class Booking(BookingBase):
     user_id: str
     user_name: str
     user_email: str
-    status: str  # pending, accepted, declined
+    status: str  # see booking_states.BOOKING_STATUSES
     created_at: str
     covid_restrictions: str
     cost: float
 
+class AvailabilityWindow(BaseModel):
+    weekday: int = Field(ge=0, le=6)  # 0 = Monday
+    start: str  # HH:MM
+    end: str  # HH:MM, "24:00" for end of day
+
+class ProviderAvailability(BaseModel):
+    windows: List[AvailabilityWindow]
+
+class TimeSlot(BaseModel):
+    start: str
+    end: str
+
+class BookingPage(BaseModel):
+    items: List[Booking]
+    next_cursor: Optional[str] = None
+
+services_adapter = TypeAdapter(List[Service])
+booking_serializer = TrustedSerializer(Booking)
+
 class CovidRestrictions(BaseModel):
     level: str  # low, medium, high
     density_limits: str
@@ -131,9 +354,27 @@ class CovidRestrictions(BaseModel):
     message: str
 
 class BookingAction(BaseModel):
-    action: str  # accept or decline
+    action: Literal["accept", "decline", "complete", "cancel"]
     admin_notes: Optional[str] = None
 
+class BulkBookingActionItem(BookingAction):
+    booking_id: str
+
+class BulkBookingAction(BaseModel):
+    items: List[BulkBookingActionItem] = Field(min_length=1, max_length=BULK_ACTION_MAX_ITEMS)
+
+class BulkBookingActionItemResult(BaseModel):
+    booking_id: str
+    ok: bool
+    status: Optional[str] = None
+    qr_generated: bool = False
+    error: Optional[str] = None
+
+class BulkBookingActionResult(BaseModel):
+    succeeded: int
+    failed: int
+    results: List[BulkBookingActionItemResult]
+
 class Notification(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str
@@ -155,84 +396,267 @@ def hash_password(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+def _timed_password_job(func, args, submitted_at: float):
+    started = time.perf_counter()
+    result = func(*args)
+    return result, started - submitted_at, time.perf_counter() - started
+
+async def run_password_job(func, *args):
+    """Run a bcrypt call on the password pool, rejecting work when the queue is full"""
+    if password_pool_stats["queue_depth"] >= PASSWORD_HASH_QUEUE_LIMIT:
+        password_pool_stats["rejected"] += 1
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Server is busy, please try again shortly",
+            headers={"Retry-After": "1"},
+        )
+    
+    password_pool_stats["queue_depth"] += 1
+    password_pool_stats["max_queue_depth"] = max(password_pool_stats["max_queue_depth"], password_pool_stats["queue_depth"])
+    try:
+        loop = asyncio.get_running_loop()
+        result, waited, elapsed = await loop.run_in_executor(
+            password_executor, _timed_password_job, func, args, time.perf_counter()
+        )
+    finally:
+        password_pool_stats["queue_depth"] -= 1
+    
+    password_pool_stats["completed"] += 1
+    password_pool_stats["wait_seconds_total"] += waited
+    password_pool_stats["hash_seconds_total"] += elapsed
+    password_pool_stats["hash_seconds_max"] = max(password_pool_stats["hash_seconds_max"], elapsed)
+    return result
+
+async def hash_password_async(password: str) -> str:
+    return await run_password_job(hash_password, password)
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await run_password_job(verify_password, plain_password, hashed_password)
+
 def encrypt_data(data: str) -> str:
     return fernet.encrypt(data.encode()).decode()
 
 def decrypt_data(encrypted_data: str) -> str:
     return fernet.decrypt(encrypted_data.encode()).decode()
 
+def encode_cursor(doc: dict) -> str:
+    """Opaque keyset cursor pointing just past the given document"""
+    raw = json.dumps({"c": doc["created_at"], "i": doc["id"]}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> dict:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(raw)
+        return {"created_at": str(data["c"]), "id": str(data["i"])}
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def booking_filters(
+    status: Optional[str] = None,
+    service_type: Optional[str] = None,
+    date_from: Optional[str] = Query(None, description="Only bookings created at or after this ISO timestamp"),
+    date_to: Optional[str] = Query(None, description="Only bookings created before this ISO timestamp"),
+) -> dict:
+    """Query-string filters shared by the booking list endpoints"""
+    query = {}
+    if status:
+        query["status"] = status
+    if service_type:
+        query["service_type"] = service_type
+    if date_from or date_to:
+        query["created_at"] = {}
+        if date_from:
+            query["created_at"]["$gte"] = date_from
+        if date_to:
+            query["created_at"]["$lt"] = date_to
+    return query
+
+async def paginate_bookings(query: dict, cursor: Optional[str], limit: int) -> dict:
+    """Keyset pagination over bookings, newest first, ordered by (created_at, id)"""
+    if cursor:
+        after = decode_cursor(cursor)
+        query = {"$and": [query, {"$or": [
+            {"created_at": {"$lt": after["created_at"]}},
+            {"created_at": after["created_at"], "id": {"$lt": after["id"]}},
+        ]}]}
+    
+    # Fetch one extra document to learn whether another page exists
+    items = await db.bookings.find(query, booking_serializer.projection).sort(
+        [("created_at", -1), ("id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1])
+    return {"items": items, "next_cursor": next_cursor}
+
+def trusted_booking_page(page: dict) -> dict:
+    """A BookingPage built straight from stored documents, without validating them again"""
+    return {"items": booking_serializer.many(page["items"]), "next_cursor": page["next_cursor"]}
+
+def model_response(model: BaseModel, status_code: int = status.HTTP_200_OK):
+    """Return ``model`` as is, or in fast mode serialize it once and skip FastAPI's response_model pass"""
+    if not FAST_RESPONSES:
+        return model
+    return ORJSONResponse(model.model_dump(mode="json"), status_code=status_code)
+
+async def iter_bookings_export(query: dict, export_format: str, batch_size: int, compress: bool = False):
+    """Yield an export of matching bookings chunk by chunk straight off the cursor.
+
+    Each chunk holds at most one cursor batch, so memory stays flat no matter
+    how many bookings are exported.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None  # wbits=31 -> gzip container
+    cursor = db.bookings.find(query, {"_id": 0}).sort([("created_at", -1), ("id", -1)]).batch_size(batch_size)
+    
+    buffer = io.StringIO()
+    writer = None
+    if export_format == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_CSV_FIELDS, extrasaction="ignore")
+        writer.writeheader()
+    
+    rows = 0
+    async for booking in cursor:
+        if writer:
+            writer.writerow(booking)
+        else:
+            buffer.write(json.dumps(booking, separators=(",", ":")))
+            buffer.write("\n")
+        rows += 1
+        if rows % batch_size == 0:
+            chunk = buffer.getvalue().encode()
+            buffer.seek(0)
+            buffer.truncate()
+            yield compressor.compress(chunk) if compressor else chunk
+    
+    chunk = buffer.getvalue().encode()
+    if compressor:
+        yield compressor.compress(chunk) + compressor.flush()
+    elif chunk:
+        yield chunk
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """True if the request's If-None-Match already names this entity tag"""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [candidate.strip().removeprefix("W/") for candidate in header.split(",")]
+    return "*" in candidates or etag in candidates
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
         expire = datetime.now(timezone.utc) + expires_delta
     else:
         expire = datetime.now(timezone.utc) + timedelta(minutes=15)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": datetime.now(timezone.utc), "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    credentials_exception = HTTPException(
+async def issue_tokens(user: dict) -> dict:
+    """Token fields for a user document: an access token, plus a refresh token in stateless mode"""
+    claims = {"sub": user["id"], "ver": user.get("token_version", 0)}
+    minutes = ACCESS_TOKEN_EXPIRE_MINUTES
+    if STATELESS_AUTH:
+        claims.update(name=user["name"], email=user["email"], role=user["role"], region=user.get("region"))
+        minutes = ACCESS_TOKEN_STATELESS_MINUTES
+    tokens = {
+        "access_token": create_access_token(data=claims, expires_delta=timedelta(minutes=minutes)),
+        "token_type": "bearer",
+        "expires_in": minutes * 60,
+    }
+    if STATELESS_AUTH:
+        tokens["refresh_token"] = await refresh_tokens.issue(user["id"], claims["ver"])
+    return tokens
+
+async def load_user(user_id: str) -> Optional[dict]:
+    """The user document (without password) through the user cache; None if gone or pending deletion"""
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+        if user is None or user.get("deletion_pending"):
+            return None
+        user_cache.set(user_id, user)
+    return dict(user)
+
+def credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def decode_token(token: str) -> dict:
+    """Verified claims of an access token that has not been revoked, raising 401 otherwise"""
     try:
-        token = credentials.credentials
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id: str = payload.get("sub")
-        if user_id is None:
-            raise credentials_exception
     except JWTError:
-        raise credentials_exception
+        raise credentials_exception()
+    # Tokens with a purpose (stream tickets) are not access tokens
+    if payload.get("sub") is None or "purpose" in payload or token_revocations.is_revoked(payload):
+        raise credentials_exception()
+    return payload
+
+async def authenticate_token(token: str) -> dict:
+    """Resolve a bearer token to its user, raising 401 if invalid"""
+    payload = decode_token(token)
+    user_id = payload["sub"]
+    if STATELESS_AUTH and "role" in payload:
+        # Signed at login or refresh; logout, deletion and role changes revoke the token.
+        # Only the identity fields: endpoints reading more of the profile use get_current_profile
+        return {
+            "id": user_id,
+            "email": payload["email"],
+            "name": payload["name"],
+            "role": payload["role"],
+            "region": payload.get("region"),
+        }
     
-    user = await db.users.find_one({"id": user_id}, {"_id": 0, "password": 0})
+    user = await load_user(user_id)
+    if user is None or payload.get("ver", 0) < user.get("token_version", 0):
+        raise credentials_exception()
+    return user
+
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
+    return await authenticate_token(credentials.credentials)
+
+async def get_current_profile(current_user: dict = Depends(get_current_user)):
+    """The full user document, for endpoints that need more than id, name, email, role and region"""
+    if "created_at" in current_user:
+        return current_user
+    # Built from stateless token claims
+    user = await load_user(current_user["id"])
     if user is None:
-        raise credentials_exception
+        raise credentials_exception()
     return user
 
+def invalidate_user(user_id: str):
+    """Drop a cached user; call after deleting a user or changing their role"""
+    user_cache.invalidate(user_id)
+    admin_cache.clear()
+
+async def revoke_user_sessions(user_id: str):
+    """Sign a user out everywhere; call after deleting a user or changing their role, name or email"""
+    await token_revocations.revoke_user(user_id)
+    await refresh_tokens.revoke_all(user_id)
+    invalidate_user(user_id)
+    notification_broker.publish(user_id, SESSION_EVENT)
+
 async def get_admin_user(current_user: dict = Depends(get_current_user)):
     if current_user.get("role") != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     return current_user
 
-async def send_email(to_email: str, subject: str, body: str, qr_image: bytes = None):
-    """Send email via Ethereal Email with optional QR code"""
-    try:
-        if not SMTP_USER or not SMTP_PASS:
-            logging.info(f"Email mock - To: {to_email}, Subject: {subject}")
-            return True
-        
-        message = MIMEMultipart("related")
-        message["From"] = SMTP_FROM_EMAIL
-        message["To"] = to_email
-        message["Subject"] = subject
-        
-        # Add HTML body
-        html_part = MIMEText(body, "html")
-        message.attach(html_part)
-        
-        # Add QR code if provided
-        if qr_image:
-            qr_part = MIMEImage(qr_image)
-            qr_part.add_header('Content-ID', '<qr_code>')
-            qr_part.add_header('Content-Disposition', 'inline', filename='qr_code.png')
-            message.attach(qr_part)
-        
-        await aiosmtplib.send(
-            message,
-            hostname=SMTP_HOST,
-            port=SMTP_PORT,
-            username=SMTP_USER,
-            password=SMTP_PASS,
-            start_tls=True
-        )
-        logging.info(f"✉️  Email sent to {to_email} - View at: https://ethereal.email/messages")
-        return True
-    except Exception as e:
-        logging.error(f"Email error: {e}")
-        return False
+@timed("send_email")
+async def send_email(to_email: str, subject: str, body: str, qr_image: bytes = None) -> str:
+    """Queue an email (with optional QR code) for delivery by the outbox sender"""
+    job_id = await enqueue_email(db, to_email, subject, body, qr_image)
+    outbox_sender.notify()
+    return job_id
 
+@timed("generate_qr_code")
 def generate_qr_code(data: str) -> bytes:
     """Generate QR code as PNG bytes"""
     qr = qrcode.QRCode(version=1, box_size=10, border=5)
@@ -245,9 +669,52 @@ def generate_qr_code(data: str) -> bytes:
     img_bytes.seek(0)
     return img_bytes.read()
 
-async def create_notification(user_id: str, title: str, message: str, notification_type: str, booking_id: str = None):
-    """Create a notification for a user"""
-    notification = {
+qr_cache = QRCodeCache(db, generate_qr_code, qr_executor, max_entries=QR_CACHE_MAX_ENTRIES)
+
+def use_database(database):
+    """Point the app and its background components at another database (benchmarks, mongomock)"""
+    global db
+    db = database
+    outbox_sender.db = database
+    qr_cache.db = database
+    notification_relay.db = database
+    idempotency_store.db = database
+    token_revocations.db = database
+    refresh_tokens.db = database
+    erasure_worker.db = database
+    if isinstance(covid_restrictions.provider, MongoRestrictionsProvider):
+        covid_restrictions.provider.db = database
+
+# Scrape-time gauges for the in-process pools and caches
+REGISTRY.gauge("password_hash_queue_depth", "Password hashing jobs queued or running",
+               function=lambda: password_pool_stats["queue_depth"])
+REGISTRY.gauge("user_cache_entries", "Entries in the authenticated user cache", function=lambda: len(user_cache))
+REGISTRY.gauge("revoked_access_tokens", "Revoked access tokens and users held in the revocation set",
+               function=lambda: sum(token_revocations.stats().values()))
+REGISTRY.gauge("qr_cache_entries", "QR codes held in memory", function=lambda: len(qr_cache.memory))
+REGISTRY.gauge("notification_stream_subscribers", "Open notification streams",
+               function=lambda: notification_broker.stats()["subscriptions"])
+
+def booking_receipt_text(booking: dict) -> str:
+    """Text encoded in an accepted booking's receipt QR code"""
+    return f"""HomeBound Care Receipt
+Booking ID: {booking['id']}
+Service: {booking['service_type']}
+Date: {booking['preferred_date']}
+Duration: {booking['duration']} min
+Cost: ${booking['cost']}
+Status: CONFIRMED
+Customer: {booking['user_name']}"""
+
+async def get_booking_qr_png(booking: dict) -> bytes:
+    """Receipt QR code for a booking, served from the QR cache"""
+    return await qr_cache.get_png(
+        booking_receipt_text(booking),
+        metadata={"booking_id": booking["id"], "user_id": booking["user_id"]},
+    )
+
+def notification_doc(user_id: str, title: str, message: str, notification_type: str, booking_id: str = None) -> dict:
+    return {
         "id": str(uuid.uuid4()),
         "user_id": user_id,
         "title": title,
@@ -257,19 +724,124 @@ async def create_notification(user_id: str, title: str, message: str, notificati
         "created_at": datetime.now(timezone.utc).isoformat(),
         "booking_id": booking_id
     }
+
+async def create_notification(user_id: str, title: str, message: str, notification_type: str, booking_id: str = None):
+    """Create a notification for a user"""
+    notification = notification_doc(user_id, title, message, notification_type, booking_id)
     await db.notifications.insert_one(notification)
+    await increment_unread(db, user_id)
+    notification.pop("_id", None)
+    publish_notification(notification)
     return notification
 
-def get_covid_restrictions() -> CovidRestrictions:
-    """Mock COVID restriction data"""
-    return CovidRestrictions(
-        level="medium",
-        density_limits="1 person per 4 sqm",
-        mask_required=True,
-        quarantine_required=False,
-        last_updated=datetime.now(timezone.utc).isoformat(),
-        message="Current restrictions recommend remote services. Masks required for in-person visits."
-    )
+async def insert_notifications(notifications: List[dict]) -> List[dict]:
+    """Store and publish many notifications with a single unordered insert"""
+    if not notifications:
+        return []
+    await db.notifications.insert_many(notifications, ordered=False)
+    await increment_unread_many(db, [notification["user_id"] for notification in notifications])
+    for notification in notifications:
+        notification.pop("_id", None)
+        publish_notification(notification)
+    return notifications
+
+async def create_notifications(user_ids: List[str], title: str, message: str, notification_type: str, booking_id: str = None):
+    """Create the same notification for many users with a single unordered insert"""
+    return await insert_notifications([
+        notification_doc(user_id, title, message, notification_type, booking_id) for user_id in user_ids
+    ])
+
+async def get_admin_ids() -> List[str]:
+    """Ids of all admin users not being erased, cached for ADMIN_CACHE_TTL_SECONDS"""
+    admin_ids = admin_cache.get("admins")
+    if admin_ids is None:
+        admins = await db.users.find(
+            {"role": "admin", "deletion_pending": {"$ne": True}}, {"_id": 0, "id": 1}).to_list(None)
+        admin_ids = [admin["id"] for admin in admins]
+        admin_cache.set("admins", admin_ids)
+    return admin_ids
+
+def publish_notification(notification: dict):
+    """Push a new notification to open streams, unless the change stream relay will"""
+    if not notification_relay.active:
+        notification_broker.publish(notification["user_id"], notification)
+
+async def search_services(
+    q: Optional[str], service_type: Optional[str], is_online: Optional[bool],
+    min_price: Optional[float], max_price: Optional[float], provider_id: Optional[str],
+    sort: Optional[str], offset: int, limit: int
+) -> List[dict]:
+    """Filtered, sorted page of services; ``q`` uses the name/description text index"""
+    query = {}
+    projection = {"_id": 0}
+    if q:
+        query["$text"] = {"$search": q}
+    if service_type:
+        query["service_type"] = service_type
+    if is_online is not None:
+        query["is_online"] = is_online
+    if min_price is not None or max_price is not None:
+        query["price"] = {}
+        if min_price is not None:
+            query["price"]["$gte"] = min_price
+        if max_price is not None:
+            query["price"]["$lte"] = max_price
+    if provider_id:
+        query["provider_id"] = provider_id
+    
+    if sort == "relevance" or (sort is None and q):
+        if not q:
+            raise HTTPException(status_code=400, detail="sort=relevance requires q")
+        projection["score"] = {"$meta": "textScore"}
+        order = [("score", {"$meta": "textScore"}), ("id", 1)]
+    else:
+        order = SERVICE_SORTS.get(sort, [("name", 1), ("id", 1)])
+    
+    return await db.services.find(query, projection).sort(order).skip(offset).limit(limit).to_list(limit)
+
+async def get_catalog_version() -> int:
+    doc = await db.cache_versions.find_one({"_id": "services"})
+    return doc["version"] if doc else 0
+
+async def bump_catalog_version():
+    """Call after any write to the services collection"""
+    await db.cache_versions.update_one({"_id": "services"}, {"$inc": {"version": 1}}, upsert=True)
+    service_catalog_cache["body"] = None
+
+async def load_service_catalog():
+    """Serialized service catalog and its ETag, rebuilt only after the catalog changes"""
+    if service_catalog_cache["body"] is None:
+        # Read the version first: a write racing with this load leaves the
+        # cache stamped with the older version, and the watcher reloads it
+        version = await get_catalog_version()
+        services = await db.services.find({}, {"_id": 0}).to_list(None)
+        body = services_adapter.dump_json(services_adapter.validate_python(services))
+        service_catalog_cache.update(
+            version=version,
+            body=body,
+            etag=f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+        )
+    return service_catalog_cache["body"], service_catalog_cache["etag"]
+
+async def watch_catalog_version(interval_seconds: float):
+    """Drop the cached catalog when another worker has bumped its version"""
+    while True:
+        await asyncio.sleep(interval_seconds)
+        try:
+            if await get_catalog_version() != service_catalog_cache["version"]:
+                service_catalog_cache["body"] = None
+        except Exception as e:
+            logging.error(f"Service catalog version check failed: {e}")
+
+covid_restrictions = RestrictionsService(
+    MongoRestrictionsProvider(db) if COVID_RESTRICTIONS_SOURCE == "mongo" else FileRestrictionsProvider(COVID_RESTRICTIONS_FILE),
+    CovidRestrictions,
+    default_region=COVID_DEFAULT_REGION,
+)
+
+def get_covid_restrictions(region: Optional[str] = None) -> CovidRestrictions:
+    """Current restrictions for a region (the default region if unknown), from the in-memory snapshot"""
+    return covid_restrictions.get(region)
 
 def suggest_services(user_profile: dict, restrictions: CovidRestrictions) -> List[str]:
     """Simple logic-based service suggestions"""
@@ -314,7 +886,8 @@ async def register(user_data: UserRegister):
         "language": user_data.language,
         "role": user_data.role,
         "trade": user_data.trade,
-        "password": hash_password(user_data.password),
+        "region": user_data.region.upper() if user_data.region else None,
+        "password": await hash_password_async(user_data.password),
         "vax_status": user_data.vax_status if user_data.consent_vax else None,
         "credit_card_encrypted": encrypt_data(user_data.credit_card) if user_data.credit_card else None,
         "consent_vax": user_data.consent_vax,
@@ -323,13 +896,16 @@ async def register(user_data: UserRegister):
         "created_at": datetime.now(timezone.utc).isoformat()
     }
     
-    await db.users.insert_one(user_doc)
+    try:
+        await db.users.insert_one(user_doc)
+    except DuplicateKeyError:
+        # A concurrent registration won the race on the unique email index
+        raise HTTPException(status_code=400, detail="Email already registered")
     
-    # Create token
-    access_token = create_access_token(
-        data={"sub": user_id},
-        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    )
+    if user_doc["role"] == "admin":
+        admin_cache.clear()
+    
+    tokens = await issue_tokens(user_doc)
     
     # Prepare user response
     user_response = User(
@@ -342,6 +918,7 @@ async def register(user_data: UserRegister):
         language=user_data.language,
         role=user_data.role,
         trade=user_data.trade,
+        region=user_doc["region"],
         created_at=user_doc["created_at"],
         vax_status=user_data.vax_status,
         email_verified=True
@@ -365,23 +942,10 @@ async def register(user_data: UserRegister):
         "success"
     )
     
-    return Token(access_token=access_token, token_type="bearer", user=user_response)
+    return model_response(Token(**tokens, user=user_response), status.HTTP_201_CREATED)
 
-@api_router.post("/auth/login", response_model=Token)
-async def login(credentials: UserLogin):
-    user = await db.users.find_one({"email": credentials.email})
-    if not user or not verify_password(credentials.password, user["password"]):
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Incorrect email or password"
-        )
-    
-    access_token = create_access_token(
-        data={"sub": user["id"]},
-        expires_delta=timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    )
-    
-    user_response = User(
+def login_user_response(user: dict) -> User:
+    return User(
         id=user["id"],
         email=user["email"],
         name=user["name"],
@@ -391,52 +955,250 @@ async def login(credentials: UserLogin):
         language=user.get("language", "English"),
         role=user["role"],
         trade=user.get("trade"),
+        region=user.get("region"),
         created_at=user["created_at"],
         vax_status=user.get("vax_status")
     )
+
+@api_router.post("/auth/login", response_model=Token)
+async def login(credentials: UserLogin):
+    user = await db.users.find_one({"email": credentials.email})
+    if not user or user.get("deletion_pending") or not await verify_password_async(credentials.password, user["password"]):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect email or password"
+        )
+    
+    return model_response(Token(**await issue_tokens(user), user=login_user_response(user)))
+
+@api_router.post("/auth/refresh", response_model=Token)
+async def refresh_access_token(request: RefreshRequest):
+    """Exchange a refresh token for a new access token and refresh token (stateless mode)"""
+    invalid = HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    try:
+        record = await refresh_tokens.consume(request.refresh_token)
+    except RefreshTokenReused as e:
+        # A refresh token is only ever used once; a second use means it leaked
+        await revoke_user_sessions(e.user_id)
+        raise invalid
+    except RefreshTokenInvalid:
+        raise invalid
     
-    return Token(access_token=access_token, token_type="bearer", user=user_response)
+    # Fresh claims: role, name or email changes since the last refresh are picked up here
+    user = await db.users.find_one({"id": record["user_id"]}, {"_id": 0, "password": 0})
+    if user is None or user.get("deletion_pending") or record["version"] < user.get("token_version", 0):
+        raise invalid
+    return model_response(Token(**await issue_tokens(user), user=login_user_response(user)))
+
+@api_router.post("/auth/logout")
+async def logout(
+    request: Optional[LogoutRequest] = None,
+    credentials: HTTPAuthorizationCredentials = Depends(security)
+):
+    """Revoke the current access token and, if given, the refresh token"""
+    claims = decode_token(credentials.credentials)
+    if "jti" in claims:
+        await token_revocations.revoke_token(claims["jti"], datetime.fromtimestamp(claims["exp"], timezone.utc))
+        notification_broker.publish(claims["sub"], SESSION_EVENT)
+    if request and request.refresh_token:
+        await refresh_tokens.revoke(request.refresh_token)
+    return {"message": "Logged out"}
 
 @api_router.get("/auth/me", response_model=User)
-async def get_me(current_user: dict = Depends(get_current_user)):
-    return User(**current_user)
+async def get_me(current_user: dict = Depends(get_current_profile)):
+    return model_response(User(**current_user))
 
-@api_router.delete("/user/delete")
+@api_router.delete("/user/delete", status_code=status.HTTP_202_ACCEPTED)
 async def delete_user_data(current_user: dict = Depends(get_current_user)):
-    """Privacy by Design: User data deletion"""
-    user_id = current_user["id"]
+    """Privacy by Design: User data deletion.
     
-    # Delete user bookings
-    await db.bookings.delete_many({"user_id": user_id})
+    The account is locked at once; bookings, notifications, QR codes, queued
+    emails and the account itself are erased by the background erasure worker.
+    """
+    job = await request_erasure(db, current_user)
+    await revoke_user_sessions(current_user["id"])
+    await bookings_cache.bump(current_user["id"])
+    erasure_worker.notify()
     
-    # Delete user
-    await db.users.delete_one({"id": user_id})
-    
-    return {"message": "All your data has been permanently deleted"}
+    return {
+        "message": "Your account is locked and all your data is being permanently deleted",
+        "job_id": job["id"],
+        "status_url": f"/api/user/delete/{job['id']}",
+        # The account can no longer sign in; this token is what authorizes status_url
+        "status_token": job["status_token"],
+    }
+
+@api_router.get("/user/delete/{job_id}")
+async def get_erasure_status(
+    job_id: str,
+    erasure_token: Optional[str] = Header(None, alias="X-Erasure-Token"),
+    credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+):
+    """Progress and verification report of an erasure job.
+
+    For the deleted user, with the ``status_token`` from the deletion response
+    in ``X-Erasure-Token``, or for an admin.
+    """
+    job = await db[ERASURE_COLLECTION].find_one(
+        {"id": job_id}, {"_id": 0, "user_id": 0, "email": 0, "active": 0, "locked_until": 0})
+    if job and not check_status_token(job, erasure_token):
+        if credentials is None or (await authenticate_token(credentials.credentials)).get("role") != "admin":
+            # Same answer as a missing job, so job ids cannot be probed
+            job = None
+    if not job:
+        raise HTTPException(status_code=404, detail="Erasure job not found")
+    job.pop("status_token_hash", None)
+    return job
+
+@api_router.get("/admin/erasure-jobs")
+async def list_erasure_jobs(
+    job_status: Optional[str] = Query(None, alias="status", pattern="^(pending|running|completed|failed)$"),
+    limit: int = Query(50, ge=1, le=200),
+    current_user: dict = Depends(get_admin_user)
+):
+    """Recent erasure jobs, newest first"""
+    query = {"status": job_status} if job_status else {}
+    return await db[ERASURE_COLLECTION].find(query, {"_id": 0, "email": 0, "status_token_hash": 0}) \
+        .sort("created_at", -1).to_list(limit)
+
+SERVICE_SORTS = {
+    "price": [("price", 1), ("id", 1)],
+    "-price": [("price", -1), ("id", 1)],
+    "name": [("name", 1), ("id", 1)],
+    "-name": [("name", -1), ("id", 1)],
+    "newest": [("created_at", -1), ("id", 1)],
+}
 
 @api_router.get("/services", response_model=List[Service])
-async def get_services():
-    services = await db.services.find({}, {"_id": 0}).to_list(1000)
-    return services
+async def get_services(
+    request: Request,
+    q: Optional[str] = Query(None, max_length=200, description="Text search over name and description"),
+    service_type: Optional[str] = None,
+    is_online: Optional[bool] = None,
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    provider_id: Optional[str] = None,
+    sort: Optional[str] = Query(None, pattern="^(relevance|price|-price|name|-name|newest)$"),
+    offset: int = Query(0, ge=0, le=10000),
+    limit: int = Query(SERVICES_PAGE_SIZE, ge=1, le=SERVICES_MAX_PAGE_SIZE),
+):
+    """Service catalog. Without query parameters this is served from the catalog cache."""
+    if request.query_params:
+        return await search_services(q, service_type, is_online, min_price, max_price, provider_id, sort, offset, limit)
+    
+    body, etag = await load_service_catalog()
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def schedule_owner(service: dict) -> str:
+    """Whose calendar a service is booked against; services without a provider have their own"""
+    return service.get("provider_id") or service["id"]
+
+@api_router.get("/services/{service_id}/slots", response_model=List[TimeSlot])
+async def get_service_slots(
+    service_id: str,
+    date_from: date = Query(..., description="First day, YYYY-MM-DD"),
+    date_to: date = Query(..., description="Last day (inclusive), YYYY-MM-DD"),
+    duration: int = Query(60, gt=0, le=24 * 60),
+    step: int = Query(SLOT_STEP_MINUTES, ge=5, le=24 * 60),
+):
+    """Free start times for a service's provider over a date range"""
+    if date_to < date_from or (date_to - date_from).days >= SLOT_MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range must be 1 to {SLOT_MAX_RANGE_DAYS} days")
+    service = await db.services.find_one({"id": service_id}, {"_id": 0, "id": 1, "provider_id": 1})
+    if not service:
+        raise HTTPException(status_code=404, detail="Service not found")
+    
+    slots = await free_slots(
+        db, schedule_owner(service), date_from, date_to, duration, step,
+        not_before=datetime.now(timezone.utc), tz=SCHEDULE_TIMEZONE,
+    )
+    if slots is None:
+        raise HTTPException(status_code=404, detail="This service has no schedule; request a preferred date instead")
+    return slots
+
+@api_router.get("/admin/providers/{provider_id}/availability", response_model=ProviderAvailability)
+async def get_provider_availability(provider_id: str, current_user: dict = Depends(get_admin_user)):
+    windows = await get_availability(db, provider_id)
+    return {"windows": [format_window(w) for w in windows or []]}
+
+@api_router.put("/admin/providers/{provider_id}/availability", response_model=ProviderAvailability)
+async def update_provider_availability(
+    provider_id: str,
+    availability: ProviderAvailability,
+    current_user: dict = Depends(get_admin_user)
+):
+    """Replace a provider's weekly availability windows (existing bookings are kept)"""
+    try:
+        windows = await set_availability(
+            db, provider_id, [w.model_dump() for w in availability.windows], datetime.now(timezone.utc).isoformat())
+    except InvalidAvailability as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"windows": [format_window(w) for w in windows]}
 
 @api_router.get("/services/suggestions")
-async def get_service_suggestions(current_user: dict = Depends(get_current_user)):
-    restrictions = get_covid_restrictions()
+async def get_service_suggestions(current_user: dict = Depends(get_current_profile)):
+    # suggest_services reads vax_status, which stateless tokens do not carry
+    restrictions = get_covid_restrictions(current_user.get("region"))
     suggestions = suggest_services(current_user, restrictions)
     return {"suggestions": suggestions, "restrictions": restrictions}
 
 @api_router.post("/bookings", response_model=Booking, status_code=status.HTTP_201_CREATED)
-async def create_booking(booking_data: BookingCreate, current_user: dict = Depends(get_current_user)):
+async def create_booking(
+    booking_data: BookingCreate,
+    background_tasks: BackgroundTasks,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key", max_length=255),
+    current_user: dict = Depends(get_current_user)
+):
+    if not idempotency_key:
+        return model_response(await _create_booking(booking_data, background_tasks, current_user), status.HTTP_201_CREATED)
+    
+    # Keys are scoped per user so one client cannot replay another's booking
+    key = f"{current_user['id']}:{idempotency_key}"
+    try:
+        stored = await idempotency_store.begin(key, request_fingerprint(booking_data.model_dump()))
+    except IdempotencyKeyReused:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+    except IdempotencyInProgress:
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still being processed")
+    if stored is not None:
+        return JSONResponse(stored["body"], status_code=stored["status_code"], headers={"Idempotent-Replayed": "true"})
+    
+    try:
+        booking = await _create_booking(booking_data, background_tasks, current_user)
+    except BaseException:
+        await idempotency_store.release(key)
+        raise
+    body = booking.model_dump(mode="json")
+    await idempotency_store.complete(key, status.HTTP_201_CREATED, body)
+    if FAST_RESPONSES:
+        return ORJSONResponse(body, status_code=status.HTTP_201_CREATED)
+    return booking
+
+async def _create_booking(booking_data: BookingCreate, background_tasks: BackgroundTasks, current_user: dict) -> Booking:
     # Get service
     service = await db.services.find_one({"id": booking_data.service_id}, {"_id": 0})
     if not service:
         raise HTTPException(status_code=404, detail="Service not found")
     
     # Get COVID restrictions
-    restrictions = get_covid_restrictions()
+    restrictions = get_covid_restrictions(current_user.get("region"))
     
     # Create booking
     booking_id = str(uuid.uuid4())
+    
+    # Hold the time with the provider first; two overlapping requests cannot both get here
+    try:
+        reservation = await reserve_slot(
+            db, schedule_owner(service), booking_data.preferred_date, booking_data.duration, booking_id,
+            not_before=datetime.now(timezone.utc), tz=SCHEDULE_TIMEZONE)
+    except SlotUnavailable as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
     booking_doc = {
         "id": booking_id,
         "user_id": current_user["id"],
@@ -452,8 +1214,15 @@ async def create_booking(booking_data: BookingCreate, current_user: dict = Depen
         "cost": service["price"],
         "created_at": datetime.now(timezone.utc).isoformat()
     }
+    if reservation:
+        booking_doc["schedule"] = reservation
     
-    await db.bookings.insert_one(booking_doc)
+    try:
+        await db.bookings.insert_one(booking_doc)
+    except Exception:
+        await release_slots(db, [booking_doc])
+        raise
+    await bookings_cache.bump(current_user["id"])
     
     # Create notification for user
     await create_notification(
@@ -464,16 +1233,15 @@ async def create_booking(booking_data: BookingCreate, current_user: dict = Depen
         booking_id
     )
     
-    # Notify all admins about new booking request
-    admins = await db.users.find({"role": "admin"}, {"_id": 0}).to_list(100)
-    for admin in admins:
-        await create_notification(
-            admin["id"],
-            "New Booking Request! 📋",
-            f"{current_user['name']} requested {booking_data.service_type} service.",
-            "info",
-            booking_id
-        )
+    # Notify all admins about new booking request once the response has been sent
+    background_tasks.add_task(
+        create_notifications,
+        await get_admin_ids(),
+        "New Booking Request! 📋",
+        f"{current_user['name']} requested {booking_data.service_type} service.",
+        "info",
+        booking_id
+    )
     
     # Send confirmation email
     await send_email(
@@ -484,67 +1252,91 @@ async def create_booking(booking_data: BookingCreate, current_user: dict = Depen
     
     return Booking(**booking_doc)
 
-@api_router.get("/bookings", response_model=List[Booking])
-async def get_user_bookings(current_user: dict = Depends(get_current_user)):
-    bookings = await db.bookings.find({"user_id": current_user["id"]}, {"_id": 0}).to_list(1000)
-    return bookings
-
-@api_router.get("/admin/bookings", response_model=List[Booking])
-async def get_all_bookings(current_user: dict = Depends(get_admin_user)):
-    bookings = await db.bookings.find({}, {"_id": 0}).to_list(1000)
-    return bookings
-
-@api_router.put("/admin/bookings/{booking_id}")
-async def update_booking_status(booking_id: str, action: BookingAction, current_user: dict = Depends(get_admin_user)):
-    booking = await db.bookings.find_one({"id": booking_id})
-    if not booking:
-        raise HTTPException(status_code=404, detail="Booking not found")
+@api_router.get("/bookings", response_model=BookingPage)
+async def get_user_bookings(
+    cursor: Optional[str] = None,
+    limit: int = Query(BOOKINGS_PAGE_SIZE, ge=1, le=BOOKINGS_MAX_PAGE_SIZE),
+    filters: dict = Depends(booking_filters),
+    current_user: dict = Depends(get_current_user)
+):
+    """The user's bookings, served from the response cache until one of them changes"""
+    user_id = current_user["id"]
     
-    new_status = "accepted" if action.action == "accept" else "declined"
+    async def render() -> bytes:
+        page = await paginate_bookings({**filters, "user_id": user_id}, cursor, limit)
+        if FAST_RESPONSES:
+            return orjson.dumps(trusted_booking_page(page))
+        return BookingPage(**page).model_dump_json().encode()
     
-    await db.bookings.update_one(
-        {"id": booking_id},
-        {"$set": {"status": new_status, "admin_notes": action.admin_notes, "updated_at": datetime.now(timezone.utc).isoformat()}}
+    body = await bookings_cache.get_or_set(user_id, {"cursor": cursor, "limit": limit, "filters": filters}, render)
+    return Response(body, media_type="application/json")
+
+@api_router.get("/admin/bookings", response_model=BookingPage)
+async def get_all_bookings(
+    cursor: Optional[str] = None,
+    limit: int = Query(BOOKINGS_PAGE_SIZE, ge=1, le=BOOKINGS_MAX_PAGE_SIZE),
+    filters: dict = Depends(booking_filters),
+    current_user: dict = Depends(get_admin_user)
+):
+    page = await paginate_bookings(filters, cursor, limit)
+    if FAST_RESPONSES:
+        return ORJSONResponse(trusted_booking_page(page))
+    return page
+
+@api_router.get("/admin/bookings/stats")
+async def get_booking_stats(current_user: dict = Depends(get_admin_user)):
+    """Booking counts per status for the admin dashboard"""
+    counts = dict.fromkeys(BOOKING_STATUSES, 0)
+    async for row in db.bookings.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+        counts[row["_id"]] = row["count"]
+    return {"total": sum(counts.values()), **counts}
+
+@api_router.get("/admin/bookings/export")
+async def export_bookings(
+    export_format: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    gzip: bool = False,
+    batch_size: int = Query(EXPORT_BATCH_SIZE, ge=1, le=10000),
+    filters: dict = Depends(booking_filters),
+    current_user: dict = Depends(get_admin_user)
+):
+    """Stream all matching bookings as NDJSON or CSV, optionally gzip-compressed"""
+    media_type = "text/csv" if export_format == "csv" else "application/x-ndjson"
+    headers = {"Content-Disposition": f'attachment; filename="bookings.{export_format}"'}
+    if gzip:
+        headers["Content-Encoding"] = "gzip"
+    return StreamingResponse(
+        iter_bookings_export(filters, export_format, batch_size, compress=gzip),
+        media_type=media_type,
+        headers=headers,
     )
-    
-    # Create notification for user
-    notification_title = "Booking Accepted! 🎉" if new_status == "accepted" else "Booking Update"
-    notification_message = f"Your {booking['service_type']} booking has been {new_status}."
-    await create_notification(
+
+def booking_status_notification(booking: dict) -> dict:
+    """Notification telling a customer their booking changed status"""
+    new_status = booking["status"]
+    return notification_doc(
         booking["user_id"],
-        notification_title,
-        notification_message,
+        "Booking Accepted! 🎉" if new_status == "accepted" else "Booking Update",
+        f"Your {booking['service_type']} booking has been {new_status}.",
         "success" if new_status == "accepted" else "info",
-        booking_id
+        booking["id"]
     )
-    
-    # Generate QR code for accepted bookings
-    qr_image = None
-    if new_status == "accepted":
-        qr_data = f"""HomeBound Care Receipt
-Booking ID: {booking_id}
-Service: {booking['service_type']}
-Date: {booking['preferred_date']}
-Duration: {booking['duration']} min
-Cost: ${booking['cost']}
-Status: CONFIRMED
-Customer: {booking['user_name']}"""
-        qr_image = generate_qr_code(qr_data)
-    
-    # Send email notification with QR code
+
+def booking_status_email(booking: dict, admin_notes: Optional[str], qr_image: Optional[bytes]) -> dict:
+    """``send_email`` arguments telling a customer their booking changed status"""
+    new_status = booking["status"]
     email_body = f"""<h2>Booking {new_status.title()}</h2>
     <p>Dear {booking['user_name']},</p>
     <p>Your booking for <strong>{booking['service_type']}</strong> has been {new_status}.</p>
     <div style="background: #f3f4f6; padding: 16px; border-radius: 8px; margin: 16px 0;">
         <p><strong>Booking Details:</strong></p>
-        <p>📋 Booking ID: {booking_id}</p>
+        <p>📋 Booking ID: {booking['id']}</p>
         <p>📅 Date: {booking['preferred_date']}</p>
         <p>⏱️ Duration: {booking['duration']} minutes</p>
         <p>💰 Cost: ${booking['cost']}</p>
     </div>
-    <p>{action.admin_notes or ''}</p>"""
+    <p>{admin_notes or ''}</p>"""
     
-    if new_status == "accepted":
+    if qr_image:
         email_body += """<div style="margin: 20px 0; text-align: center;">
         <h3>Your Service Receipt QR Code:</h3>
         <img src="cid:qr_code" alt="Booking QR Code" style="max-width: 300px; border: 2px solid #4F46E5; padding: 10px; border-radius: 8px;"/>
@@ -552,13 +1344,37 @@ Customer: {booking['user_name']}"""
         </div>"""
     
     email_body += "<p>Thank you for choosing HomeBound Care!</p>"
+    return {
+        "to_email": booking["user_email"],
+        "subject": f"Booking {new_status.title()} - HomeBound Care",
+        "body": email_body,
+        "qr_image": qr_image,
+    }
+
+@api_router.put("/admin/bookings/{booking_id}")
+async def update_booking_status(booking_id: str, action: BookingAction, current_user: dict = Depends(get_admin_user)):
+    # Only the request whose conditional update matched runs the side effects below
+    try:
+        booking = await transition_booking(db, booking_id, action.action, {"admin_notes": action.admin_notes})
+    except BookingNotFound:
+        raise HTTPException(status_code=404, detail="Booking not found")
+    except InvalidTransition as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    await bookings_cache.bump(booking["user_id"])
+    new_status = booking["status"]
+    if new_status in ("declined", "cancelled"):
+        await release_slots(db, [booking])
     
-    await send_email(
-        booking["user_email"],
-        f"Booking {new_status.title()} - HomeBound Care",
-        email_body,
-        qr_image
-    )
+    # Create notification for user
+    await insert_notifications([booking_status_notification(booking)])
+    
+    # Generate QR code for accepted bookings
+    qr_image = None
+    if new_status == "accepted":
+        qr_image = await get_booking_qr_png(booking)
+    
+    # Send email notification with QR code
+    await send_email(**booking_status_email(booking, action.admin_notes, qr_image))
     
     # Notify admin
     await create_notification(
@@ -571,9 +1387,117 @@ Customer: {booking['user_name']}"""
     
     return {"message": f"Booking {new_status}", "booking_id": booking_id, "qr_generated": new_status == "accepted"}
 
+@api_router.post("/admin/bookings/bulk", response_model=BulkBookingActionResult)
+async def bulk_update_booking_status(request: BulkBookingAction, current_user: dict = Depends(get_admin_user)):
+    """Apply many accept/decline/complete/cancel actions at once, reporting the outcome per booking"""
+    booking_ids = [item.booking_id for item in request.items]
+    if len(set(booking_ids)) != len(booking_ids):
+        raise HTTPException(status_code=400, detail="Each booking may appear only once")
+    
+    # One conditional bulk_write; only bookings this request actually moved get side effects
+    notes = {item.booking_id: item.admin_notes for item in request.items}
+    updated, failed = await transition_bookings(
+        db, [(item.booking_id, item.action, {"admin_notes": item.admin_notes}) for item in request.items])
+    changed = [updated[booking_id] for booking_id in booking_ids if booking_id in updated]
+    await asyncio.gather(*(bookings_cache.bump(user_id) for user_id in {b["user_id"] for b in changed}))
+    
+    await release_slots(db, [b for b in changed if b["status"] in ("declined", "cancelled")])
+    
+    # Receipt QR codes render concurrently on the QR pool
+    accepted = [b for b in changed if b["status"] == "accepted"]
+    rendered = await asyncio.gather(*(get_booking_qr_png(b) for b in accepted), return_exceptions=True)
+    qr_images = {}
+    for booking, png in zip(accepted, rendered):
+        if isinstance(png, Exception):
+            logger.error(f"QR render failed for booking {booking['id']}: {png}")
+        else:
+            qr_images[booking["id"]] = png
+    
+    notifications = [booking_status_notification(b) for b in changed]
+    if changed:
+        notifications.append(notification_doc(
+            current_user["id"],
+            "Bookings Updated",
+            f"You updated {len(changed)} booking(s)",
+            "success"
+        ))
+    await insert_notifications(notifications)
+    await enqueue_emails(db, [booking_status_email(b, notes[b["id"]], qr_images.get(b["id"])) for b in changed])
+    outbox_sender.notify()
+    
+    results = []
+    for booking_id in booking_ids:
+        if booking_id in updated:
+            results.append({"booking_id": booking_id, "ok": True, "status": updated[booking_id]["status"],
+                            "qr_generated": booking_id in qr_images})
+        else:
+            error = failed[booking_id]
+            results.append({"booking_id": booking_id, "ok": False,
+                            "error": "Booking not found" if isinstance(error, BookingNotFound) else str(error)})
+    return {"succeeded": len(changed), "failed": len(failed), "results": results}
+
+@api_router.get("/admin/metrics/password-hashing")
+async def get_password_hashing_metrics(current_user: dict = Depends(get_admin_user)):
+    """Password pool queue depth and hashing time, for sizing PASSWORD_HASH_WORKERS"""
+    completed = password_pool_stats["completed"]
+    return {
+        "workers": PASSWORD_HASH_WORKERS,
+        "queue_limit": PASSWORD_HASH_QUEUE_LIMIT,
+        **password_pool_stats,
+        "wait_seconds_avg": password_pool_stats["wait_seconds_total"] / completed if completed else 0.0,
+        "hash_seconds_avg": password_pool_stats["hash_seconds_total"] / completed if completed else 0.0,
+    }
+
+@api_router.get("/admin/metrics/user-cache")
+async def get_user_cache_metrics(current_user: dict = Depends(get_admin_user)):
+    """Hit/miss counters for the authenticated user cache"""
+    return user_cache.stats()
+
+@api_router.get("/admin/metrics/response-cache")
+async def get_response_cache_metrics(current_user: dict = Depends(get_admin_user)):
+    """Hit/miss counters for the /api/bookings response cache"""
+    return bookings_cache.stats()
+
+@api_router.get("/admin/profiles")
+async def list_profiles(limit: int = Query(50, ge=1, le=200), current_user: dict = Depends(get_admin_user)):
+    """Recent slow-request profiles, newest first"""
+    return await asyncio.to_thread(profile_store.list, limit)
+
+@api_router.get("/admin/profiles/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    profile_format: str = Query("speedscope", alias="format", pattern="^(speedscope|collapsed)$"),
+    current_user: dict = Depends(get_admin_user),
+):
+    """Download a profile as speedscope JSON or collapsed stacks (flamegraph.pl, speedscope)"""
+    profile = await asyncio.to_thread(profile_store.load, profile_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    
+    if profile_format == "collapsed":
+        return Response(
+            to_collapsed(profile),
+            media_type="text/plain",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.folded"'},
+        )
+    return Response(
+        json.dumps(to_speedscope(profile)),
+        media_type="application/json",
+        headers={"Content-Disposition": f'attachment; filename="{profile_id}.speedscope.json"'},
+    )
+
 @api_router.get("/covid/restrictions", response_model=CovidRestrictions)
-async def get_restrictions():
-    return get_covid_restrictions()
+async def get_restrictions(request: Request, region: Optional[str] = Query(None, max_length=10)):
+    """Restrictions for a region, served as pre-serialized JSON from the current snapshot"""
+    body, etag = covid_restrictions.get_serialized(region)
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={COVID_RESTRICTIONS_MAX_AGE_SECONDS}"}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+@api_router.get("/covid/regions")
+async def get_restriction_regions():
+    return {"regions": covid_restrictions.regions(), "default": covid_restrictions.default_region}
 
 @api_router.get("/notifications")
 async def get_notifications(current_user: dict = Depends(get_current_user)):
@@ -583,35 +1507,115 @@ async def get_notifications(current_user: dict = Depends(get_current_user)):
         {"_id": 0}
     ).sort("created_at", -1).limit(50).to_list(50)
     
-    unread_count = await db.notifications.count_documents({"user_id": current_user["id"], "read": False})
+    unread_count = await get_unread_count(db, current_user["id"])
     
     return {"notifications": notifications, "unread_count": unread_count}
 
+@api_router.post("/notifications/stream-ticket")
+async def create_stream_ticket(
+    credentials: HTTPAuthorizationCredentials = Depends(security),
+    current_user: dict = Depends(get_current_user)
+):
+    """Short-lived, single-use ticket for opening /notifications/stream, tied to the caller's session"""
+    session = decode_token(credentials.credentials)
+    now = datetime.now(timezone.utc)
+    ticket = jwt.encode({
+        "sub": current_user["id"],
+        "ver": session.get("ver", 0),
+        "purpose": STREAM_TICKET_PURPOSE,
+        # The access token the stream lives and dies with
+        "sid": session.get("jti"),
+        "sid_exp": session["exp"],
+        "exp": now + timedelta(seconds=NOTIFICATION_STREAM_TICKET_SECONDS),
+        "jti": uuid.uuid4().hex,
+    }, SECRET_KEY, algorithm=ALGORITHM)
+    return {"ticket": ticket, "expires_in": NOTIFICATION_STREAM_TICKET_SECONDS}
+
+async def redeem_stream_ticket(ticket: str) -> dict:
+    """Claims of a valid, unused stream ticket, which is used up; raises 401 otherwise"""
+    try:
+        claims = jwt.decode(ticket, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise credentials_exception()
+    if claims.get("purpose") != STREAM_TICKET_PURPOSE or token_revocations.is_revoked(claims):
+        raise credentials_exception()
+    await token_revocations.revoke_token(claims["jti"], datetime.fromtimestamp(claims["exp"], timezone.utc))
+    return claims
+
+def stream_session_ended(claims: dict) -> bool:
+    """Whether the session a stream was opened from was logged out, revoked or has expired"""
+    session = {"sub": claims["sub"], "ver": claims["ver"], "jti": claims.get("sid")}
+    return token_revocations.is_revoked(session) or time.time() >= claims["sid_exp"]
+
+@api_router.get("/notifications/stream")
+async def stream_notifications(
+    request: Request,
+    ticket: str = Query(..., description="From POST /notifications/stream-ticket; EventSource cannot send headers")
+):
+    """Server-Sent Events stream of new notifications for the current user.
+
+    The stream ends with a ``revoked`` event once its session is logged out,
+    revoked (e.g. account deletion) or expires.
+    """
+    claims = await redeem_stream_ticket(ticket)
+    if stream_session_ended(claims):
+        raise credentials_exception()
+    subscription = notification_broker.subscribe(claims["sub"])
+    
+    async def event_stream():
+        with subscription:
+            # Tell clients how long to wait before reconnecting after a drop
+            yield "retry: 5000\n\n"
+            while not await request.is_disconnected():
+                event = await subscription.get(timeout=NOTIFICATION_HEARTBEAT_SECONDS)
+                # Checked on every wake-up; revocations from other workers arrive with the next sync
+                if stream_session_ended(claims):
+                    yield "event: revoked\ndata: {}\n\n"
+                    break
+                if event is None:
+                    yield ": heartbeat\n\n"
+                elif event.get("type") == "session":
+                    continue
+                elif event.get("type") == "resync":
+                    yield "event: resync\ndata: {}\n\n"
+                else:
+                    yield f"event: notification\ndata: {json.dumps(event)}\n\n"
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 @api_router.put("/notifications/{notification_id}/read")
 async def mark_notification_read(notification_id: str, current_user: dict = Depends(get_current_user)):
     """Mark notification as read"""
     result = await db.notifications.update_one(
-        {"id": notification_id, "user_id": current_user["id"]},
+        {"id": notification_id, "user_id": current_user["id"], "read": False},
         {"$set": {"read": True}}
     )
     
     if result.modified_count == 0:
         raise HTTPException(status_code=404, detail="Notification not found")
     
+    await decrement_unread(db, current_user["id"])
+    
     return {"message": "Notification marked as read"}
 
 @api_router.put("/notifications/read-all")
 async def mark_all_notifications_read(current_user: dict = Depends(get_current_user)):
     """Mark all notifications as read"""
-    await db.notifications.update_many(
+    result = await db.notifications.update_many(
         {"user_id": current_user["id"], "read": False},
         {"$set": {"read": True}}
     )
+    # Subtract what was actually marked so notifications created meanwhile stay counted
+    await decrement_unread(db, current_user["id"], result.modified_count)
     
     return {"message": "All notifications marked as read"}
 
 @api_router.get("/bookings/{booking_id}/qr")
-async def get_booking_qr(booking_id: str, current_user: dict = Depends(get_current_user)):
+async def get_booking_qr(booking_id: str, request: Request, current_user: dict = Depends(get_current_user)):
     """Get QR code for a booking"""
     booking = await db.bookings.find_one({"id": booking_id})
     if not booking:
@@ -624,23 +1628,37 @@ async def get_booking_qr(booking_id: str, current_user: dict = Depends(get_curre
     if booking["status"] != "accepted":
         raise HTTPException(status_code=400, detail="QR code only available for accepted bookings")
     
-    # Generate QR code
-    qr_data = f"""HomeBound Care Receipt
-Booking ID: {booking_id}
-Service: {booking['service_type']}
-Date: {booking['preferred_date']}
-Duration: {booking['duration']} min
-Cost: ${booking['cost']}
-Status: CONFIRMED
-Customer: {booking['user_name']}"""
+    # The receipt never changes once accepted, so its hash is a strong validator
+    etag = f'"{qr_key(booking_receipt_text(booking))}"'
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={QR_CACHE_MAX_AGE_SECONDS}"}
+    if etag_matches(request, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
     
-    qr_image = generate_qr_code(qr_data)
-    
-    return StreamingResponse(io.BytesIO(qr_image), media_type="image/png")
+    qr_image = await get_booking_qr_png(booking)
+    return Response(content=qr_image, media_type="image/png", headers=headers)
 
 # Initialize default services
 @app.on_event("startup")
 async def startup_event():
+    await warm_up(db, MONGO_MIN_POOL_SIZE)
+    await ensure_indexes(db)
+    drift = await index_drift(db)
+    if drift:
+        logging.warning(f"Index drift detected: {drift}")
+    
+    outbox_sender.start()
+    erasure_worker.start()
+    if NOTIFICATION_BROKER == "changestream":
+        await notification_relay.start()
+    await covid_restrictions.refresh()
+    await token_revocations.sync()
+    periodic_tasks.append(asyncio.create_task(token_revocations.run(TOKEN_REVOCATION_SYNC_SECONDS)))
+    periodic_tasks.append(asyncio.create_task(covid_restrictions.run(COVID_RESTRICTIONS_REFRESH_SECONDS)))
+    periodic_tasks.append(asyncio.create_task(monitor_event_loop_lag(EVENT_LOOP_LAG_INTERVAL_SECONDS)))
+    periodic_tasks.append(asyncio.create_task(watch_catalog_version(SERVICE_CATALOG_REFRESH_SECONDS)))
+    if NOTIFICATION_COUNTER_RECONCILE_SECONDS > 0:
+        periodic_tasks.append(asyncio.create_task(run_reconciliation(db, NOTIFICATION_COUNTER_RECONCILE_SECONDS)))
+    
     # Check if services exist
     count = await db.services.count_documents({})
     if count == 0:
@@ -697,7 +1715,32 @@ async def startup_event():
             }
         ]
         await db.services.insert_many(default_services)
+        await bump_catalog_version()
         logging.info("Default services initialized")
+    
+    app_state["started"] = True
+
+@app.get("/metrics", include_in_schema=False)
+async def get_metrics(request: Request):
+    """Prometheus text exposition of request, MongoDB and worker metrics"""
+    if METRICS_TOKEN and not secrets.compare_digest(request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Invalid metrics token")
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/healthz", include_in_schema=False)
+async def healthz():
+    """Liveness: the process is serving requests. Never touches MongoDB, so a database outage does not restart workers"""
+    return {"status": "ok", "pool": pool_monitor.stats()}
+
+@app.get("/readyz", include_in_schema=False)
+async def readyz():
+    """Readiness: startup has finished and MongoDB answers a ping"""
+    reason = "Starting up" if not app_state["started"] else await check_ready(db, READINESS_TIMEOUT_SECONDS)
+    body = {"status": "ready" if reason is None else "not ready", "pool": pool_monitor.stats()}
+    if reason is not None:
+        body["reason"] = reason
+        return JSONResponse(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, content=body)
+    return body
 
 app.include_router(api_router)
 
@@ -708,6 +1751,15 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(
+    ProfilerMiddleware,
+    sampler=stack_sampler,
+    store=profile_store,
+    sample_rate=PROFILER_SAMPLE_RATE,
+    threshold_seconds=PROFILER_THRESHOLD_SECONDS,
+)
+# Added last so it wraps CORS and sees every response
+app.add_middleware(MetricsMiddleware)
 
 logging.basicConfig(
     level=logging.INFO,
@@ -717,4 +1769,13 @@ logger = logging.getLogger(__name__)
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    app_state["started"] = False
+    await outbox_sender.stop()
+    await erasure_worker.stop()
+    await notification_relay.stop()
+    for task in periodic_tasks:
+        task.cancel()
+    client.close()
+    password_executor.shutdown(wait=False)
+    qr_executor.shutdown(wait=False)
+    stack_sampler.stop()
\ No newline at end of file
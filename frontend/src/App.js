@@ -22,6 +22,37 @@ axios.interceptors.request.use((config) => {
   return config;
 });
 
+// With short-lived access tokens, renew once on 401 and retry the request
+let refreshing = null;
+const refreshAccessToken = async () => {
+  const refreshToken = localStorage.getItem('refreshToken');
+  if (!refreshToken) throw new Error('No refresh token');
+  const response = await axios.post(`${API}/auth/refresh`, { refresh_token: refreshToken }, { _retried: true });
+  localStorage.setItem('token', response.data.access_token);
+  localStorage.setItem('refreshToken', response.data.refresh_token);
+};
+
+axios.interceptors.response.use(
+  (response) => response,
+  async (error) => {
+    const config = error.config;
+    if (error.response?.status !== 401 || !config || config._retried || !localStorage.getItem('refreshToken')) {
+      return Promise.reject(error);
+    }
+    config._retried = true;
+    try {
+      // Concurrent 401s share one refresh; a refresh token is single use
+      refreshing = refreshing || refreshAccessToken().finally(() => { refreshing = null; });
+      await refreshing;
+    } catch (refreshError) {
+      localStorage.removeItem('token');
+      localStorage.removeItem('refreshToken');
+      return Promise.reject(error);
+    }
+    return axios(config);
+  }
+);
+
 export const AuthContext = React.createContext();
 
 function App() {
@@ -43,18 +74,29 @@ function App() {
       setUser(response.data);
     } catch (error) {
       localStorage.removeItem('token');
+      localStorage.removeItem('refreshToken');
     } finally {
       setLoading(false);
     }
   };
 
-  const login = (token, userData) => {
+  const login = (token, userData, refreshToken) => {
     localStorage.setItem('token', token);
+    if (refreshToken) {
+      localStorage.setItem('refreshToken', refreshToken);
+    } else {
+      localStorage.removeItem('refreshToken');
+    }
     setUser(userData);
   };
 
   const logout = () => {
+    const refreshToken = localStorage.getItem('refreshToken');
+    if (localStorage.getItem('token')) {
+      axios.post(`${API}/auth/logout`, { refresh_token: refreshToken }).catch(() => {});
+    }
     localStorage.removeItem('token');
+    localStorage.removeItem('refreshToken');
     setUser(null);
   };
 
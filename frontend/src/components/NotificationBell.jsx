@@ -18,9 +18,69 @@ const NotificationBell = () => {
 
   useEffect(() => {
     fetchNotifications();
-    // Poll for new notifications every 30 seconds
-    const interval = setInterval(fetchNotifications, 30000);
-    return () => clearInterval(interval);
+
+    // Poll every 30 seconds only while the live stream is unavailable
+    let interval = null;
+    const startPolling = () => {
+      if (!interval) interval = setInterval(fetchNotifications, 30000);
+    };
+    const stopPolling = () => {
+      clearInterval(interval);
+      interval = null;
+    };
+
+    const token = localStorage.getItem('token');
+    if (!window.EventSource || !token) {
+      startPolling();
+      return stopPolling;
+    }
+
+    let source = null;
+    let reconnect = null;
+    let closed = false;
+
+    // The stream is opened with a single-use ticket, not the access token, which would end up in access logs
+    const connect = async () => {
+      let ticket;
+      try {
+        ticket = (await axios.post(`${API}/notifications/stream-ticket`)).data.ticket;
+      } catch (error) {
+        startPolling();
+        return;
+      }
+      if (closed) return;
+
+      source = new EventSource(`${API}/notifications/stream?ticket=${encodeURIComponent(ticket)}`);
+      source.onopen = () => {
+        stopPolling();
+        fetchNotifications();
+      };
+      source.onerror = () => {
+        // EventSource would retry with the used ticket; reconnect with a fresh one instead
+        source.close();
+        startPolling();
+        reconnect = setTimeout(connect, 5000);
+      };
+      source.addEventListener('notification', (event) => {
+        const notification = JSON.parse(event.data);
+        setNotifications(prev => [notification, ...prev].slice(0, 50));
+        setUnreadCount(prev => prev + 1);
+      });
+      source.addEventListener('resync', fetchNotifications);
+      // Logged out or signed out elsewhere; the next API call deals with the session
+      source.addEventListener('revoked', () => {
+        source.close();
+        startPolling();
+      });
+    };
+    connect();
+
+    return () => {
+      closed = true;
+      clearTimeout(reconnect);
+      if (source) source.close();
+      stopPolling();
+    };
   }, []);
 
   const fetchNotifications = async () => {
@@ -16,13 +16,15 @@ const AdminDashboard = () => {
   const navigate = useNavigate();
   const { user } = useContext(AuthContext);
   const [bookings, setBookings] = useState([]);
-  const [filteredBookings, setFilteredBookings] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [stats, setStats] = useState({ total: 0, pending: 0, accepted: 0, declined: 0 });
   const [selectedBooking, setSelectedBooking] = useState(null);
   const [dialogOpen, setDialogOpen] = useState(false);
   const [adminNotes, setAdminNotes] = useState('');
   const [actionType, setActionType] = useState('accept');
   const [filterStatus, setFilterStatus] = useState('all');
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     if (user?.role !== 'admin') {
@@ -30,21 +32,21 @@ const AdminDashboard = () => {
       return;
     }
     fetchBookings();
-  }, [user]);
+  }, [user, filterStatus]);
 
-  useEffect(() => {
-    if (filterStatus === 'all') {
-      setFilteredBookings(bookings);
-    } else {
-      setFilteredBookings(bookings.filter(b => b.status === filterStatus));
-    }
-  }, [filterStatus, bookings]);
+  const fetchBookings = async (cursor = null) => {
+    const params = {};
+    if (filterStatus !== 'all') params.status = filterStatus;
+    if (cursor) params.cursor = cursor;
 
-  const fetchBookings = async () => {
     try {
-      const response = await axios.get(`${API}/admin/bookings`);
-      setBookings(response.data);
-      setFilteredBookings(response.data);
+      const requests = [axios.get(`${API}/admin/bookings`, { params })];
+      if (!cursor) requests.push(axios.get(`${API}/admin/bookings/stats`));
+      const [pageRes, statsRes] = await Promise.all(requests);
+
+      setBookings(prev => (cursor ? [...prev, ...pageRes.data.items] : pageRes.data.items));
+      setNextCursor(pageRes.data.next_cursor);
+      if (statsRes) setStats(statsRes.data);
     } catch (error) {
       toast.error('Failed to load bookings');
     } finally {
@@ -52,6 +54,12 @@ const AdminDashboard = () => {
     }
   };
 
+  const handleLoadMore = async () => {
+    setLoadingMore(true);
+    await fetchBookings(nextCursor);
+    setLoadingMore(false);
+  };
+
   const handleActionDialog = (booking, action) => {
     setSelectedBooking(booking);
     setActionType(action);
@@ -70,7 +78,14 @@ const AdminDashboard = () => {
       setDialogOpen(false);
       fetchBookings();
     } catch (error) {
-      toast.error('Failed to update booking');
+      if (error.response?.status === 409) {
+        // Another admin already handled this booking; show its current status
+        toast.error(error.response.data.detail);
+        setDialogOpen(false);
+        fetchBookings();
+      } else {
+        toast.error('Failed to update booking');
+      }
     }
   };
 
@@ -82,13 +97,6 @@ const AdminDashboard = () => {
     }
   };
 
-  const stats = {
-    total: bookings.length,
-    pending: bookings.filter(b => b.status === 'pending').length,
-    accepted: bookings.filter(b => b.status === 'accepted').length,
-    declined: bookings.filter(b => b.status === 'declined').length
-  };
-
   if (loading) {
     return <div className="min-h-screen flex items-center justify-center">Loading admin dashboard...</div>;
   }
@@ -164,7 +172,7 @@ const AdminDashboard = () => {
                   <SelectItem value="declined">Declined Only</SelectItem>
                 </SelectContent>
               </Select>
-              <span className="text-sm text-gray-500">Showing {filteredBookings.length} of {bookings.length} bookings</span>
+              <span className="text-sm text-gray-500">Showing {bookings.length} of {filterStatus === 'all' ? stats.total : stats[filterStatus]} bookings</span>
             </div>
           </CardContent>
         </Card>
@@ -176,14 +184,14 @@ const AdminDashboard = () => {
             <CardDescription>Review and manage all booking requests</CardDescription>
           </CardHeader>
           <CardContent>
-            {filteredBookings.length === 0 ? (
+            {bookings.length === 0 ? (
               <div className="text-center py-12 text-gray-500" data-testid="no-bookings-message">
                 <Clock className="w-16 h-16 mx-auto mb-4 opacity-50" />
                 <p>No bookings to display</p>
               </div>
             ) : (
               <div className="space-y-4">
-                {filteredBookings.map((booking) => (
+                {bookings.map((booking) => (
                   <div key={booking.id} className="border-2 rounded-lg p-4 hover:shadow-md transition-all" data-testid={`admin-booking-item-${booking.id}`}>
                     <div className="flex justify-between items-start mb-3">
                       <div>
@@ -247,6 +255,17 @@ const AdminDashboard = () => {
                     )}
                   </div>
                 ))}
+                {nextCursor && (
+                  <Button
+                    variant="outline"
+                    className="w-full"
+                    onClick={handleLoadMore}
+                    disabled={loadingMore}
+                    data-testid="load-more-bookings-btn"
+                  >
+                    {loadingMore ? 'Loading...' : 'Load more'}
+                  </Button>
+                )}
               </div>
             )}
           </CardContent>
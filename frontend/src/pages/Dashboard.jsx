@@ -13,9 +13,11 @@ const Dashboard = () => {
   const navigate = useNavigate();
   const { user, logout } = useContext(AuthContext);
   const [bookings, setBookings] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [covidRestrictions, setCovidRestrictions] = useState(null);
   const [suggestions, setSuggestions] = useState([]);
   const [loading, setLoading] = useState(true);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     fetchDashboardData();
@@ -25,11 +27,12 @@ const Dashboard = () => {
     try {
       const [bookingsRes, restrictionsRes, suggestionsRes] = await Promise.all([
         axios.get(`${API}/bookings`),
-        axios.get(`${API}/covid/restrictions`),
+        axios.get(`${API}/covid/restrictions`, { params: user?.region ? { region: user.region } : {} }),
         axios.get(`${API}/services/suggestions`)
       ]);
       
-      setBookings(bookingsRes.data);
+      setBookings(bookingsRes.data.items);
+      setNextCursor(bookingsRes.data.next_cursor);
       setCovidRestrictions(restrictionsRes.data);
       setSuggestions(suggestionsRes.data.suggestions);
     } catch (error) {
@@ -39,6 +42,19 @@ const Dashboard = () => {
     }
   };
 
+  const handleLoadMore = async () => {
+    setLoadingMore(true);
+    try {
+      const response = await axios.get(`${API}/bookings`, { params: { cursor: nextCursor } });
+      setBookings(prev => [...prev, ...response.data.items]);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      toast.error('Failed to load bookings');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleLogout = () => {
     logout();
     navigate('/');
@@ -50,7 +66,7 @@ const Dashboard = () => {
       await axios.delete(`${API}/user/delete`);
       logout();
       navigate('/');
-      toast.success('Account and all data deleted permanently');
+      toast.success('Account locked; all your data is being permanently deleted');
     } catch (error) {
       toast.error('Failed to delete account');
     }
@@ -203,7 +219,7 @@ const Dashboard = () => {
           <CardHeader>
             <CardTitle className="flex items-center gap-2">
               <Calendar className="w-5 h-5" />
-              My Bookings ({bookings.length})
+              My Bookings ({bookings.length}{nextCursor ? '+' : ''})
             </CardTitle>
             <CardDescription>Track your service requests</CardDescription>
           </CardHeader>
@@ -252,6 +268,17 @@ const Dashboard = () => {
                     )}
                   </div>
                 ))}
+                {nextCursor && (
+                  <Button
+                    variant="outline"
+                    className="w-full"
+                    onClick={handleLoadMore}
+                    disabled={loadingMore}
+                    data-testid="load-more-bookings-btn"
+                  >
+                    {loadingMore ? 'Loading...' : 'Load more'}
+                  </Button>
+                )}
               </div>
             )}
           </CardContent>
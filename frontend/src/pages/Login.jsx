@@ -24,7 +24,7 @@ const Login = () => {
 
     try {
       const response = await axios.post(`${API}/auth/login`, formData);
-      login(response.data.access_token, response.data.user);
+      login(response.data.access_token, response.data.user, response.data.refresh_token);
       toast.success('Login successful!');
       
       if (response.data.user.role === 'admin') {
@@ -26,6 +26,7 @@ const Register = () => {
     language: 'English',
     role: 'client',
     trade: '',
+    region: '',
     vax_status: false,
     credit_card: '',
     consent_vax: false,
@@ -49,11 +50,12 @@ const Register = () => {
     try {
       const submitData = {
         ...formData,
-        age: formData.age ? parseInt(formData.age) : null
+        age: formData.age ? parseInt(formData.age) : null,
+        region: formData.region || null
       };
       
       const response = await axios.post(`${API}/auth/register`, submitData);
-      login(response.data.access_token, response.data.user);
+      login(response.data.access_token, response.data.user, response.data.refresh_token);
       toast.success('Registration successful! Welcome to HomeBound Care.');
       navigate('/dashboard');
     } catch (error) {
@@ -191,6 +193,25 @@ const Register = () => {
                 </div>
               </div>
 
+              <div>
+                <Label htmlFor="region">State/Territory (for local COVID restrictions)</Label>
+                <Select value={formData.region} onValueChange={(val) => setFormData({ ...formData, region: val })}>
+                  <SelectTrigger id="region" data-testid="register-region-select">
+                    <SelectValue placeholder="Select your state or territory" />
+                  </SelectTrigger>
+                  <SelectContent>
+                    <SelectItem value="ACT">Australian Capital Territory</SelectItem>
+                    <SelectItem value="NSW">New South Wales</SelectItem>
+                    <SelectItem value="NT">Northern Territory</SelectItem>
+                    <SelectItem value="QLD">Queensland</SelectItem>
+                    <SelectItem value="SA">South Australia</SelectItem>
+                    <SelectItem value="TAS">Tasmania</SelectItem>
+                    <SelectItem value="VIC">Victoria</SelectItem>
+                    <SelectItem value="WA">Western Australia</SelectItem>
+                  </SelectContent>
+                </Select>
+              </div>
+
               {formData.role === 'provider' && (
                 <div>
                   <Label htmlFor="trade">Trade/Profession *</Label>
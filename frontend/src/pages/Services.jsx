@@ -9,6 +9,7 @@ import { Dialog, DialogContent, DialogDescription, DialogHeader, DialogTitle, Di
 import { Label } from '@/components/ui/label';
 import { Input } from '@/components/ui/input';
 import { Textarea } from '@/components/ui/textarea';
+import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '@/components/ui/select';
 import { Home, Video, DollarSign, Clock, ArrowLeft, Calendar } from 'lucide-react';
 
 const Services = () => {
@@ -18,19 +19,50 @@ const Services = () => {
   const [selectedService, setSelectedService] = useState(null);
   const [dialogOpen, setDialogOpen] = useState(false);
   const [loading, setLoading] = useState(true);
+  const [search, setSearch] = useState('');
+  // One key per booking attempt, reused on resubmits so a retry never books twice
+  const [bookingKey, setBookingKey] = useState(null);
   const [bookingData, setBookingData] = useState({
-    preferred_date: '',
+    date: '',
+    start: '',
     duration: 60,
     details: ''
   });
+  // Free start times on the chosen day; null when the service takes free-form date requests
+  const [slots, setSlots] = useState(null);
 
   useEffect(() => {
-    fetchServices();
-  }, []);
+    // Debounce typing so each keystroke doesn't hit the search endpoint
+    const timeout = setTimeout(() => fetchServices(search.trim()), search ? 300 : 0);
+    return () => clearTimeout(timeout);
+  }, [search]);
 
-  const fetchServices = async () => {
+  useEffect(() => {
+    if (!dialogOpen || !selectedService || !bookingData.date) {
+      setSlots(null);
+      return;
+    }
+    const timeout = setTimeout(() => fetchSlots(selectedService.id, bookingData.date, bookingData.duration), 300);
+    return () => clearTimeout(timeout);
+  }, [dialogOpen, selectedService, bookingData.date, bookingData.duration]);
+
+  const fetchSlots = async (serviceId, day, duration) => {
+    try {
+      const response = await axios.get(`${API}/services/${serviceId}/slots`, {
+        params: { date_from: day, date_to: day, duration: parseInt(duration) || 60 }
+      });
+      setSlots(response.data);
+    } catch (error) {
+      // 404: the provider has no schedule, so the date alone is requested
+      setSlots(null);
+    }
+    setBookingData((data) => ({ ...data, start: '' }));
+  };
+
+  const fetchServices = async (query = '') => {
     try {
-      const response = await axios.get(`${API}/services`);
+      // Without parameters the catalog is served from the backend cache
+      const response = await axios.get(`${API}/services`, { params: query ? { q: query } : {} });
       setServices(response.data);
     } catch (error) {
       toast.error('Failed to load services');
@@ -41,25 +73,31 @@ const Services = () => {
 
   const handleBookService = (service) => {
     setSelectedService(service);
+    setBookingKey(crypto.randomUUID());
     setDialogOpen(true);
   };
 
   const handleSubmitBooking = async (e) => {
     e.preventDefault();
+    if (slots && !bookingData.start) {
+      toast.error('Please choose a start time');
+      return;
+    }
     
     try {
       const bookingPayload = {
         service_id: selectedService.id,
         service_type: selectedService.name,
-        preferred_date: bookingData.preferred_date,
+        // Scheduled services need a start time; others take the preferred day
+        preferred_date: slots ? bookingData.start : bookingData.date,
         duration: parseInt(bookingData.duration),
         details: bookingData.details
       };
 
-      await axios.post(`${API}/bookings`, bookingPayload);
+      await axios.post(`${API}/bookings`, bookingPayload, { headers: { 'Idempotency-Key': bookingKey } });
       toast.success('Service request submitted! Check your email for confirmation.');
       setDialogOpen(false);
-      setBookingData({ preferred_date: '', duration: 60, details: '' });
+      setBookingData({ date: '', start: '', duration: 60, details: '' });
       navigate('/dashboard');
     } catch (error) {
       toast.error(error.response?.data?.detail || 'Failed to submit booking');
@@ -96,6 +134,16 @@ const Services = () => {
           </p>
         </div>
 
+        <div className="max-w-md mx-auto mb-8">
+          <Input
+            type="search"
+            placeholder="Search services..."
+            value={search}
+            onChange={(e) => setSearch(e.target.value)}
+            data-testid="service-search-input"
+          />
+        </div>
+
         <div className="grid md:grid-cols-2 lg:grid-cols-3 gap-6">
           {services.map((service) => (
             <Card key={service.id} className="hover:shadow-xl transition-all" data-testid={`service-card-${service.id}`}>
@@ -149,14 +197,38 @@ const Services = () => {
                           <Input
                             id="preferred_date"
                             type="date"
-                            value={bookingData.preferred_date}
-                            onChange={(e) => setBookingData({ ...bookingData, preferred_date: e.target.value })}
+                            value={bookingData.date}
+                            onChange={(e) => setBookingData({ ...bookingData, date: e.target.value })}
                             required
                             min={new Date().toISOString().split('T')[0]}
                             data-testid="booking-date-input"
                           />
                         </div>
 
+                        {slots && (
+                          <div>
+                            <Label htmlFor="start_time">Start Time *</Label>
+                            {slots.length > 0 ? (
+                              <Select value={bookingData.start} onValueChange={(val) => setBookingData({ ...bookingData, start: val })}>
+                                <SelectTrigger id="start_time" data-testid="booking-slot-select">
+                                  <SelectValue placeholder="Choose a start time" />
+                                </SelectTrigger>
+                                <SelectContent>
+                                  {slots.map((slot) => (
+                                    <SelectItem key={slot.start} value={slot.start}>
+                                      {slot.start.slice(11, 16)} - {slot.end.slice(11, 16)}
+                                    </SelectItem>
+                                  ))}
+                                </SelectContent>
+                              </Select>
+                            ) : (
+                              <p className="text-sm text-gray-500" data-testid="booking-no-slots">
+                                No free times on this day for that duration. Please pick another date.
+                              </p>
+                            )}
+                          </div>
+                        )}
+
                         <div>
                           <Label htmlFor="duration">Duration (minutes) *</Label>
                           <Input
@@ -0,0 +1,81 @@
+"""
+Shared fixtures. Tests run against mongomock (``mongomock-motor``) instead of
+a MongoDB server; ``app_client`` starts the FastAPI app once per session on
+such a database and talks to it in-process over httpx's ASGI transport.
+"""
+
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "backend"))
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "home_services_test")
+os.environ.setdefault("EMAIL_MOCK", "true")
+
+import httpx  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def db():
+    """An empty database of its own, for tests of a single module"""
+    return AsyncMongoMockClient()["home_services_test"]
+
+
+@pytest.fixture(scope="session")
+async def app_client():
+    import server
+
+    server.use_database(AsyncMongoMockClient()["home_services_test"])
+    await server.startup_event()
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=server.app), base_url="http://test") as client:
+            yield client
+    finally:
+        await server.shutdown_db_client()
+
+
+@pytest.fixture
+def register_user(app_client):
+    """Register a new user and return ``(user, auth headers)``; each call uses a fresh email"""
+    async def register(role: str = "client", **fields) -> tuple:
+        response = await app_client.post("/api/auth/register", json={
+            "email": f"{role}-{uuid.uuid4().hex[:12]}@example.com",
+            "name": f"Test {role.title()}",
+            "password": "test-password",
+            "role": role,
+            **fields,
+        })
+        assert response.status_code == 201, response.text
+        body = response.json()
+        return body["user"], {"Authorization": f"Bearer {body['access_token']}"}
+    return register
+
+
+@pytest.fixture
+async def service(app_client):
+    """A service of its own, so availability set by one test cannot affect another"""
+    import server
+
+    doc = {
+        "id": str(uuid.uuid4()),
+        "name": "Test Inspection",
+        "description": "Inspection used by the tests",
+        "price": 150.0,
+        "service_type": "inspection",
+        "is_online": True,
+        "photos": [],
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    await server.db.services.insert_one(dict(doc))
+    return doc
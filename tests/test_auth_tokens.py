@@ -0,0 +1,81 @@
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from auth_tokens import RefreshTokenInvalid, RefreshTokenReused, RefreshTokenStore, TokenRevocations
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_refresh_token_is_single_use_and_reuse_revokes_all(db):
+    store = RefreshTokenStore(db, ttl_seconds=3600)
+    first, other = await store.issue("u1", 0), await store.issue("u1", 0)
+
+    assert (await store.consume(first))["user_id"] == "u1"
+    with pytest.raises(RefreshTokenReused) as excinfo:
+        await store.consume(first)
+
+    assert excinfo.value.user_id == "u1"
+    # The user's other sessions are gone too
+    with pytest.raises(RefreshTokenInvalid):
+        await store.consume(other)
+
+
+async def test_unknown_or_expired_refresh_token_is_invalid_but_not_reused(db):
+    store = RefreshTokenStore(db, ttl_seconds=-1)
+    expired = await store.issue("u1", 0)
+
+    for token in ["unknown", expired]:
+        with pytest.raises(RefreshTokenInvalid) as excinfo:
+            await store.consume(token)
+        assert not isinstance(excinfo.value, RefreshTokenReused)
+
+
+async def test_revocations_reach_other_workers_on_sync(db):
+    await db.users.insert_one({"id": "u1"})
+    worker_a, worker_b = TokenRevocations(db, 900), TokenRevocations(db, 900)
+    await worker_b.sync()
+
+    version = await worker_a.revoke_user("u1")
+    await worker_a.revoke_token("jti-1", datetime.now(timezone.utc) + timedelta(minutes=5))
+    old = {"sub": "u1", "ver": version - 1, "jti": "jti-2"}
+    new = {"sub": "u1", "ver": version, "jti": "jti-3"}
+    assert worker_a.is_revoked(old) and not worker_a.is_revoked(new)
+    assert not worker_b.is_revoked(old)
+
+    await worker_b.sync()
+    assert worker_b.is_revoked(old) and not worker_b.is_revoked(new)
+    assert worker_b.is_revoked({"sub": "u2", "jti": "jti-1"})
+
+
+async def test_reused_refresh_token_revokes_the_users_sessions(app_client, monkeypatch):
+    import server
+
+    monkeypatch.setattr(server, "STATELESS_AUTH", True)
+    registered = await app_client.post("/api/auth/register", json={
+        "email": f"client-{uuid.uuid4().hex[:12]}@example.com",
+        "name": "Test Client",
+        "password": "test-password",
+        "role": "client",
+        "consent_vax": True,
+        "vax_status": True,
+    })
+    assert registered.status_code == 201
+    first_refresh = registered.json()["refresh_token"]
+
+    refreshed = await app_client.post("/api/auth/refresh", json={"refresh_token": first_refresh})
+    assert refreshed.status_code == 200
+    tokens = refreshed.json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+    me = await app_client.get("/api/auth/me", headers=headers)
+    assert me.status_code == 200
+    # Profile fields that stateless claims do not carry are loaded from the user
+    assert me.json()["vax_status"] is True
+
+    reused = await app_client.post("/api/auth/refresh", json={"refresh_token": first_refresh})
+    assert reused.status_code == 401
+
+    assert (await app_client.get("/api/auth/me", headers=headers)).status_code == 401
+    after = await app_client.post("/api/auth/refresh", json={"refresh_token": tokens["refresh_token"]})
+    assert after.status_code == 401
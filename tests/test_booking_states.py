@@ -0,0 +1,79 @@
+import asyncio
+import uuid
+
+import pytest
+
+from booking_states import BookingNotFound, InvalidTransition, transition_booking
+
+pytestmark = pytest.mark.anyio
+
+
+async def insert_booking(db, status: str = "pending") -> str:
+    booking_id = str(uuid.uuid4())
+    await db.bookings.insert_one({"id": booking_id, "user_id": "u1", "status": status})
+    return booking_id
+
+
+async def test_transition_moves_the_booking_and_sets_fields(db):
+    booking_id = await insert_booking(db)
+
+    booking = await transition_booking(db, booking_id, "accept", {"admin_notes": "See you then"})
+
+    assert booking["status"] == "accepted"
+    assert booking["admin_notes"] == "See you then"
+    assert "_id" not in booking and "updated_at" in booking
+
+
+@pytest.mark.parametrize("status, action", [
+    ("pending", "complete"),
+    ("accepted", "accept"),
+    ("declined", "cancel"),
+    ("completed", "decline"),
+])
+async def test_invalid_transition_leaves_the_booking_unchanged(db, status, action):
+    booking_id = await insert_booking(db, status)
+
+    with pytest.raises(InvalidTransition) as excinfo:
+        await transition_booking(db, booking_id, action)
+
+    assert excinfo.value.current_status == status
+    assert (await db.bookings.find_one({"id": booking_id}))["status"] == status
+
+
+async def test_unknown_booking_is_not_found(db):
+    with pytest.raises(BookingNotFound):
+        await transition_booking(db, "missing", "accept")
+
+
+async def test_only_one_of_concurrent_actions_wins(db):
+    booking_id = await insert_booking(db)
+
+    results = await asyncio.gather(
+        *(transition_booking(db, booking_id, action) for action in ["accept", "decline", "accept", "decline"]),
+        return_exceptions=True,
+    )
+
+    winners = [result for result in results if isinstance(result, dict)]
+    assert len(winners) == 1
+    assert all(isinstance(result, InvalidTransition) for result in results if result not in winners)
+
+
+async def test_admin_update_returns_409_on_an_invalid_transition(app_client, register_user, service):
+    _, client = await register_user()
+    _, admin = await register_user("admin")
+    booking = (await app_client.post("/api/bookings", headers=client, json={
+        "service_id": service["id"], "service_type": service["service_type"], "preferred_date": "2030-01-07",
+    })).json()
+
+    completed_early = await app_client.put(
+        f"/api/admin/bookings/{booking['id']}", json={"action": "complete"}, headers=admin)
+    accepted = await app_client.put(f"/api/admin/bookings/{booking['id']}", json={"action": "accept"}, headers=admin)
+    accepted_again = await app_client.put(
+        f"/api/admin/bookings/{booking['id']}", json={"action": "accept"}, headers=admin)
+    missing = await app_client.put("/api/admin/bookings/missing", json={"action": "accept"}, headers=admin)
+
+    assert completed_early.status_code == 409
+    assert completed_early.json()["detail"] == "Cannot complete a booking that is pending"
+    assert accepted.status_code == 200
+    assert accepted_again.status_code == 409
+    assert missing.status_code == 404
@@ -0,0 +1,96 @@
+import uuid
+
+import pytest
+
+from booking_states import BookingNotFound, InvalidTransition, transition_booking, transition_bookings
+
+pytestmark = pytest.mark.anyio
+
+
+class RacingBookings:
+    """``bookings`` collection proxy running ``race`` right after a bulk write lands"""
+
+    def __init__(self, collection, race):
+        self._collection = collection
+        self._race = race
+
+    def __getattr__(self, name):
+        return getattr(self._collection, name)
+
+    async def bulk_write(self, requests, **kwargs):
+        result = await self._collection.bulk_write(requests, **kwargs)
+        await self._race()
+        return result
+
+
+class RacingDatabase:
+    def __init__(self, db, race):
+        self._db = db
+        self.bookings = RacingBookings(db.bookings, race)
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+
+async def insert_booking(db, status: str = "pending") -> str:
+    booking_id = str(uuid.uuid4())
+    await db.bookings.insert_one({"id": booking_id, "user_id": "u1", "status": status})
+    return booking_id
+
+
+async def test_bulk_reports_each_booking_and_clears_its_tags(db):
+    pending, accepted = await insert_booking(db), await insert_booking(db, "accepted")
+
+    updated, failed = await transition_bookings(db, [
+        (pending, "accept", {"admin_notes": "ok"}),
+        (accepted, "decline", {}),
+        ("missing", "accept", {}),
+    ])
+
+    assert list(updated) == [pending]
+    assert updated[pending]["status"] == "accepted" and "transition_id" not in updated[pending]
+    assert isinstance(failed[accepted], InvalidTransition)
+    assert isinstance(failed["missing"], BookingNotFound)
+    assert await db.bookings.count_documents({"transition_id": {"$exists": True}}) == 0
+
+
+async def test_booking_moved_again_before_the_read_back_is_not_counted(db):
+    booking_id = await insert_booking(db)
+
+    async def race():
+        # Another admin cancels the freshly accepted booking before the batch reads it back
+        await transition_booking(db, booking_id, "cancel")
+
+    updated, failed = await transition_bookings(RacingDatabase(db, race), [(booking_id, "accept", {})])
+
+    assert updated == {}
+    assert failed[booking_id].current_status == "cancelled"
+    assert "transition_id" not in await db.bookings.find_one({"id": booking_id})
+
+
+async def test_bulk_endpoint_reports_per_booking_outcomes(app_client, register_user, service):
+    _, client = await register_user()
+    _, admin = await register_user("admin")
+    booking_ids = []
+    for _ in range(2):
+        response = await app_client.post("/api/bookings", headers=client, json={
+            "service_id": service["id"], "service_type": service["service_type"], "preferred_date": "2030-01-07",
+        })
+        booking_ids.append(response.json()["id"])
+
+    first = await app_client.post("/api/admin/bookings/bulk", headers=admin, json={"items": [
+        {"booking_id": booking_ids[0], "action": "accept"},
+        {"booking_id": booking_ids[1], "action": "complete"},
+    ]})
+    duplicate = await app_client.post("/api/admin/bookings/bulk", headers=admin, json={"items": [
+        {"booking_id": booking_ids[0], "action": "accept"},
+        {"booking_id": booking_ids[0], "action": "decline"},
+    ]})
+
+    assert first.status_code == 200
+    body = first.json()
+    assert (body["succeeded"], body["failed"]) == (1, 1)
+    assert body["results"][0] == {"booking_id": booking_ids[0], "ok": True, "status": "accepted",
+                                  "qr_generated": True, "error": None}
+    assert body["results"][1]["error"] == "Cannot complete a booking that is pending"
+    assert duplicate.status_code == 400
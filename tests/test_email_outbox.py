@@ -0,0 +1,125 @@
+import socket
+from datetime import datetime, timezone
+
+import pytest
+from aiosmtpd.controller import Controller
+
+from email_outbox import OUTBOX_COLLECTION, OutboxSender, enqueue_email
+
+pytestmark = pytest.mark.anyio
+
+
+class FlakySink:
+    """aiosmtpd handler refusing the first ``failures`` messages with a transient error"""
+
+    def __init__(self, failures: int):
+        self.failures = failures
+        self.received = []
+
+    async def handle_DATA(self, server, session, envelope):
+        if self.failures > 0:
+            self.failures -= 1
+            return "451 Try again later"
+        self.received.append(envelope)
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_sink():
+    controllers = []
+
+    def start(failures: int = 0):
+        sink = FlakySink(failures)
+        controller = Controller(sink, hostname="127.0.0.1", port=free_port())
+        controller.start()
+        controllers.append(controller)
+        return sink, controller.port
+
+    yield start
+    for controller in controllers:
+        controller.stop()
+
+
+def sender_for(db, port: int, **options) -> OutboxSender:
+    return OutboxSender(db, hostname="127.0.0.1", port=port, start_tls=False, **options)
+
+
+async def job(db, job_id: str) -> dict:
+    return await db[OUTBOX_COLLECTION].find_one({"id": job_id}, {"_id": 0})
+
+
+async def make_due(db, job_id: str):
+    await db[OUTBOX_COLLECTION].update_one(
+        {"id": job_id}, {"$set": {"next_attempt_at": datetime.now(timezone.utc).isoformat()}})
+
+
+async def test_failed_delivery_is_retried_after_backoff(db, smtp_sink):
+    sink, port = smtp_sink(failures=1)
+    sender = sender_for(db, port, backoff_seconds=60)
+    job_id = await enqueue_email(db, "client@example.com", "Booking Accepted", "<p>Accepted</p>")
+
+    assert await sender.drain_once() == 1
+    failed = await job(db, job_id)
+    assert failed["status"] == "pending"
+    assert failed["attempts"] == 1
+    assert "451" in failed["last_error"]
+    delay = datetime.fromisoformat(failed["next_attempt_at"]) - datetime.now(timezone.utc)
+    assert 55 < delay.total_seconds() <= 60
+
+    # Not due again until the backoff has passed
+    assert await sender.drain_once() == 0
+
+    await make_due(db, job_id)
+    assert await sender.drain_once() == 1
+    sent = await job(db, job_id)
+    assert sent["status"] == "sent"
+    assert sent["attempts"] == 2
+    assert [envelope.rcpt_tos for envelope in sink.received] == [["client@example.com"]]
+    assert sender.stats["retried"] == 1 and sender.stats["sent"] == 1
+    await sender.stop()
+
+
+async def test_backoff_doubles_up_to_the_cap_and_gives_up(db, smtp_sink):
+    sink, port = smtp_sink(failures=10)
+    sender = sender_for(db, port, backoff_seconds=10, max_backoff_seconds=15, max_attempts=3)
+    job_id = await enqueue_email(db, "client@example.com", "Welcome", "<p>Hi</p>")
+
+    delays = []
+    for _ in range(2):
+        await make_due(db, job_id)
+        started = datetime.now(timezone.utc)
+        assert await sender.drain_once() == 1
+        retry_at = datetime.fromisoformat((await job(db, job_id))["next_attempt_at"])
+        delays.append(round((retry_at - started).total_seconds()))
+    assert delays == [10, 15]
+
+    await make_due(db, job_id)
+    assert await sender.drain_once() == 1
+    failed = await job(db, job_id)
+    assert failed["status"] == "failed"
+    assert failed["attempts"] == 3
+    assert sink.received == []
+    assert sender.stats["failed"] == 1
+
+    # A failed job is never claimed again
+    await make_due(db, job_id)
+    assert await sender.drain_once() == 0
+    await sender.stop()
+
+
+async def test_one_connection_is_reused_for_a_batch(db, smtp_sink):
+    sink, port = smtp_sink()
+    sender = sender_for(db, port, batch_size=10)
+    for i in range(3):
+        await enqueue_email(db, f"user{i}@example.com", "Hello", "<p>Hello</p>")
+
+    assert await sender.drain_once() == 3
+    assert len(sink.received) == 3
+    assert sender.stats["reconnects"] == 1
+    await sender.stop()
@@ -0,0 +1,160 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from erasure import ERASURE_COLLECTION, STEPS, ErasureWorker, check_status_token, request_erasure
+from notification_counters import get_unread_count, increment_unread
+
+pytestmark = pytest.mark.anyio
+
+USER = {"id": "u1", "email": "u1@example.com"}
+
+
+async def seed_user(db, bookings: int = 5):
+    await db.users.insert_one({**USER, "role": "client"})
+    for i in range(bookings):
+        await db.bookings.insert_one({"id": f"b{i}", "user_id": USER["id"], "status": "pending"})
+        await db.notifications.insert_one({"id": f"n{i}", "user_id": USER["id"], "booking_id": f"b{i}", "read": False})
+    await db.email_outbox.insert_one({"id": "e1", "to": USER["email"], "status": "pending"})
+    await db.idempotency_keys.insert_one({"key": f"{USER['id']}:retry-1"})
+    # Another user's data must survive
+    await db.bookings.insert_one({"id": "other", "user_id": "u2", "status": "pending"})
+
+
+def worker_for(db, **options) -> ErasureWorker:
+    return ErasureWorker(db, batch_size=2, pause_seconds=0, **options)
+
+
+async def job(db, job_id: str) -> dict:
+    return await db[ERASURE_COLLECTION].find_one({"id": job_id}, {"_id": 0})
+
+
+async def test_job_erases_every_step_in_batches_and_completes(db):
+    await seed_user(db)
+    queued = await request_erasure(db, USER)
+    assert (await db.users.find_one({"id": USER["id"]}))["deletion_pending"] is True
+
+    worker = worker_for(db)
+    assert await worker.run_once() is True
+    assert await worker.run_once() is False
+
+    done = await job(db, queued["id"])
+    assert done["status"] == "completed"
+    assert done["report"]["clean"] is True
+    assert all(done["progress"][step]["done"] for step in STEPS)
+    assert done["progress"]["bookings"]["deleted"] == 5
+    assert "email" not in done and "active" not in done
+    assert await db.users.count_documents({}) == 0
+    assert await db.bookings.count_documents({}) == 1
+
+
+async def test_resumed_job_skips_finished_steps_and_verification_catches_leftovers(db):
+    await seed_user(db)
+    queued = await request_erasure(db, USER)
+    # A previous run finished the notifications step, but a notification was written after it
+    await db[ERASURE_COLLECTION].update_one({"id": queued["id"]}, {"$set": {"progress.notifications.done": True}})
+    await db.notifications.insert_one({"id": "late", "user_id": USER["id"], "read": True})
+
+    worker = worker_for(db)
+    assert await worker.run_once() is True
+
+    retried = await job(db, queued["id"])
+    assert retried["status"] == "pending"
+    assert retried["report"]["remaining"]["notifications"] == 1
+    assert retried["progress"]["notifications"]["deleted"] == 0
+    assert not any(retried["progress"][step]["done"] for step in STEPS)
+
+    assert await worker.run_once() is True
+    done = await job(db, queued["id"])
+    assert done["status"] == "completed"
+    assert done["attempts"] == 2
+    assert done["report"]["remaining"]["notifications"] == 0
+
+
+async def test_job_fails_after_max_attempts_when_data_keeps_coming_back(db):
+    await seed_user(db, bookings=0)
+    queued = await request_erasure(db, USER)
+    await db[ERASURE_COLLECTION].update_one({"id": queued["id"]}, {"$set": {"progress.users.done": True}})
+
+    worker = worker_for(db, max_attempts=1)
+    await worker.run_once()
+
+    failed = await job(db, queued["id"])
+    assert failed["status"] == "failed"
+    assert failed["report"]["remaining"]["users"] == 1
+    assert "active" not in failed
+    assert worker.stats["failed"] == 1
+
+
+async def test_crashed_job_is_claimed_again_only_after_its_lease(db):
+    await seed_user(db, bookings=0)
+    queued = await request_erasure(db, USER)
+    later = (datetime.now(timezone.utc) + timedelta(minutes=5)).isoformat()
+    await db[ERASURE_COLLECTION].update_one({"id": queued["id"]}, {"$set": {"status": "running", "locked_until": later}})
+
+    worker = worker_for(db)
+    assert await worker.run_once() is False
+
+    earlier = (datetime.now(timezone.utc) - timedelta(seconds=1)).isoformat()
+    await db[ERASURE_COLLECTION].update_one({"id": queued["id"]}, {"$set": {"locked_until": earlier}})
+    assert await worker.run_once() is True
+    assert (await job(db, queued["id"]))["status"] == "completed"
+
+
+async def test_admins_unread_counters_drop_with_their_notifications(db):
+    await seed_user(db, bookings=1)
+    await db.notifications.insert_many([
+        {"id": "a1", "user_id": "admin", "booking_id": "b0", "read": False},
+        {"id": "a2", "user_id": "admin", "booking_id": "b0", "read": True},
+        {"id": "a3", "user_id": "admin", "booking_id": "other", "read": False},
+    ])
+    await increment_unread(db, "admin")
+    assert await get_unread_count(db, "admin") == 2
+
+    await request_erasure(db, USER)
+    await worker_for(db).run_once()
+
+    assert await get_unread_count(db, "admin") == 1
+    assert [n["id"] async for n in db.notifications.find({"user_id": "admin"})] == ["a3"]
+
+
+async def test_only_the_latest_status_token_is_accepted(db):
+    await seed_user(db, bookings=0)
+    first = await request_erasure(db, USER)
+    stored = await job(db, first["id"])
+
+    assert check_status_token(stored, first["status_token"])
+    assert not check_status_token(stored, "guess")
+    assert not check_status_token(stored, None)
+    assert "status_token" not in stored
+
+
+async def test_erasure_status_needs_the_status_token_or_an_admin(app_client, register_user):
+    _, headers = await register_user()
+    _, admin = await register_user("admin")
+
+    response = await app_client.delete("/api/user/delete", headers=headers)
+    assert response.status_code == 202
+    body = response.json()
+
+    anonymous = await app_client.get(body["status_url"])
+    wrong = await app_client.get(body["status_url"], headers={"X-Erasure-Token": "guess"})
+    own = await app_client.get(body["status_url"], headers={"X-Erasure-Token": body["status_token"]})
+    as_admin = await app_client.get(body["status_url"], headers=admin)
+
+    assert anonymous.status_code == wrong.status_code == 404
+    assert own.status_code == as_admin.status_code == 200
+    assert "status_token_hash" not in own.json() and "user_id" not in own.json()
+    # The account is locked at once
+    assert (await app_client.get("/api/auth/me", headers=headers)).status_code == 401
+
+
+async def test_admin_being_erased_gets_no_new_notifications(app_client, register_user):
+    import server
+
+    admin, headers = await register_user("admin")
+    assert admin["id"] in await server.get_admin_ids()
+
+    assert (await app_client.delete("/api/user/delete", headers=headers)).status_code == 202
+
+    assert admin["id"] not in await server.get_admin_ids()
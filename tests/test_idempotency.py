@@ -0,0 +1,93 @@
+import asyncio
+import uuid
+
+import pytest
+
+from idempotency import IdempotencyInProgress, IdempotencyKeyReused, IdempotencyStore
+from indexes import ensure_indexes
+
+pytestmark = pytest.mark.anyio
+
+
+def booking_for(service: dict, **fields) -> dict:
+    return {
+        "service_id": service["id"],
+        "service_type": service["service_type"],
+        "preferred_date": "2030-01-07",
+        **fields,
+    }
+
+
+async def test_concurrent_retries_create_one_booking(app_client, register_user, service):
+    import server
+
+    user, headers = await register_user()
+    headers = {**headers, "Idempotency-Key": uuid.uuid4().hex}
+
+    responses = await asyncio.gather(*[
+        app_client.post("/api/bookings", json=booking_for(service), headers=headers) for _ in range(5)
+    ])
+
+    assert [response.status_code for response in responses] == [201] * 5
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert sum(response.headers.get("Idempotent-Replayed") == "true" for response in responses) == 4
+    assert await server.db.bookings.count_documents({"user_id": user["id"]}) == 1
+
+
+async def test_key_reused_with_a_different_request_is_rejected(app_client, register_user, service):
+    _, headers = await register_user()
+    headers = {**headers, "Idempotency-Key": uuid.uuid4().hex}
+
+    first = await app_client.post("/api/bookings", json=booking_for(service), headers=headers)
+    other = await app_client.post("/api/bookings", json=booking_for(service, details="Changed"), headers=headers)
+
+    assert first.status_code == 201
+    assert other.status_code == 422
+
+
+async def test_keys_are_scoped_per_user(app_client, register_user, service):
+    key = uuid.uuid4().hex
+    _, alice = await register_user()
+    _, bob = await register_user()
+
+    first = await app_client.post("/api/bookings", json=booking_for(service), headers={**alice, "Idempotency-Key": key})
+    second = await app_client.post("/api/bookings", json=booking_for(service), headers={**bob, "Idempotency-Key": key})
+
+    assert first.status_code == second.status_code == 201
+    assert "Idempotent-Replayed" not in second.headers
+    assert first.json()["id"] != second.json()["id"]
+
+
+async def test_another_worker_waits_for_the_original_response(db):
+    await ensure_indexes(db)
+    owner, other = IdempotencyStore(db), IdempotencyStore(db, wait_seconds=2)
+
+    assert await owner.begin("key", "fingerprint") is None
+    waiting = asyncio.create_task(other.begin("key", "fingerprint"))
+    await asyncio.sleep(0.15)
+    assert not waiting.done()
+
+    await owner.complete("key", 201, {"id": "b1"})
+    assert await waiting == {"status_code": 201, "body": {"id": "b1"}}
+    assert other.replays == 1
+
+
+async def test_released_key_can_be_claimed_again(db):
+    await ensure_indexes(db)
+    store = IdempotencyStore(db)
+
+    assert await store.begin("key", "fingerprint") is None
+    await store.release("key")
+
+    assert await store.begin("key", "fingerprint") is None
+
+
+async def test_waiting_gives_up_after_wait_seconds(db):
+    await ensure_indexes(db)
+    owner, other = IdempotencyStore(db), IdempotencyStore(db, wait_seconds=0.2)
+    await owner.begin("key", "fingerprint")
+
+    with pytest.raises(IdempotencyInProgress):
+        await other.begin("key", "fingerprint")
+    with pytest.raises(IdempotencyKeyReused):
+        await other.begin("key", "another fingerprint")
@@ -0,0 +1,60 @@
+import pytest
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import DuplicateKeyError
+
+from indexes import INDEXES, ensure_indexes, index_drift
+
+pytestmark = pytest.mark.anyio
+
+# mongomock does not keep partialFilterExpression, so drift always reports these as changed
+PARTIAL_INDEXES = {
+    (collection, model.document["name"])
+    for collection, models in INDEXES.items() for model in models
+    if "partialFilterExpression" in model.document
+}
+
+
+def without_partial_indexes(drift: dict) -> dict:
+    remaining = {}
+    for collection, report in drift.items():
+        report = {**report, "changed": [name for name in report["changed"] if (collection, name) not in PARTIAL_INDEXES]}
+        if any(report.values()):
+            remaining[collection] = report
+    return remaining
+
+
+async def test_ensure_indexes_creates_every_declared_index(db):
+    created = await ensure_indexes(db)
+
+    assert set(created) == set(INDEXES)
+    for collection, models in INDEXES.items():
+        assert sorted(created[collection]) == sorted(model.document["name"] for model in models)
+    assert without_partial_indexes(await index_drift(db)) == {}
+
+
+async def test_ensure_indexes_is_idempotent(db):
+    await ensure_indexes(db)
+    await ensure_indexes(db)
+
+    assert without_partial_indexes(await index_drift(db)) == {}
+
+
+async def test_drift_reports_missing_changed_and_extra_indexes(db):
+    declared = {"bookings": [
+        IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+        IndexModel([("user_id", ASCENDING)], name="user_id"),
+    ]}
+    await db.bookings.create_index([("id", ASCENDING)], name="id_unique")
+    await db.bookings.create_index([("status", ASCENDING)], name="status")
+
+    drift = await index_drift(db, declared)
+
+    assert drift == {"bookings": {"missing": ["user_id"], "changed": ["id_unique"], "extra": ["status"]}}
+
+
+async def test_unique_email_index_rejects_duplicate_users(db):
+    await ensure_indexes(db)
+    await db.users.insert_one({"id": "1", "email": "same@example.com"})
+
+    with pytest.raises(DuplicateKeyError):
+        await db.users.insert_one({"id": "2", "email": "same@example.com"})
@@ -0,0 +1,81 @@
+import pytest
+from fastapi import HTTPException
+
+from notification_broker import RESYNC_EVENT, SESSION_EVENT, InMemoryBroker
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_events_reach_only_the_subscribers_of_their_user():
+    broker = InMemoryBroker()
+    first, second, other = broker.subscribe("alice"), broker.subscribe("alice"), broker.subscribe("bob")
+
+    broker.publish("alice", {"id": "n1"})
+
+    assert await first.get(timeout=0.1) == {"id": "n1"}
+    assert await second.get(timeout=0.1) == {"id": "n1"}
+    assert await other.get(timeout=0.01) is None
+    assert broker.stats() == {"users": 2, "subscriptions": 3, "published": 1}
+
+
+async def test_slow_subscriber_gets_a_resync_instead_of_the_backlog():
+    broker = InMemoryBroker(max_queue=2)
+    subscription = broker.subscribe("alice")
+
+    for i in range(3):
+        broker.publish("alice", {"id": f"n{i}"})
+
+    assert await subscription.get(timeout=0.1) == RESYNC_EVENT
+    assert await subscription.get(timeout=0.01) is None
+
+
+async def test_closing_a_subscription_unsubscribes_it():
+    broker = InMemoryBroker()
+    with broker.subscribe("alice") as subscription:
+        assert broker.stats()["subscriptions"] == 1
+
+    broker.publish("alice", {"id": "n1"})
+    assert await subscription.get(timeout=0.01) is None
+    assert broker.stats()["users"] == 0
+
+
+async def test_new_notifications_are_published_to_open_streams(app_client, register_user):
+    import server
+
+    user, _ = await register_user()
+    with server.notification_broker.subscribe(user["id"]) as subscription:
+        await server.create_notification(user["id"], "Hello", "A message", "test")
+        event = await subscription.get(timeout=1)
+
+    assert event["user_id"] == user["id"]
+    assert event["title"] == "Hello"
+    assert "_id" not in event
+
+
+async def test_stream_ticket_is_single_use(app_client, register_user):
+    import server
+
+    _, headers = await register_user()
+    response = await app_client.post("/api/notifications/stream-ticket", headers=headers)
+    assert response.status_code == 200
+    ticket = response.json()["ticket"]
+
+    claims = await server.redeem_stream_ticket(ticket)
+    assert not server.stream_session_ended(claims)
+    with pytest.raises(HTTPException) as excinfo:
+        await server.redeem_stream_ticket(ticket)
+    assert excinfo.value.status_code == 401
+
+
+async def test_logout_ends_streams_opened_from_that_session(app_client, register_user):
+    import server
+
+    user, headers = await register_user()
+    ticket = (await app_client.post("/api/notifications/stream-ticket", headers=headers)).json()["ticket"]
+    claims = await server.redeem_stream_ticket(ticket)
+
+    with server.notification_broker.subscribe(user["id"]) as subscription:
+        assert (await app_client.post("/api/auth/logout", headers=headers)).status_code == 200
+        # The stream is woken up to re-check its session right away
+        assert await subscription.get(timeout=1) == SESSION_EVENT
+    assert server.stream_session_ended(claims)
@@ -0,0 +1,58 @@
+import pytest
+
+from notification_counters import (
+    COUNTERS_COLLECTION, decrement_unread, get_unread_count, increment_unread, increment_unread_many,
+    reconcile_unread_counters,
+)
+
+pytestmark = pytest.mark.anyio
+
+
+async def add_notifications(db, user_id: str, unread: int, read: int = 0):
+    await db.notifications.insert_many(
+        [{"user_id": user_id, "read": False} for _ in range(unread)]
+        + [{"user_id": user_id, "read": True} for _ in range(read)]
+    )
+
+
+async def counter(db, user_id: str):
+    doc = await db[COUNTERS_COLLECTION].find_one({"user_id": user_id})
+    return doc and doc["unread"]
+
+
+async def test_first_increment_backfills_from_existing_notifications(db):
+    # No counter yet: the count taken on first use already includes the new notification
+    await add_notifications(db, "u1", unread=3, read=1)
+
+    await increment_unread(db, "u1")
+
+    assert await counter(db, "u1") == 3
+    await add_notifications(db, "u1", unread=1)
+    await increment_unread(db, "u1")
+    assert await get_unread_count(db, "u1") == 4
+
+
+async def test_bulk_increment_backfills_missing_counters_and_counts_repeats(db):
+    await add_notifications(db, "u1", unread=2)
+    await add_notifications(db, "u2", unread=1)
+    await increment_unread(db, "u1")
+
+    await add_notifications(db, "u1", unread=2)
+    await increment_unread_many(db, ["u1", "u1", "u2"])
+
+    assert await counter(db, "u1") == 4
+    assert await counter(db, "u2") == 1
+
+
+async def test_count_never_goes_below_zero_and_reconcile_repairs_drift(db):
+    await add_notifications(db, "u1", unread=1)
+    await increment_unread(db, "u1")
+    await decrement_unread(db, "u1", 3)
+    assert await get_unread_count(db, "u1") == 0
+
+    await add_notifications(db, "u2", unread=2)
+
+    assert await reconcile_unread_counters(db) == 2
+    assert await counter(db, "u1") == 1
+    assert await counter(db, "u2") == 2
+    assert await reconcile_unread_counters(db) == 0
@@ -0,0 +1,132 @@
+import pytest
+
+from response_cache import MemoryBackend, ResponseCache
+
+pytestmark = pytest.mark.anyio
+
+
+class FakeRedis:
+    """Dict-backed stand-in for the ``redis.asyncio`` calls ``ResponseCache`` makes; ``down`` makes every call fail"""
+
+    def __init__(self):
+        self.data = {}
+        self.down = False
+
+    def _check(self):
+        if self.down:
+            raise ConnectionError("Redis is down")
+
+    async def get(self, key):
+        self._check()
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None, nx=False):
+        self._check()
+        if nx and key in self.data:
+            return None
+        self.data[key] = value if isinstance(value, bytes) else str(value).encode()
+        return True
+
+    async def incr(self, key):
+        self._check()
+        self.data[key] = str(int(self.data.get(key, 0)) + 1).encode()
+        return int(self.data[key])
+
+    async def delete(self, key):
+        self._check()
+        return int(self.data.pop(key, None) is not None)
+
+
+class Renderer:
+    def __init__(self):
+        self.calls = 0
+
+    async def __call__(self) -> bytes:
+        self.calls += 1
+        return f"render {self.calls}".encode()
+
+
+@pytest.fixture(params=["memory", "redis"])
+def backend(request):
+    return MemoryBackend() if request.param == "memory" else FakeRedis()
+
+
+async def test_hits_are_served_until_the_scope_is_bumped(backend):
+    cache = ResponseCache(backend, "bookings", ttl_seconds=30)
+    render = Renderer()
+
+    assert await cache.get_or_set("u1", {"limit": 10}, render) == b"render 1"
+    assert await cache.get_or_set("u1", {"limit": 10}, render) == b"render 1"
+    assert await cache.get_or_set("u1", {"limit": 20}, render) == b"render 2"
+
+    await cache.bump("u1")
+    assert await cache.get_or_set("u1", {"limit": 10}, render) == b"render 3"
+    assert await cache.get_or_set("u1", {"limit": 20}, render) == b"render 4"
+    assert (cache.hits, cache.misses) == (1, 4)
+
+
+async def test_bump_leaves_other_scopes_cached(backend):
+    cache = ResponseCache(backend, "bookings", ttl_seconds=30)
+    render = Renderer()
+    await cache.get_or_set("u1", {}, render)
+    await cache.get_or_set("u2", {}, render)
+
+    await cache.bump("u1")
+
+    assert await cache.get_or_set("u2", {}, render) == b"render 2"
+    assert await cache.get_or_set("u1", {}, render) == b"render 3"
+
+
+async def test_bump_is_seen_by_every_worker_sharing_the_backend():
+    redis = FakeRedis()
+    worker_a, worker_b = ResponseCache(redis, "bookings", 30), ResponseCache(redis, "bookings", 30)
+    render = Renderer()
+    await worker_a.get_or_set("u1", {}, render)
+    assert await worker_b.get_or_set("u1", {}, render) == b"render 1"
+
+    await worker_b.bump("u1")
+
+    assert await worker_a.get_or_set("u1", {}, render) == b"render 2"
+
+
+async def test_lost_version_does_not_resurrect_old_entries():
+    redis = FakeRedis()
+    cache = ResponseCache(redis, "bookings", 30)
+    render = Renderer()
+    await cache.get_or_set("u1", {}, render)
+
+    del redis.data["bookings:u1:version"]
+
+    assert await cache.get_or_set("u1", {}, render) == b"render 2"
+
+
+async def test_backend_errors_fall_back_to_rendering():
+    redis = FakeRedis()
+    cache = ResponseCache(redis, "bookings", 30)
+    render = Renderer()
+    redis.down = True
+
+    assert await cache.get_or_set("u1", {}, render) == b"render 1"
+    await cache.bump("u1")
+    assert cache.errors == 2
+
+
+async def test_zero_ttl_disables_caching():
+    cache = ResponseCache(MemoryBackend(), "bookings", ttl_seconds=0)
+    render = Renderer()
+
+    await cache.get_or_set("u1", {}, render)
+    await cache.get_or_set("u1", {}, render)
+
+    assert render.calls == 2
+
+
+async def test_new_booking_invalidates_the_cached_list(app_client, register_user, service):
+    _, headers = await register_user()
+    assert (await app_client.get("/api/bookings", headers=headers)).json()["items"] == []
+
+    await app_client.post("/api/bookings", headers=headers, json={
+        "service_id": service["id"], "service_type": service["service_type"], "preferred_date": "2030-01-07",
+    })
+
+    assert len((await app_client.get("/api/bookings", headers=headers)).json()["items"]) == 1
@@ -0,0 +1,121 @@
+import asyncio
+from datetime import date, datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from indexes import ensure_indexes
+from schedule import (
+    InvalidAvailability, SlotUnavailable, free_slots, normalize_windows, overlaps, parse_slot, reserve_slot,
+    set_availability,
+)
+
+pytestmark = pytest.mark.anyio
+
+MONDAY = "2030-01-07"
+BERLIN = ZoneInfo("Europe/Berlin")
+LONG_AGO = datetime(2000, 1, 1, tzinfo=timezone.utc)
+
+
+@pytest.mark.parametrize("start, end, expected", [
+    (8 * 60, 9 * 60, False),    # ends where the first booking starts
+    (8 * 60, 9 * 60 + 1, True),
+    (9 * 60 + 30, 9 * 60 + 45, True),
+    (10 * 60, 11 * 60, False),  # between the two bookings
+    (10 * 60, 11 * 60 + 1, True),
+    (12 * 60, 13 * 60, False),
+])
+def test_overlaps(start, end, expected):
+    intervals = [{"start": 9 * 60, "end": 10 * 60}, {"start": 11 * 60, "end": 12 * 60}]
+
+    assert overlaps(intervals, start, end) is expected
+
+
+def test_parse_slot_reads_wall_clock_time_and_converts_offsets():
+    assert parse_slot(f"{MONDAY}T09:30", 60, BERLIN) == (date(2030, 1, 7), 570, 630)
+    assert parse_slot(f"{MONDAY}T08:30+00:00", 60, BERLIN) == (date(2030, 1, 7), 570, 630)
+
+    with pytest.raises(ValueError):
+        parse_slot(MONDAY, 60, BERLIN)
+    with pytest.raises(ValueError):
+        parse_slot(f"{MONDAY}T23:30", 60, BERLIN)
+
+
+def test_overlapping_windows_are_rejected():
+    with pytest.raises(InvalidAvailability):
+        normalize_windows([{"weekday": 0, "start": "09:00", "end": "12:00"},
+                           {"weekday": 0, "start": "11:00", "end": "13:00"}])
+
+
+async def test_overlapping_reservations_are_rejected(db):
+    await set_availability(db, "p1", [{"weekday": 0, "start": "09:00", "end": "17:00"}], "now")
+    await reserve_slot(db, "p1", f"{MONDAY}T10:00", 60, "b1", LONG_AGO, BERLIN)
+
+    with pytest.raises(SlotUnavailable, match="already booked"):
+        await reserve_slot(db, "p1", f"{MONDAY}T10:30", 60, "b2", LONG_AGO, BERLIN)
+    with pytest.raises(SlotUnavailable, match="not available"):
+        await reserve_slot(db, "p1", f"{MONDAY}T16:30", 60, "b3", LONG_AGO, BERLIN)
+    assert await reserve_slot(db, "p1", f"{MONDAY}T11:00", 60, "b4", LONG_AGO, BERLIN) == {
+        "provider_id": "p1", "day": MONDAY, "start": 660, "end": 720}
+
+
+async def test_reservations_in_the_past_are_rejected(db):
+    await set_availability(db, "p1", [{"weekday": 0, "start": "09:00", "end": "17:00"}], "now")
+    now = datetime(2030, 1, 7, 9, 30, tzinfo=timezone.utc)  # 10:30 in Berlin
+
+    with pytest.raises(ValueError, match="in the past"):
+        await reserve_slot(db, "p1", "2020-01-06T10:00", 60, "b1", now, BERLIN)
+    with pytest.raises(ValueError, match="in the past"):
+        await reserve_slot(db, "p1", f"{MONDAY}T10:00", 60, "b2", now, BERLIN)
+    assert await reserve_slot(db, "p1", f"{MONDAY}T11:00", 60, "b3", now, BERLIN) is not None
+
+
+async def test_only_one_of_concurrent_reservations_for_the_same_time_wins(db):
+    await ensure_indexes(db)
+    await set_availability(db, "p1", [{"weekday": 0, "start": "09:00", "end": "17:00"}], "now")
+
+    results = await asyncio.gather(
+        *(reserve_slot(db, "p1", f"{MONDAY}T10:00", 60, f"b{i}", LONG_AGO, BERLIN) for i in range(5)),
+        return_exceptions=True,
+    )
+
+    assert sum(isinstance(result, dict) for result in results) == 1
+    assert sum(isinstance(result, SlotUnavailable) for result in results) == 4
+
+
+async def test_free_slots_skip_booked_time(db):
+    await set_availability(db, "p1", [{"weekday": 0, "start": "09:00", "end": "12:00"}], "now")
+    await reserve_slot(db, "p1", f"{MONDAY}T10:00", 60, "b1", LONG_AGO, BERLIN)
+
+    slots = await free_slots(db, "p1", date(2030, 1, 7), date(2030, 1, 8), 60, 60, LONG_AGO, BERLIN)
+
+    assert slots == [{"start": f"{MONDAY}T09:00", "end": f"{MONDAY}T10:00"},
+                     {"start": f"{MONDAY}T11:00", "end": f"{MONDAY}T12:00"}]
+    assert await free_slots(db, "nobody", date(2030, 1, 7), date(2030, 1, 7), 60, 60, LONG_AGO, BERLIN) is None
+
+
+async def test_booking_api_rejects_overlaps_and_date_only_requests(app_client, register_user, service):
+    _, admin = await register_user("admin")
+    _, client = await register_user()
+    response = await app_client.put(f"/api/admin/providers/{service['id']}/availability", headers=admin, json={
+        "windows": [{"weekday": 0, "start": "09:00", "end": "17:00"}],
+    })
+    assert response.status_code == 200
+
+    def book(preferred_date: str):
+        return app_client.post("/api/bookings", headers=client, json={
+            "service_id": service["id"], "service_type": service["service_type"], "preferred_date": preferred_date,
+        })
+
+    assert (await book(f"{MONDAY}T10:00")).status_code == 201
+    overlapping = await book(f"{MONDAY}T10:30")
+    assert overlapping.status_code == 409
+    assert overlapping.json()["detail"] == "That time is already booked"
+    assert (await book(MONDAY)).status_code == 422
+    assert (await book("2020-01-06T10:00")).status_code == 422
+
+    slots = await app_client.get(f"/api/services/{service['id']}/slots",
+                                 params={"date_from": MONDAY, "date_to": MONDAY, "step": 60})
+    assert slots.status_code == 200
+    assert {"start": f"{MONDAY}T10:00", "end": f"{MONDAY}T11:00"} not in slots.json()
+    assert {"start": f"{MONDAY}T11:00", "end": f"{MONDAY}T12:00"} in slots.json()